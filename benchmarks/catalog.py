@@ -0,0 +1,108 @@
+"""Generates synthetic catalogs in the format of src/videos.txt.
+
+Title words and tags follow Zipf distributions, as in real catalogs a few
+words and tags are very common and most are rare. The same size and seed
+always give the same catalog. Run with:
+python3 -m benchmarks.catalog 100000 catalog.txt
+"""
+
+import argparse
+import base64
+import itertools
+import random
+
+# Ids are the row number scrambled by an odd multiplier, so they are unique
+# and look random.
+_ID_MULTIPLIER = 0x9E3779B97F4A7C15
+_SYLLABLES = [
+    consonant + vowel
+    for consonant in "bcdfghjklmnprstvwz" for vowel in "aeiou"]
+_CHUNK_SIZE = 100000
+
+
+def _words(rng, count):
+    """Returns count distinct pronounceable words in random order."""
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(_SYLLABLES, k=rng.randint(1, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def _terms(rng, vocabulary, tags):
+    return _words(rng, vocabulary), [f"#{word}" for word in _words(rng, tags)]
+
+
+def terms(seed: int = 0, vocabulary: int = 20000, tags: int = 2000):
+    """Returns the title words and the tags of the catalogs generated with
+    these arguments, from the most to the least common."""
+    return _terms(random.Random(seed), vocabulary, tags)
+
+
+def _zipf_weights(count, exponent=1.0):
+    return list(itertools.accumulate(
+        1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def video_id(row: int) -> str:
+    """Returns the id of the video on a row of any generated catalog."""
+    number = (row * _ID_MULTIPLIER) % (1 << 64)
+    return base64.urlsafe_b64encode(number.to_bytes(8, "little")).decode()[:11]
+
+
+def generate(path, size: int, seed: int = 0, vocabulary: int = 20000,
+             tags: int = 2000) -> None:
+    """Writes a catalog of size videos.
+
+    Args:
+        path: Path of the catalog file to write.
+        size: Number of videos.
+        seed: Seed of the random choices.
+        vocabulary: Number of distinct title words.
+        tags: Number of distinct tags.
+    """
+    rng = random.Random(seed)
+    words, tag_names = _terms(rng, vocabulary, tags)
+    titled = [word.capitalize() for word in words]
+    word_weights = _zipf_weights(vocabulary)
+    tag_weights = _zipf_weights(tags)
+    with open(path, "w") as catalog:
+        for start in range(0, size, _CHUNK_SIZE):
+            rows = range(start, min(size, start + _CHUNK_SIZE))
+            lengths = rng.choices(range(1, 9), [4, 10, 14, 12, 8, 5, 3, 2],
+                                  k=len(rows))
+            picks = iter(rng.choices(
+                range(vocabulary), cum_weights=word_weights, k=sum(lengths)))
+            tag_counts = rng.choices(range(6), [10, 25, 30, 20, 10, 5],
+                                     k=len(rows))
+            tag_picks = iter(rng.choices(
+                tag_names, cum_weights=tag_weights, k=sum(tag_counts)))
+            lines = []
+            for row, length, tag_count in zip(rows, lengths, tag_counts):
+                title = " ".join(
+                    titled[word] if rng.random() < 0.3 else words[word]
+                    for word in itertools.islice(picks, length))
+                video_tags = " , ".join(
+                    dict.fromkeys(itertools.islice(tag_picks, tag_count)))
+                lines.append(f"{title} | {video_id(row)} | {video_tags}\n")
+            catalog.writelines(lines)
+
+
+def flagged_rows(size: int, fraction: float = 0.01, seed: int = 0) -> list:
+    """Returns the rows of the videos to flag in a catalog of size videos."""
+    rng = random.Random(seed + 1)
+    return sorted(rng.sample(range(size), int(size * fraction)))
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("size", type=int)
+    arguments.add_argument("path")
+    arguments.add_argument("--seed", type=int, default=0)
+    options = arguments.parse_args(argv)
+    generate(options.path, options.size, options.seed)
+
+
+if __name__ == "__main__":
+    main()
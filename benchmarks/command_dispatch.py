@@ -0,0 +1,76 @@
+"""Times CommandParser dispatch for every verb.
+
+The player does nothing, so the timings are the cost of finding and
+validating a command, without and with CommandMetrics recording it. Run
+with: python3 -m benchmarks.command_dispatch
+"""
+
+import timeit
+
+from src.command_metrics import CommandMetrics
+from src.command_parser import CommandParser
+
+COMMANDS = [
+    ["NUMBER_OF_VIDEOS"],
+    ["SHOW_ALL_VIDEOS"],
+    ["PLAY", "video_id"],
+    ["PLAY_RANDOM"],
+    ["STOP"],
+    ["PAUSE"],
+    ["CONTINUE"],
+    ["SHOW_PLAYING"],
+    ["CREATE_PLAYLIST", "playlist"],
+    ["ADD_TO_PLAYLIST", "playlist", "video_id"],
+    ["REMOVE_FROM_PLAYLIST", "playlist", "video_id"],
+    ["CLEAR_PLAYLIST", "playlist"],
+    ["DELETE_PLAYLIST", "playlist"],
+    ["SHOW_PLAYLIST", "playlist"],
+    ["SHOW_ALL_PLAYLISTS"],
+    ["SEARCH_VIDEOS", "term"],
+    ["SEARCH_VIDEOS_TOP", "term"],
+    ["SEARCH_VIDEOS_FUZZY", "term"],
+    ["SEARCH_VIDEOS_WITH_TAG", "#tag"],
+    ["QUERY", "#tag", "AND", "term"],
+    ["FLAG_VIDEO", "video_id", "reason"],
+    ["ALLOW_VIDEO", "video_id"],
+    ["STATS"],
+    ["HELP"],
+]
+
+
+class NullSink:
+    """An output sink dropping everything written to it."""
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+class NullPlayer:
+    """A player whose commands do nothing."""
+
+    # Read by the parser to leave the time spent answering out of latencies.
+    answer_nanoseconds = 0
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def main(number=200000):
+    parser = CommandParser(NullPlayer(), NullSink())
+    measured = CommandParser(
+        NullPlayer(), NullSink(), metrics=CommandMetrics())
+    print(f"{'':<24}{'plain':>11}{'measured':>11}")
+    for command in COMMANDS:
+        seconds = timeit.timeit(
+            lambda: parser.execute_command(command), number=number)
+        measured_seconds = timeit.timeit(
+            lambda: measured.execute_command(command), number=number)
+        print(f"{command[0]:<24}{seconds / number * 1e9:8.0f} ns"
+              f"{measured_seconds / number * 1e9:8.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
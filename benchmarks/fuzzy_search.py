@@ -0,0 +1,81 @@
+"""Compares fuzzy title searches through the BK-tree with a brute-force
+Levenshtein scan of every title.
+
+The queries are title words of decreasing frequency with a letter
+dropped, searched with the default number of tolerated typos. Both ways
+must find the same videos. Run with:
+python3 -m benchmarks.fuzzy_search --size 1000000
+"""
+
+from pathlib import Path
+import argparse
+import tempfile
+import time
+
+from benchmarks.catalog import generate
+from benchmarks.catalog import terms
+from src.fuzzy_index import default_max_distance
+from src.fuzzy_index import levenshtein
+from src.fuzzy_index import title_words
+from src.video_library import VideoLibrary
+
+
+def brute_force(titles, term, max_distance) -> int:
+    """Returns the number of titles with a word within max_distance of
+    term, computing the distance to every word of every title."""
+    return sum(
+        any(levenshtein(term, word, max_distance) <= max_distance
+            for word in title_words(title))
+        for title in titles)
+
+
+def queries(count) -> list:
+    """Returns count misspelled words, from the most to the least common
+    word of the generated catalogs."""
+    words, _ = terms()
+    step = max(1, len(words) // count)
+    return [word[:len(word) // 2] + word[len(word) // 2 + 1:]
+            for word in words[::step][:count]]
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    arguments.add_argument("--size", type=int, default=1000000)
+    arguments.add_argument("--catalog-dir", type=Path,
+                           default=Path(tempfile.gettempdir())
+                           / "video-benchmarks",
+                           help="where generated catalogs are kept")
+    arguments.add_argument("--queries", type=int, default=5)
+    options = arguments.parse_args(argv)
+
+    options.catalog_dir.mkdir(parents=True, exist_ok=True)
+    catalog = options.catalog_dir / f"catalog-{options.size}.txt"
+    if not catalog.exists():
+        generate(catalog, options.size)
+    start = time.perf_counter()
+    library = VideoLibrary(catalog)
+    print(f"loaded {len(library)} videos with the fuzzy index in "
+          f"{time.perf_counter() - start:.1f} s")
+    titles = [video.title for video in library.iter_videos_by_title()]
+
+    print(f"{'QUERY':<12}{'TYPOS':>6}{'RESULTS':>9}{'INDEX MS':>11}"
+          f"{'SCAN MS':>11}{'SPEEDUP':>9}")
+    for term in queries(options.queries):
+        max_distance = default_max_distance(term)
+        start = time.perf_counter()
+        found = len(library.search_titles_fuzzy(term, max_distance))
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        scanned = brute_force(titles, term, max_distance)
+        scan = time.perf_counter() - start
+        if scanned != found:
+            raise AssertionError(
+                f"{term}: the index found {found} videos, the scan "
+                f"{scanned}")
+        print(f"{term:<12}{max_distance:>6}{found:>9}{indexed * 1e3:>11.1f}"
+              f"{scan * 1e3:>11.1f}{scan / indexed:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
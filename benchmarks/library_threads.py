@@ -0,0 +1,82 @@
+"""Measures searches per second on a thread safe library shared by threads.
+
+Every thread searches titles and tags back to back for a while, with an
+optional writer flagging and allowing videos at the same time. Run with:
+python3 -m benchmarks.library_threads --catalog videos.txt --threads 1 2 4 8
+"""
+
+import argparse
+import itertools
+import threading
+import time
+
+from src.video_library import VideoLibrary
+
+
+def _searcher(library, terms, tags, stop, counts):
+    searches = 0
+    for term, tag in zip(itertools.cycle(terms), itertools.cycle(tags)):
+        if stop.is_set():
+            break
+        library.search_titles(term)
+        library.search_tag(tag)
+        searches += 2
+    counts.append(searches)
+
+
+def _flagger(library, video_ids, stop, counts):
+    writes = 0
+    for video_id in itertools.cycle(video_ids):
+        if stop.is_set():
+            break
+        library.flag_video(video_id, "benchmark")
+        library.allow_video(video_id)
+        writes += 2
+    counts.append(writes)
+
+
+def run(library, threads, seconds, flagging):
+    """Returns the searches and flag changes per second with threads."""
+    videos = library.get_all_videos()[:1000]
+    terms = [video.title.split()[0][:4] for video in videos]
+    tags = [tag for video in videos for tag in video.tags] or ["#none"]
+    stop = threading.Event()
+    searches, writes = [], []
+    workers = [
+        threading.Thread(
+            target=_searcher, args=(library, terms, tags, stop, searches))
+        for _ in range(threads)]
+    if flagging:
+        workers.append(threading.Thread(
+            target=_flagger,
+            args=(library, [video.video_id for video in videos], stop,
+                  writes)))
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(searches) / seconds, sum(writes) / seconds
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("--catalog", help="catalog file to load")
+    arguments.add_argument("--threads", type=int, nargs="+",
+                           default=[1, 2, 4, 8])
+    arguments.add_argument("--seconds", type=float, default=2.0)
+    arguments.add_argument("--no-flagging", action="store_true",
+                           help="only search, without a flagging thread")
+    options = arguments.parse_args(argv)
+    library = VideoLibrary(options.catalog, thread_safe=True)
+    library.get_all_videos()
+    for threads in options.threads:
+        searches, writes = run(library, threads, options.seconds,
+                               not options.no_flagging)
+        print(f"{threads} threads: {searches:.0f} searches/s, "
+              f"{writes:.0f} flag changes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""A load generator for the command server.
+
+Opens idle connections, then runs clients sending commands back to back
+and reports the throughput and latency percentiles. Without --port a
+server is started in this process on the default catalog.
+
+Run with: python3 -m benchmarks.server_load --idle 2000 --clients 50
+"""
+
+import argparse
+import asyncio
+import itertools
+import resource
+import time
+
+from src.run import PROMPT
+from src.server import CommandServer
+
+# Commands that never ask a question, so the replies end with a prompt.
+COMMANDS = [
+    "PLAY amazing_cats_video_id",
+    "SHOW_PLAYING",
+    "PAUSE",
+    "CONTINUE",
+    "STOP",
+    "NUMBER_OF_VIDEOS",
+    "SHOW_ALL_VIDEOS",
+    "CREATE_PLAYLIST load_playlist",
+    "ADD_TO_PLAYLIST load_playlist funny_dogs_video_id",
+    "SHOW_PLAYLIST load_playlist",
+    "REMOVE_FROM_PLAYLIST load_playlist funny_dogs_video_id",
+    "PLAY_RANDOM",
+]
+
+
+def _raise_open_files_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def _connect(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    await reader.readuntil(PROMPT.encode())
+    return reader, writer
+
+
+async def _client(host, port, number, latencies):
+    reader, writer = await _connect(host, port)
+    prompt = PROMPT.encode()
+    for command in itertools.islice(itertools.cycle(COMMANDS), number):
+        start = time.perf_counter()
+        writer.write(f"{command}\n".encode())
+        await reader.readuntil(prompt)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+    await writer.wait_closed()
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(host, port, idle, clients, commands):
+    server = None
+    if port is None:
+        server = CommandServer()
+        listener = await server.start(host, 0)
+        port = listener.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    idle_connections = []
+    for wave in range(0, idle, 500):
+        idle_connections += await asyncio.gather(
+            *(_connect(host, port) for _ in range(min(500, idle - wave))))
+    print(f"opened {idle} idle connections in "
+          f"{time.perf_counter() - start:.2f}s")
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(_client(host, port, commands, latencies) for _ in range(clients)))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    print(f"{len(latencies)} commands from {clients} clients in "
+          f"{seconds:.2f}s ({len(latencies) / seconds:.0f} commands/s)")
+    print("latency p50 {:.2f}ms p95 {:.2f}ms p99 {:.2f}ms".format(
+        *(_percentile(latencies, p) * 1e3 for p in (0.5, 0.95, 0.99))))
+
+    for _, writer in idle_connections:
+        writer.close()
+        await writer.wait_closed()
+    if server is not None:
+        # Let the server notice the closed connections before stopping.
+        await asyncio.sleep(0.1)
+        listener.close()
+        await listener.wait_closed()
+        server.close()
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("--host", default="127.0.0.1")
+    arguments.add_argument("--port", type=int)
+    arguments.add_argument("--idle", type=int, default=1000)
+    arguments.add_argument("--clients", type=int, default=50)
+    arguments.add_argument("--commands", type=int, default=200,
+                           help="commands sent by each client")
+    options = arguments.parse_args(argv)
+    _raise_open_files_limit()
+    asyncio.run(run(options.host, options.port, options.idle,
+                    options.clients, options.commands))
+
+
+if __name__ == "__main__":
+    main()
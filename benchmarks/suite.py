@@ -0,0 +1,240 @@
+"""Times loading the catalog and every command on synthetic catalogs.
+
+For each catalog size and library backend, the catalog is generated (and
+kept for later runs), loaded, 1% of its videos are flagged, then every
+command verb is executed through CommandParser. Commands changing the
+state are timed in pairs undoing each other, so every repetition starts
+from the same state.
+
+Results are printed as a table and can be written as JSON with --json.
+Given the JSON of an earlier run with --baseline, the table compares the
+two and flags the slowdowns. Run with:
+python3 -m benchmarks.suite --sizes 1000 100000 --json results.json
+"""
+
+from pathlib import Path
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+from benchmarks.catalog import flagged_rows
+from benchmarks.catalog import generate
+from benchmarks.catalog import terms
+from benchmarks.catalog import video_id
+from src.command_parser import CommandParser
+from src.output_sink import MemorySink
+from src.sqlite_library import SqliteVideoLibrary
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def _sqlite_library(catalog, work_dir, **options):
+    database = work_dir / f"{catalog.stem}.db"
+    for path in work_dir.glob(f"{database.name}*"):
+        path.unlink()
+    return SqliteVideoLibrary(database, catalog, **options)
+
+
+BACKENDS = {
+    "memory": lambda catalog, work_dir, **options: VideoLibrary(
+        catalog, **options),
+    "compact": lambda catalog, work_dir, **options: VideoLibrary(
+        catalog, compact=True, **options),
+    "sqlite": _sqlite_library,
+}
+
+
+def cases(size: int) -> list:
+    """Returns the name, setup commands and timed commands of every case
+    for a catalog of size videos."""
+    words, tags = terms()
+    first, middle = video_id(0), video_id(size // 2)
+    playlist = [video_id(row) for row in range(0, size, max(1, size // 100))]
+    return [
+        ("NUMBER_OF_VIDEOS", [], ["NUMBER_OF_VIDEOS"]),
+        ("SHOW_ALL_VIDEOS", [], ["SHOW_ALL_VIDEOS"]),
+        ("SHOW_ALL_VIDEOS page", [],
+         [f"SHOW_ALL_VIDEOS 20 {size // 2}"]),
+        ("SEARCH_VIDEOS common word", [], [f"SEARCH_VIDEOS {words[0]}"]),
+        ("SEARCH_VIDEOS common word first page", [],
+         [f"SEARCH_VIDEOS {words[0]} 20"]),
+        ("SEARCH_VIDEOS rare word", [], [f"SEARCH_VIDEOS {words[-1]}"]),
+        ("SEARCH_VIDEOS two letters", [], [f"SEARCH_VIDEOS {words[0][:2]}"]),
+        ("SEARCH_VIDEOS_TOP common word", [],
+         [f"SEARCH_VIDEOS_TOP {words[0]} 10"]),
+        ("SEARCH_VIDEOS_TOP rare word", [],
+         [f"SEARCH_VIDEOS_TOP {words[-1]} 10"]),
+        ("SEARCH_VIDEOS_FUZZY misspelled word", [],
+         [f"SEARCH_VIDEOS_FUZZY {words[100][1:]}"]),
+        ("SEARCH_VIDEOS_WITH_TAG common tag", [],
+         [f"SEARCH_VIDEOS_WITH_TAG {tags[0]}"]),
+        ("SEARCH_VIDEOS_WITH_TAG common tag first page", [],
+         [f"SEARCH_VIDEOS_WITH_TAG {tags[0]} 20"]),
+        ("SEARCH_VIDEOS_WITH_TAG rare tag", [],
+         [f"SEARCH_VIDEOS_WITH_TAG {tags[-1]}"]),
+        ("QUERY tag AND word AND NOT tag", [],
+         [f"QUERY {tags[0]} AND title:{words[0]} AND NOT {tags[1]}"]),
+        ("QUERY rare tag OR rare word", [],
+         [f"QUERY {tags[-1]} OR title:{words[-1]}"]),
+        ("PLAY", [], [f"PLAY {first}"]),
+        ("PLAY_RANDOM", [], ["PLAY_RANDOM"]),
+        ("PLAY + STOP", [], [f"PLAY {first}", "STOP"]),
+        ("PAUSE + CONTINUE", [f"PLAY {first}"], ["PAUSE", "CONTINUE"]),
+        ("SHOW_PLAYING", [f"PLAY {first}"], ["SHOW_PLAYING"]),
+        ("FLAG_VIDEO + ALLOW_VIDEO", [],
+         [f"FLAG_VIDEO {middle} reason", f"ALLOW_VIDEO {middle}"]),
+        ("CREATE_PLAYLIST + DELETE_PLAYLIST", [],
+         ["CREATE_PLAYLIST created", "DELETE_PLAYLIST created"]),
+        ("ADD_TO_PLAYLIST + REMOVE_FROM_PLAYLIST",
+         ["CREATE_PLAYLIST edited"],
+         [f"ADD_TO_PLAYLIST edited {middle}",
+          f"REMOVE_FROM_PLAYLIST edited {middle}"]),
+        ("ADD_TO_PLAYLIST + CLEAR_PLAYLIST", ["CREATE_PLAYLIST cleared"],
+         [f"ADD_TO_PLAYLIST cleared {middle}", "CLEAR_PLAYLIST cleared"]),
+        ("SHOW_PLAYLIST 100 videos",
+         ["CREATE_PLAYLIST shown"] + [
+             f"ADD_TO_PLAYLIST shown {video}" for video in playlist],
+         ["SHOW_PLAYLIST shown"]),
+        ("SHOW_ALL_PLAYLISTS", [], ["SHOW_ALL_PLAYLISTS"]),
+    ]
+
+
+def _time(parser, output, commands, min_seconds, max_repeats) -> list:
+    """Returns the seconds taken by each repetition of the commands."""
+    commands = [command.split() for command in commands]
+    timings = []
+    total = 0.0
+    while total < min_seconds and len(timings) < max_repeats:
+        start = time.perf_counter()
+        for command in commands:
+            parser.execute_command(command)
+        seconds = time.perf_counter() - start
+        output.clear()
+        timings.append(seconds)
+        total += seconds
+    return timings
+
+
+def _result(backend, size, benchmark, timings) -> dict:
+    return {
+        "backend": backend,
+        "size": size,
+        "benchmark": benchmark,
+        "median": statistics.median(timings),
+        "best": min(timings),
+        "repeats": len(timings),
+    }
+
+
+def run(backend, size, catalog, work_dir, min_seconds, max_repeats,
+        search_cache_size=0):
+    """Yields the result of every case on one backend and catalog."""
+    start = time.perf_counter()
+    library = BACKENDS[backend](
+        catalog, work_dir, search_cache_size=search_cache_size)
+    len(library)
+    yield _result(backend, size, "load", [time.perf_counter() - start])
+    for row in flagged_rows(size):
+        library.flag_video(video_id(row), "benchmark")
+
+    for benchmark, setup, commands in cases(size):
+        output = MemorySink()
+        parser = CommandParser(VideoPlayer(library, output, lambda: "no"))
+        for command in setup:
+            parser.execute_command(command.split())
+        yield _result(backend, size, benchmark, _time(
+            parser, output, commands, min_seconds, max_repeats))
+    if hasattr(library, "close"):
+        library.close()
+
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def _key(result):
+    return result["backend"], result["size"], result["benchmark"]
+
+
+def _format(result, baseline, threshold) -> str:
+    line = (f"{result['backend']:<8}{result['size']:>10}  "
+            f"{result['benchmark']:<40}{result['median'] * 1e3:>12.3f} ms"
+            f"{result['repeats']:>7}x")
+    before = baseline.get(_key(result))
+    if before is not None and before["median"] > 0:
+        ratio = result["median"] / before["median"]
+        line += f"{ratio:>8.2f}x baseline"
+        if ratio > threshold:
+            line += "  SLOWER"
+    return line
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    arguments.add_argument("--sizes", type=int, nargs="+",
+                           default=[1000, 10000, 100000],
+                           help="catalog sizes, up to 10000000")
+    arguments.add_argument("--backends", nargs="+", choices=BACKENDS,
+                           default=list(BACKENDS))
+    arguments.add_argument("--catalog-dir", type=Path,
+                           default=Path(tempfile.gettempdir())
+                           / "video-benchmarks",
+                           help="where generated catalogs are kept")
+    arguments.add_argument("--min-seconds", type=float, default=0.2,
+                           help="time spent repeating each case")
+    arguments.add_argument("--max-repeats", type=int, default=1000)
+    arguments.add_argument("--search-cache", type=int, default=0,
+                           metavar="N",
+                           help="search results cached by the libraries")
+    arguments.add_argument("--json", type=Path,
+                           help="write the results to this file")
+    arguments.add_argument("--baseline", type=Path,
+                           help="JSON results of an earlier run to compare")
+    arguments.add_argument("--threshold", type=float, default=1.2,
+                           help="slowdown ratio reported as SLOWER")
+    options = arguments.parse_args(argv)
+
+    baseline = {}
+    if options.baseline is not None:
+        with open(options.baseline) as baseline_file:
+            baseline = {_key(result): result
+                        for result in json.load(baseline_file)["results"]}
+    options.catalog_dir.mkdir(parents=True, exist_ok=True)
+    results = []
+    for size in options.sizes:
+        catalog = options.catalog_dir / f"catalog-{size}.txt"
+        if not catalog.exists():
+            generate(catalog, size)
+        for backend in options.backends:
+            for result in run(backend, size, catalog, options.catalog_dir,
+                              options.min_seconds, options.max_repeats,
+                              options.search_cache):
+                print(_format(result, baseline, options.threshold),
+                      flush=True)
+                results.append(result)
+    if options.json is not None:
+        with open(options.json, "w") as json_file:
+            json.dump({"metadata": _metadata(), "results": results},
+                      json_file, indent=1)
+            json_file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
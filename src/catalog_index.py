@@ -0,0 +1,111 @@
+"""A memory-mapped catalog file indexed by video id."""
+
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+import csv
+import mmap
+import re
+
+
+# The video id is the second field of a catalog line. Lines quoting either
+# of their first two fields match without an id and are parsed as csv.
+_VIDEO_ID = re.compile(
+    rb'^(?:[^|\n"]*\|([^|\n"]*)\||[^\n]*")', re.MULTILINE)
+
+
+def _quoted_id(line: bytes):
+    """Returns the video id of a catalog line using csv quoting, or None
+    if the line has no id field."""
+    fields = next(csv.reader([line.decode()], delimiter="|"), [])
+    if len(fields) < 2:
+        return None
+    return fields[1].strip().encode()
+
+
+class _SortedVideoIds(Sequence):
+    """The indexed video ids in ascending order, for bisect."""
+
+    def __init__(self, catalog_index):
+        self._catalog_index = catalog_index
+
+    def __len__(self) -> int:
+        return len(self._catalog_index._line_starts)
+
+    def __getitem__(self, i) -> bytes:
+        return self._catalog_index._id_at(i)
+
+
+class CatalogIndex:
+    """A catalog file mapped in memory, with the byte range of each video.
+
+    Only the offsets are read up front: three arrays sorted by video id
+    hold where each line and its video id start and where the id ends.
+    Lines with quoted fields are parsed as csv instead, and kept by id in
+    a dictionary. Lines are decoded when they are asked for. Each video is
+    expected on its own line.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Path of the catalog file.
+        """
+        self._map = b""
+        with open(path, "rb") as catalog_file:
+            if catalog_file.seek(0, 2):
+                self._map = mmap.mmap(
+                    catalog_file.fileno(), 0, access=mmap.ACCESS_READ)
+        line_starts = array("q")
+        id_starts = array("q")
+        id_ends = array("q")
+        self._quoted_starts = {}
+        for match in _VIDEO_ID.finditer(self._map):
+            field = match.group(1)
+            if field is None:
+                video_id = _quoted_id(self._line_at(match.start()))
+                if video_id is not None:
+                    self._quoted_starts[video_id] = match.start()
+                continue
+            start = match.start(1) + len(field) - len(field.lstrip())
+            line_starts.append(match.start())
+            id_starts.append(start)
+            id_ends.append(start + len(field.strip()))
+        # Sorting is stable, so duplicate ids stay in file order.
+        order = sorted(range(len(line_starts)),
+                       key=lambda i: self._map[id_starts[i]:id_ends[i]])
+        self._line_starts = array("q", (line_starts[i] for i in order))
+        self._id_starts = array("q", (id_starts[i] for i in order))
+        self._id_ends = array("q", (id_ends[i] for i in order))
+
+    def __len__(self) -> int:
+        return len(self._line_starts) + len(self._quoted_starts)
+
+    def _id_at(self, i: int) -> bytes:
+        return self._map[self._id_starts[i]:self._id_ends[i]]
+
+    def _line_at(self, start: int) -> bytes:
+        end = self._map.find(b"\n", start)
+        if end < 0:
+            end = len(self._map)
+        return self._map[start:end]
+
+    def line(self, video_id: str):
+        """Returns the catalog line of a video id, or None if it is unknown.
+
+        When an id appears on several lines the last one is returned, the
+        same line a full load keeps.
+        """
+        key = video_id.encode()
+        start = self._quoted_starts.get(key, -1)
+        i = bisect_right(_SortedVideoIds(self), key) - 1
+        if i >= 0 and self._id_at(i) == key:
+            start = max(start, self._line_starts[i])
+        if start < 0:
+            return None
+        return self._line_at(start).decode()
+
+    def close(self) -> None:
+        """Unmaps the catalog file."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
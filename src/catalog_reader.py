@@ -0,0 +1,27 @@
+"""Reading the videos of a catalog file, one video per line."""
+
+import csv
+
+
+# Helper Wrapper around CSV reader to strip whitespace from around
+# each item.
+def _csv_reader_with_strip(reader):
+    yield from ((item.strip() for item in line) for line in reader)
+
+
+def parse_catalog(lines):
+    """Yields the title, url and tags of every video in catalog lines."""
+    reader = _csv_reader_with_strip(csv.reader(lines, delimiter="|"))
+    for video_info in reader:
+        title, url, tags = video_info
+        yield (
+            title,
+            url,
+            [tag.strip() for tag in tags.split(",")] if tags else [],
+        )
+
+
+def read_catalog(path):
+    """Yields the title, url and tags of every video in a catalog file."""
+    with open(path) as video_file:
+        yield from parse_catalog(video_file)
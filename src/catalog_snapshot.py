@@ -0,0 +1,147 @@
+"""Binary snapshots of a parsed catalog, stored next to the catalog file."""
+
+from pathlib import Path
+import gc
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+
+
+# Bump whenever the layout of the snapshotted state changes.
+SNAPSHOT_VERSION = 4
+
+
+def snapshot_path(path, mode: str) -> Path:
+    """Returns where the snapshot of a catalog file is kept.
+
+    Args:
+        path: Path of the catalog file.
+        mode: Name of the library storage mode the snapshot is for.
+    """
+    path = Path(path)
+    return path.with_name(f"{path.name}.{mode}.snapshot")
+
+
+def _file_hash(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_key(path) -> dict:
+    """Returns the version, size, modification time and hash of a catalog.
+
+    Take the key before parsing the catalog, so a change made while it is
+    parsed invalidates the snapshot.
+    """
+    status = os.stat(path)
+    return {
+        "version": SNAPSHOT_VERSION,
+        "size": status.st_size,
+        "mtime": status.st_mtime_ns,
+        "hash": _file_hash(path),
+    }
+
+
+def source_unchanged(key: dict, path) -> bool:
+    """Returns whether a catalog still matches the source_key taken of it.
+
+    It does when it has the size and modification time of the key.
+    Otherwise the catalog is hashed and compared.
+    """
+    status = os.stat(path)
+    if key.get("version") != SNAPSHOT_VERSION:
+        return False
+    if (key.get("size"), key.get("mtime")) == (
+            status.st_size, status.st_mtime_ns):
+        return True
+    return key.get("hash") == _file_hash(path)
+
+
+def _load_without_gc(snapshot_file):
+    """Unpickles with the garbage collector paused, as the millions of
+    objects created would otherwise trigger many useless collections."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.load(snapshot_file)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _trusted(snapshot_file) -> bool:
+    """Returns whether only the current user could have written a
+    snapshot, as unpickling it runs whatever code it names.
+
+    It must be owned by the user and not writable by anyone else.
+    """
+    if not hasattr(os, "getuid"):
+        return True
+    status = os.fstat(snapshot_file.fileno())
+    return (status.st_uid == os.getuid()
+            and not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+
+def load_snapshot(path, mode: str, fields):
+    """Returns the snapshotted state of a catalog file, if still valid.
+
+    A snapshot is valid while source_unchanged holds for the catalog.
+    Snapshots another user could have written are never loaded. A corrupt
+    snapshot is not an error, the catalog is then parsed again.
+
+    Args:
+        path: Path of the catalog file.
+        mode: Name of the library storage mode the snapshot is for.
+        fields: Names of the values the state must hold.
+
+    Returns:
+        A dictionary with the fields of the state passed to
+        save_snapshot, or None when there is no valid snapshot.
+    """
+    try:
+        with open(snapshot_path(path, mode), "rb") as snapshot_file:
+            if not _trusted(snapshot_file):
+                return None
+            key = pickle.load(snapshot_file)
+            if not source_unchanged(key, path):
+                return None
+            state = _load_without_gc(snapshot_file)
+            return {name: state[name] for name in fields}
+    except Exception:
+        # Unpickling garbage can raise almost any error.
+        return None
+
+
+def save_snapshot(path, mode: str, key: dict, state) -> None:
+    """Writes the snapshot of a catalog file, replacing any older one.
+
+    The snapshot is written to a temporary file first, so readers never
+    see a partial snapshot. Failing to write is not an error, the catalog
+    is then parsed again on the next start.
+
+    Args:
+        path: Path of the catalog file.
+        mode: Name of the library storage mode the snapshot is for.
+        key: The source_key of the catalog the state was parsed from.
+        state: The picklable parsed state of the catalog.
+    """
+    target = snapshot_path(path, mode)
+    try:
+        handle, temporary = tempfile.mkstemp(
+            dir=target.parent, prefix=target.name, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as snapshot_file:
+                pickle.dump(key, snapshot_file)
+                pickle.dump(state, snapshot_file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, target)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    except OSError:
+        pass
@@ -0,0 +1,157 @@
+"""Counts, errors and latency histograms of the executed commands."""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+# Bits of each latency kept by the histogram buckets, so a bucket spans at
+# most 1/8 of its lower bound.
+_PRECISION_BITS = 3
+_SUB_BUCKETS = 1 << _PRECISION_BITS
+# Latencies below this many nanoseconds get a bucket each.
+_EXACT_LIMIT = _SUB_BUCKETS << 1
+_BUCKETS = 64 * _SUB_BUCKETS
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def _bucket(nanoseconds: int) -> int:
+    """Returns the histogram bucket of a latency."""
+    if nanoseconds < _EXACT_LIMIT:
+        return nanoseconds
+    shift = nanoseconds.bit_length() - _PRECISION_BITS - 1
+    return (shift << _PRECISION_BITS) + (nanoseconds >> shift)
+
+
+def _bucket_middle(bucket: int) -> float:
+    """Returns the latency in the middle of a histogram bucket."""
+    if bucket < _EXACT_LIMIT:
+        return float(bucket)
+    shift = (bucket >> _PRECISION_BITS) - 1
+    lowest = (bucket - (shift << _PRECISION_BITS)) << shift
+    return lowest + ((1 << shift) - 1) / 2
+
+
+class _VerbMetrics:
+    """The count, errors and latency histogram of one verb."""
+
+    __slots__ = ("count", "errors", "nanoseconds", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.nanoseconds = 0
+        self.buckets = [0] * _BUCKETS
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the latency in seconds that fraction of the commands
+        took at most, to within 1/16."""
+        rank = max(1, round(fraction * self.count))
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return _bucket_middle(bucket) / 1e9
+        return 0.0
+
+
+class CommandMetrics:
+    """A class used to collect the latency of the commands of a
+    CommandParser.
+
+    One instance can be shared by the parsers of many threads. Recording a
+    command costs a lock and a few additions, percentiles are only
+    computed when asked for.
+    """
+
+    def __init__(self, dump_path=None, dump_interval: float = 60.0):
+        """
+        Args:
+            dump_path: File the metrics are written to as JSON, replaced
+                every dump_interval seconds. Never written if None.
+            dump_interval: Seconds between two dumps, checked whenever a
+                command is recorded.
+
+        Raises:
+            OSError: If the dump file cannot be written, which is checked
+                by a first dump.
+        """
+        self._lock = threading.Lock()
+        self._verbs = {}
+        self._dump_path = dump_path
+        self._dump_interval = dump_interval
+        self._next_dump = None
+        if dump_path is not None:
+            self.dump()
+
+    def record(self, verb: str, nanoseconds: int, error: bool = False):
+        """Adds a command that took nanoseconds to execute."""
+        with self._lock:
+            metrics = self._verbs.get(verb)
+            if metrics is None:
+                metrics = self._verbs[verb] = _VerbMetrics()
+            metrics.count += 1
+            metrics.errors += error
+            metrics.nanoseconds += nanoseconds
+            metrics.buckets[_bucket(nanoseconds)] += 1
+        if self._next_dump is not None and time.monotonic() >= self._next_dump:
+            # A command must not fail because its statistics could not be
+            # written, the next dump tries again.
+            try:
+                self.dump()
+            except OSError as error:
+                print(f"Cannot write the command statistics: {error}",
+                      file=sys.stderr)
+
+    def summary(self) -> dict:
+        """Returns the count, errors, total seconds and latency percentiles
+        in seconds of each verb."""
+        with self._lock:
+            verbs = sorted(self._verbs.items())
+            return {
+                verb: {
+                    "count": metrics.count,
+                    "errors": metrics.errors,
+                    "seconds": metrics.nanoseconds / 1e9,
+                    **{f"p{round(fraction * 100)}":
+                       metrics.percentile(fraction)
+                       for fraction in PERCENTILES},
+                }
+                for verb, metrics in verbs
+            }
+
+    def report(self) -> str:
+        """Returns the summary as a table, one line per verb."""
+        lines = ["Command statistics:"]
+        lines.append(
+            f" {'COMMAND':<24}{'COUNT':>8}{'ERRORS':>8}"
+            f"{'P50 MS':>10}{'P95 MS':>10}{'P99 MS':>10}")
+        for verb, metrics in self.summary().items():
+            lines.append(
+                f" {verb:<24}{metrics['count']:>8}{metrics['errors']:>8}"
+                f"{metrics['p50'] * 1e3:>10.3f}{metrics['p95'] * 1e3:>10.3f}"
+                f"{metrics['p99'] * 1e3:>10.3f}")
+        return "".join(f"{line}\n" for line in lines)
+
+    def dump(self):
+        """Replaces the dump file with the current summary."""
+        if self._dump_path is None:
+            return
+        self._next_dump = time.monotonic() + self._dump_interval
+        summary = {"time": time.time(), "commands": self.summary()}
+        directory = os.path.dirname(os.path.abspath(self._dump_path))
+        handle, temporary = tempfile.mkstemp(
+            dir=directory, prefix=os.path.basename(self._dump_path),
+            suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as dump_file:
+                json.dump(summary, dump_file, indent=1)
+                dump_file.write("\n")
+            os.replace(temporary, self._dump_path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
@@ -1,145 +1,192 @@
 """A command parser class."""
 
 import textwrap
+import time
 from typing import Sequence
 
 
+# Words a QUERY command may have, which bounds the work it takes.
+_MAX_QUERY_WORDS = 64
+# The metrics of every unknown verb are recorded under this name, so
+# misspelled verbs cannot add entries without bound.
+UNKNOWN_VERB = "(unknown)"
+
+
 class CommandException(Exception):
     """A class used to represent a wrong command exception."""
     pass
 
 
+class Command:
+    """A class used to represent a command the parser can execute."""
+
+    def __init__(self, handler, arg_counts=None, usage=None):
+        """
+        Args:
+            handler: Called with the command arguments.
+            arg_counts: The numbers of arguments the command accepts. None
+                accepts any arguments and calls the handler without them.
+            usage: The CommandException message for a wrong number of
+                arguments.
+        """
+        self.handler = handler
+        self.arg_counts = arg_counts
+        self.usage = usage
+
+    def execute(self, args: Sequence[str]):
+        """Runs the handler, raises CommandException on wrong arguments."""
+        if self.arg_counts is None:
+            return self.handler()
+        if len(args) not in self.arg_counts:
+            raise CommandException(self.usage)
+        return self.handler(*args)
+
+
 class CommandParser:
     """A class used to parse and execute a user Command."""
 
-    def __init__(self, video_player):
+    def __init__(self, video_player, output=None, metrics=None):
+        """
+        Args:
+            video_player: The VideoPlayer running the commands.
+            output: The sink messages are written to, the player's output
+                if none is given.
+            metrics: The CommandMetrics recording the latency of every
+                command, if any. Without it commands are not measured.
+        """
         self._player = video_player
+        self.output = output if output is not None else video_player.output
+        self.metrics = metrics
+        self._commands = {}
+        player = video_player
+        self.register("NUMBER_OF_VIDEOS", Command(player.number_of_videos))
+        self.register("SHOW_ALL_VIDEOS", Command(
+            player.show_all_videos, (0, 1, 2),
+            "Please enter SHOW_ALL_VIDEOS command followed by an "
+            "optional page size and offset."))
+        self.register("PLAY", Command(
+            player.play_video, (1,),
+            "Please enter PLAY command followed by video_id."))
+        self.register("PLAY_RANDOM", Command(player.play_random_video))
+        self.register("STOP", Command(player.stop_video))
+        self.register("PAUSE", Command(player.pause_video))
+        self.register("CONTINUE", Command(player.continue_video))
+        self.register("SHOW_PLAYING", Command(player.show_playing))
+        self.register("CREATE_PLAYLIST", Command(
+            player.create_playlist, (1,),
+            "Please enter CREATE_PLAYLIST command followed by a "
+            "playlist name."))
+        self.register("ADD_TO_PLAYLIST", Command(
+            player.add_to_playlist, (2,),
+            "Please enter ADD_TO_PLAYLIST command followed by a "
+            "playlist name and video_id to add."))
+        self.register("REMOVE_FROM_PLAYLIST", Command(
+            player.remove_from_playlist, (2,),
+            "Please enter REMOVE_FROM_PLAYLIST command followed by a "
+            "playlist name and video_id to remove."))
+        self.register("CLEAR_PLAYLIST", Command(
+            player.clear_playlist, (1,),
+            "Please enter CLEAR_PLAYLIST command followed by a "
+            "playlist name."))
+        self.register("DELETE_PLAYLIST", Command(
+            player.delete_playlist, (1,),
+            "Please enter DELETE_PLAYLIST command followed by a "
+            "playlist name."))
+        self.register("SHOW_PLAYLIST", Command(
+            player.show_playlist, (1,),
+            "Please enter SHOW_PLAYLIST command followed by a "
+            "playlist name."))
+        self.register("SHOW_ALL_PLAYLISTS", Command(
+            player.show_all_playlists))
+        self.register("SEARCH_VIDEOS", Command(
+            player.search_videos, (1, 2, 3),
+            "Please enter SEARCH_VIDEOS command followed by a "
+            "search term and an optional page size and offset."))
+        self.register("SEARCH_VIDEOS_TOP", Command(
+            player.search_videos_top, (1, 2),
+            "Please enter SEARCH_VIDEOS_TOP command followed by a "
+            "search term and an optional limit."))
+        self.register("SEARCH_VIDEOS_FUZZY", Command(
+            player.search_videos_fuzzy, (1, 2),
+            "Please enter SEARCH_VIDEOS_FUZZY command followed by a "
+            "search term and an optional maximum distance."))
+        self.register("SEARCH_VIDEOS_WITH_TAG", Command(
+            player.search_videos_tag, (1, 2, 3),
+            "Please enter SEARCH_VIDEOS_WITH_TAG command followed by a "
+            "video tag and an optional page size and offset."))
+        self.register("QUERY", Command(
+            player.query_videos, range(1, _MAX_QUERY_WORDS + 1),
+            f"Please enter QUERY command followed by a query of up to "
+            f"{_MAX_QUERY_WORDS} words."))
+        self.register("FLAG_VIDEO", Command(
+            player.flag_video, (1, 2),
+            "Please enter FLAG_VIDEO command followed by a "
+            "video_id and an optional flag reason."))
+        self.register("ALLOW_VIDEO", Command(
+            player.allow_video, (1,),
+            "Please enter ALLOW_VIDEO command followed by a "
+            "video_id."))
+        self.register("STATS", Command(self._show_stats))
+        self.register("HELP", Command(self._get_help))
+
+    def register(self, verb: str, command: Command):
+        """Adds a command, replacing any command with the same verb.
+
+        Args:
+            verb: The command name, matched ignoring case.
+            command: The Command to run for it.
+        """
+        self._commands[verb.upper()] = command
 
-    def execute_command(self, command: Sequence[str]):
+    def execute_command(self, command: Sequence[str]) -> bool:
         """Executes the user command. Expects the command to be upper case.
            Raises CommandException if a command cannot be parsed.
+           Returns False if the verb is unknown, after telling the user,
+           and True otherwise.
         """
         if not command:
             raise CommandException(
                 "Please enter a valid command, "
                 "type HELP for a list of available commands.")
 
-        if command[0].upper() == "NUMBER_OF_VIDEOS":
-            self._player.number_of_videos()
-
-        elif command[0].upper() == "SHOW_ALL_VIDEOS":
-            self._player.show_all_videos()
-
-        elif command[0].upper() == "PLAY":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter PLAY command followed by video_id.")
-            self._player.play_video(command[1])
-
-        elif command[0].upper() == "PLAY_RANDOM":
-            self._player.play_random_video()
-
-        elif command[0].upper() == "STOP":
-            self._player.stop_video()
-
-        elif command[0].upper() == "PAUSE":
-            self._player.pause_video()
-
-        elif command[0].upper() == "CONTINUE":
-            self._player.continue_video()
-
-        elif command[0].upper() == "SHOW_PLAYING":
-            self._player.show_playing()
-
-        elif command[0].upper() == "CREATE_PLAYLIST":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter CREATE_PLAYLIST command followed by a "
-                    "playlist name.")
-            self._player.create_playlist(command[1])
-
-        elif command[0].upper() == "ADD_TO_PLAYLIST":
-            if len(command) != 3:
-                raise CommandException(
-                    "Please enter ADD_TO_PLAYLIST command followed by a "
-                    "playlist name and video_id to add.")
-            self._player.add_to_playlist(command[1], command[2])
-
-        elif command[0].upper() == "REMOVE_FROM_PLAYLIST":
-            if len(command) != 3:
-                raise CommandException(
-                    "Please enter REMOVE_FROM_PLAYLIST command followed by a "
-                    "playlist name and video_id to remove.")
-            self._player.remove_from_playlist(command[1], command[2])
-
-        elif command[0].upper() == "CLEAR_PLAYLIST":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter CLEAR_PLAYLIST command followed by a "
-                    "playlist name.")
-            self._player.clear_playlist(command[1])
-
-        elif command[0].upper() == "DELETE_PLAYLIST":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter DELETE_PLAYLIST command followed by a "
-                    "playlist name.")
-            self._player.delete_playlist(command[1])
-
-        elif command[0].upper() == "SHOW_PLAYLIST":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter SHOW_PLAYLIST command followed by a "
-                    "playlist name.")
-            self._player.show_playlist(command[1])
-
-        elif command[0].upper() == "SHOW_ALL_PLAYLISTS":
-            self._player.show_all_playlists()
-
-        elif command[0].upper() == "SEARCH_VIDEOS":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter SEARCH_VIDEOS command followed by a "
-                    "search term.")
-            self._player.search_videos(command[1])
-
-        elif command[0].upper() == "SEARCH_VIDEOS_WITH_TAG":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter SEARCH_VIDEOS_WITH_TAG command followed by a "
-                    "video tag.")
-            self._player.search_videos_tag(command[1])
-
-        elif command[0].upper() == "FLAG_VIDEO":
-            if len(command) == 3:
-                self._player.flag_video(command[1], command[2])
-            elif len(command) == 2:
-                self._player.flag_video(command[1])
-            else:
-                raise CommandException(
-                    "Please enter FLAG_VIDEO command followed by a "
-                    "video_id and an optional flag reason.")
-
-        elif command[0].upper() == "ALLOW_VIDEO":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter ALLOW_VIDEO command followed by a "
-                    "video_id.")
-            self._player.allow_video(command[1])
-
-        elif command[0].upper() == "HELP":
-            self._get_help()
-        else:
-            print(
+        verb = command[0].upper()
+        handler = self._commands.get(verb)
+        if handler is None:
+            self.output.write(
                 "Please enter a valid command, type HELP for a list of "
-                "available commands.")
+                "available commands.\n")
+            if self.metrics is not None:
+                self.metrics.record(UNKNOWN_VERB, 0, True)
+            return False
+        if self.metrics is None:
+            handler.execute(command[1:])
+            return True
+        # The time the user takes to answer a question is not latency.
+        answered = self._player.answer_nanoseconds
+        start = time.perf_counter_ns()
+        error = True
+        try:
+            handler.execute(command[1:])
+            error = False
+        finally:
+            nanoseconds = time.perf_counter_ns() - start - (
+                self._player.answer_nanoseconds - answered)
+            self.metrics.record(verb, nanoseconds, error)
+        return True
+
+    def _show_stats(self):
+        """Displays the count, errors and latencies of each command."""
+        if self.metrics is None:
+            self.output.write("Command statistics are disabled.\n")
+            return
+        self.output.write(self.metrics.report())
 
     def _get_help(self):
         """Displays all available commands to the user."""
         help_text = textwrap.dedent("""
         Available commands:
             NUMBER_OF_VIDEOS - Shows how many videos are in the library.
-            SHOW_ALL_VIDEOS - Lists all videos from the library.
+            SHOW_ALL_VIDEOS [<page_size> [<offset>]] - Lists all videos from the library, or page_size of them after the first offset.
             PLAY <video_id> - Plays specified video.
             PLAY_RANDOM - Plays a random video from the library.
             STOP - Stop the current video.
@@ -153,11 +200,15 @@ class CommandParser:
             DELETE_PLAYLIST <playlist_name> - Deletes the playlist.
             SHOW_PLAYLIST <playlist_name> - List all the videos in this playlist.
             SHOW_ALL_PLAYLISTS - Display all the available playlists.
-            SEARCH_VIDEOS <search_term> - Display all the videos whose titles contain the search_term.
-            SEARCH_VIDEOS_WITH_TAG <tag_name> -Display all videos whose tags contains the provided tag.
+            SEARCH_VIDEOS <search_term> [<page_size> [<offset>]] - Display all the videos whose titles contain the search_term, or one page of them.
+            SEARCH_VIDEOS_TOP <search_term> [<limit>] - Display the best limit (10 by default) videos whose titles contain the search_term, exact and then starting title matches first.
+            SEARCH_VIDEOS_FUZZY <search_term> [<max_distance>] - Display the videos with a title word within max_distance typos of the search_term, the closest first.
+            SEARCH_VIDEOS_WITH_TAG <tag_name> [<page_size> [<offset>]] -Display all videos whose tags contains the provided tag, or one page of them.
+            QUERY <query> - Display the videos matching a query such as #cat AND title:funny AND NOT #dog, combining tags and title terms with AND, OR, NOT and parentheses.
             FLAG_VIDEO <video_id> <flag_reason> - Mark a video as flagged.
             ALLOW_VIDEO <video_id> - Removes a flag from a video.
+            STATS - Shows the count, errors and latency percentiles of each command.
             HELP - Displays help.
             EXIT - Terminates the program execution.
         """)
-        print(help_text)
+        self.output.write(f"{help_text}\n")
@@ -0,0 +1,135 @@
+"""Edit distances and a BK-tree finding the words close to a misspelling."""
+
+import re
+
+
+_WORD = re.compile(r"\w+")
+
+
+def title_words(title) -> set:
+    """Returns the distinct lower case words of a title."""
+    return set(_WORD.findall(title.lower()))
+
+
+def default_max_distance(word) -> int:
+    """Returns the number of typos tolerated in a word of this length."""
+    if len(word) <= 2:
+        return 0
+    if len(word) <= 5:
+        return 1
+    return 2
+
+
+def levenshtein(a, b, limit=None) -> int:
+    """Returns the number of insertions, deletions and substitutions
+    turning a into b.
+
+    Args:
+        a: A word.
+        b: Another word.
+        limit: If given, any distance above limit is returned as
+            limit + 1, which is found sooner.
+    """
+    if a == b:
+        return 0
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # A typo leaves most of a word alone, and the start and end two words
+    # share do not change their distance.
+    start = 0
+    shortest = min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < shortest - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, a_char in enumerate(a, 1):
+        current = [i]
+        for j, b_char in enumerate(b):
+            best = previous[j] + (a_char != b_char)
+            other = previous[j + 1] + 1
+            if other < best:
+                best = other
+            other = current[j] + 1
+            if other < best:
+                best = other
+            current.append(best)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    if limit is not None and previous[-1] > limit:
+        return limit + 1
+    return previous[-1]
+
+
+class BKTree:
+    """A class used to find the words within an edit distance of a word.
+
+    Every word is a node whose children are keyed by their distance to it.
+    By the triangle inequality, a search for words within d of a word at
+    distance k of a node only descends into the children keyed k - d to
+    k + d, so it compares the word to a fraction of the tree.
+    The nodes are kept in flat lists, so deep trees pickle without
+    recursion.
+    """
+
+    __slots__ = ("_words", "_children")
+
+    def __init__(self, words=()):
+        """
+        Args:
+            words: The words to add to the tree.
+        """
+        self._words = []
+        self._children = []
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def add(self, word):
+        """Adds a word, unless the tree already holds it."""
+        if not self._words:
+            self._words.append(word)
+            self._children.append({})
+            return
+        node = 0
+        while True:
+            distance = levenshtein(word, self._words[node])
+            if distance == 0:
+                return
+            children = self._children[node]
+            child = children.get(distance)
+            if child is None:
+                children[distance] = len(self._words)
+                self._words.append(word)
+                self._children.append({})
+                return
+            node = child
+
+    def search(self, word, max_distance) -> list:
+        """Returns the (distance, word) pairs of the words within
+        max_distance edits of word, closest first."""
+        found = []
+        pending = [0] if self._words else []
+        while pending:
+            node = pending.pop()
+            children = self._children[node]
+            # Past this distance, neither the node nor its children match.
+            limit = max(children, default=0) + max_distance
+            distance = levenshtein(word, self._words[node], limit)
+            if distance <= max_distance:
+                found.append((distance, self._words[node]))
+            if distance > limit:
+                continue
+            for child_distance, child in children.items():
+                if abs(child_distance - distance) <= max_distance:
+                    pending.append(child)
+        found.sort()
+        return found
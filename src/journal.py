@@ -0,0 +1,217 @@
+"""An append-only journal keeping playlists and flags across restarts.
+
+Every change is appended to the journal file as one JSON line. Once the
+journal holds enough records, the resulting state is written to a
+snapshot next to it and the journal starts over, so replaying it on
+start never takes long. Both files carry a generation number: a journal
+older than the snapshot is already part of the snapshot and is ignored.
+"""
+
+from pathlib import Path
+import json
+import os
+import tempfile
+import time
+
+from .video_playlist import Playlist
+
+
+class Journal:
+    """A class used to record the playlists and flags of a video player.
+
+    The state described by the snapshot and the records replayed so far
+    is available through playlists and flags.
+    """
+
+    def __init__(self, path, sync_every: int = 1, sync_interval=None,
+                 compact_every: int = 10000):
+        """Replays the snapshot and the journal, then opens the journal
+        for appending.
+
+        Args:
+            path: Path of the journal file, the snapshot is written next to
+                it with a .snapshot suffix.
+            sync_every: Number of records written before they are forced
+                to disk with fsync. 0 only syncs on close and compaction.
+            sync_interval: Seconds after which the records written so far
+                are forced to disk on the next record, whatever their
+                number. Never if None.
+            compact_every: Number of records after which the journal is
+                compacted into the snapshot. 0 never compacts.
+        """
+        self._path = Path(path)
+        self._snapshot_path = self._path.with_name(
+            f"{self._path.name}.snapshot")
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        self._compact_every = compact_every
+        # playlists keyed by their name in lower case
+        self.playlists = {}
+        # reasons of the flagged videos keyed by video id
+        self.flags = {}
+        self._appliers = {
+            "create_playlist": self._create_playlist,
+            "add_to_playlist": self._add_to_playlist,
+            "remove_from_playlist": self._remove_from_playlist,
+            "clear_playlist": self._clear_playlist,
+            "delete_playlist": self._delete_playlist,
+            "flag_video": self._flag_video,
+            "allow_video": self._allow_video,
+        }
+        self._generation = self._read_snapshot()
+        self._records = self._replay()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._file = open(self._path, "a", encoding="utf-8", newline="\n")
+        if self._records is None:
+            self._start_journal()
+        elif self._compact_every and self._records >= self._compact_every:
+            self.compact()
+
+    def append(self, operation: str, *args) -> None:
+        """Records a change and applies it to the state.
+
+        Args:
+            operation: Name of the VideoPlayer method making the change,
+                one of create_playlist, add_to_playlist,
+                remove_from_playlist, clear_playlist, delete_playlist,
+                flag_video and allow_video.
+            args: The playlist name, video id and flag reason it takes.
+        """
+        self._apply([operation, *args])
+        self._file.write(json.dumps([operation, *args]) + "\n")
+        self._records += 1
+        self._unsynced += 1
+        if self._compact_every and self._records >= self._compact_every:
+            self.compact()
+        elif self._sync_every and self._unsynced >= self._sync_every:
+            self.sync()
+        elif (self._sync_interval is not None and time.monotonic()
+                - self._synced_at >= self._sync_interval):
+            self.sync()
+
+    def sync(self) -> None:
+        """Forces every record written so far to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def compact(self) -> None:
+        """Writes the state to the snapshot and empties the journal."""
+        snapshot = {
+            "generation": self._generation + 1,
+            "playlists": [[playlist.name, playlist.videos]
+                          for playlist in self.playlists.values()],
+            "flags": self.flags,
+        }
+        handle, temporary = tempfile.mkstemp(
+            dir=self._snapshot_path.parent, prefix=self._snapshot_path.name,
+            suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as snapshot_file:
+                json.dump(snapshot, snapshot_file)
+                snapshot_file.flush()
+                os.fsync(snapshot_file.fileno())
+            os.replace(temporary, self._snapshot_path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self._generation += 1
+        # A crash before the journal starts over leaves an older generation
+        # in it, which the next replay ignores.
+        self._file.close()
+        self._file = open(self._path, "w", encoding="utf-8", newline="\n")
+        self._start_journal()
+
+    def close(self) -> None:
+        """Forces the records to disk and closes the journal."""
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def _start_journal(self):
+        """Writes the header of an empty journal."""
+        self._file.write(json.dumps(["generation", self._generation]) + "\n")
+        self._records = 0
+        self.sync()
+
+    def _read_snapshot(self) -> int:
+        """Loads the snapshot into the state and returns its generation."""
+        try:
+            with open(self._snapshot_path, encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except FileNotFoundError:
+            return 0
+        for name, video_ids in snapshot["playlists"]:
+            self._create_playlist(name)
+            for video_id in video_ids:
+                self._add_to_playlist(name, video_id)
+        self.flags.update(snapshot["flags"])
+        return snapshot["generation"]
+
+    def _replay(self):
+        """Applies the records of the journal to the state.
+
+        A last record cut short by a crash is dropped.
+
+        Returns:
+            The number of records replayed, or None if the journal has to
+            start over because it is missing, empty or already part of the
+            snapshot.
+        """
+        try:
+            journal_file = open(self._path, "rb")
+        except FileNotFoundError:
+            return None
+        with journal_file:
+            lines = journal_file.readlines()
+        if lines and not lines[-1].endswith(b"\n"):
+            lines.pop()
+            with open(self._path, "rb+") as journal_file:
+                journal_file.truncate(sum(map(len, lines)))
+        records = []
+        for number, line in enumerate(lines, 1):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                raise ValueError(
+                    f"Corrupt record on line {number} of the journal "
+                    f"{self._path}") from None
+        if not records or records[0] != ["generation", self._generation]:
+            if records and records[0][1] > self._generation:
+                raise ValueError(
+                    f"The journal {self._path} is newer than its snapshot")
+            self._path.write_bytes(b"")
+            return None
+        for record in records[1:]:
+            self._apply(record)
+        return len(records) - 1
+
+    def _apply(self, record):
+        operation, *args = record
+        applier = self._appliers.get(operation)
+        if applier is None:
+            raise ValueError(f"Unknown journal operation: {operation}")
+        applier(*args)
+
+    def _create_playlist(self, name):
+        self.playlists.setdefault(name.lower(), Playlist(name))
+
+    def _add_to_playlist(self, name, video_id):
+        self.playlists[name.lower()].add_video(video_id)
+
+    def _remove_from_playlist(self, name, video_id):
+        self.playlists[name.lower()].remove_video(video_id)
+
+    def _clear_playlist(self, name):
+        self.playlists[name.lower()].clear_playlist()
+
+    def _delete_playlist(self, name):
+        self.playlists.pop(name.lower(), None)
+
+    def _flag_video(self, video_id, flag_reason):
+        self.flags[video_id] = flag_reason
+
+    def _allow_video(self, video_id):
+        self.flags.pop(video_id, None)
@@ -0,0 +1,72 @@
+"""Output sinks the video player and command parser write to."""
+
+import sys
+
+
+class StdoutSink:
+    """A sink writing straight to the current sys.stdout."""
+
+    def write(self, text: str) -> None:
+        """Writes text, which should end with a new line."""
+        sys.stdout.write(text)
+
+    def flush(self) -> None:
+        """Flushes sys.stdout."""
+        sys.stdout.flush()
+
+
+class BufferedSink:
+    """A sink collecting text and writing it to a stream in large pieces."""
+
+    def __init__(self, stream=None, buffer_size: int = 1 << 16):
+        """
+        Args:
+            stream: The text stream to write to, the current sys.stdout by
+                default.
+            buffer_size: Number of characters collected before they are
+                written.
+        """
+        self._stream = stream
+        self._buffer_size = buffer_size
+        self._pieces = []
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        """Collects text, writing everything out once the buffer is full."""
+        self._pieces.append(text)
+        self._size += len(text)
+        if self._size >= self._buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes everything collected so far and flushes the stream."""
+        stream = self._stream if self._stream is not None else sys.stdout
+        if self._pieces:
+            stream.write("".join(self._pieces))
+            self._pieces = []
+            self._size = 0
+        stream.flush()
+
+
+class MemorySink:
+    """A sink keeping everything written in memory."""
+
+    def __init__(self):
+        self._pieces = []
+
+    def write(self, text: str) -> None:
+        """Keeps text."""
+        self._pieces.append(text)
+
+    def flush(self) -> None:
+        """Does nothing, the text stays available through getvalue."""
+
+    def getvalue(self) -> str:
+        """Returns everything written since the last clear."""
+        text = "".join(self._pieces)
+        self._pieces = [text]
+        return text
+
+    def clear(self) -> None:
+        """Forgets everything written so far."""
+        self._pieces = []
@@ -1,21 +1,169 @@
 """A youtube terminal simulator."""
+from .video_library import VideoLibrary
 from .video_player import VideoPlayer
+from .command_metrics import CommandMetrics
 from .command_parser import CommandException
 from .command_parser import CommandParser
+from .output_sink import BufferedSink
+from .journal import Journal
+from .sqlite_library import SqliteVideoLibrary
+from .sqlite_playlists import SqlitePlaylistStore
+import argparse
+import sys
+import time
 
 
-if __name__ == "__main__":
-    print("""Hello and welcome to YouTube, what would you like to do?
-    Enter HELP for list of available commands or EXIT to terminate.""")
-    video_player = VideoPlayer()
-    parser = CommandParser(video_player)
+WELCOME_MESSAGE = """Hello and welcome to YouTube, what would you like to do?
+    Enter HELP for list of available commands or EXIT to terminate."""
+GOODBYE_MESSAGE = ("YouTube has now terminated its execution. "
+                   "Thank you and goodbye!")
+PROMPT = "YT> "
+
+
+def run_interactive(parser):
+    """Reads and executes commands from the user until EXIT."""
+    print(WELCOME_MESSAGE)
     while True:
-        command = input("YT> ")
+        command = input(PROMPT)
         if command.upper() == "EXIT":
             break
         try:
             parser.execute_command(command.split())
         except CommandException as e:
             print(e)
-    print("YouTube has now terminated its execution. "
-          "Thank you and goodbye!")
+    print(GOODBYE_MESSAGE)
+
+
+def run_batch(parser, commands_file, output) -> tuple:
+    """Executes every command of a file without prompts, until EXIT.
+
+    Answers to the questions asked by searches are on the line after the
+    search, so the parser's player must read them from commands_file.
+
+    Args:
+        parser: The CommandParser executing the commands.
+        commands_file: A text file with one command per line.
+        output: The sink errors are written to, usually the one the
+            parser and player write to.
+
+    Returns:
+        The number of commands executed and how many raised an error or
+        had an unknown verb.
+    """
+    commands = errors = 0
+    for line in iter(commands_file.readline, ""):
+        command = line.split()
+        if not command:
+            continue
+        if command[0].upper() == "EXIT":
+            break
+        commands += 1
+        try:
+            if not parser.execute_command(command):
+                errors += 1
+        except CommandException as e:
+            errors += 1
+            output.write(f"{e}\n")
+    return commands, errors
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument(
+        "--batch", nargs="?", const="-", metavar="FILE",
+        help="execute the commands of FILE, or of stdin when no FILE is "
+             "given, without prompts and report the throughput")
+    arguments.add_argument(
+        "--journal", metavar="FILE",
+        help="keep the playlists and flags in FILE across runs")
+    arguments.add_argument(
+        "--journal-sync", type=int, default=1, metavar="N",
+        help="force the journal to disk every N changes, 0 only on exit "
+             "(default 1)")
+    arguments.add_argument(
+        "--sqlite", metavar="DATABASE",
+        help="keep the catalog, and the playlists and flags unless a "
+             "journal is given, in a SQLite DATABASE")
+    arguments.add_argument(
+        "--search-cache", type=int, default=0, metavar="N",
+        help="keep the results of the N most recent searches (default 0)")
+    arguments.add_argument(
+        "--snapshot", action="store_true",
+        help="keep a snapshot of the parsed catalog next to it and load "
+             "that instead while the catalog is unchanged")
+    arguments.add_argument(
+        "--stats", action="store_true",
+        help="measure the latency of every command, shown by STATS")
+    arguments.add_argument(
+        "--stats-file", metavar="FILE",
+        help="measure the commands and write the statistics to FILE as "
+             "JSON periodically and on exit")
+    arguments.add_argument(
+        "--stats-interval", type=float, default=60.0, metavar="SECONDS",
+        help="seconds between two writes of the statistics (default 60)")
+    options = arguments.parse_args(argv)
+
+    if options.sqlite is None:
+        # Show the prompt while the catalog loads, commands wait for the
+        # videos they need.
+        video_library = VideoLibrary(
+            background=True, snapshot=options.snapshot,
+            search_cache_size=options.search_cache)
+    else:
+        video_library = SqliteVideoLibrary(
+            options.sqlite, search_cache_size=options.search_cache)
+    metrics = None
+    if options.stats or options.stats_file is not None:
+        try:
+            metrics = CommandMetrics(
+                options.stats_file, options.stats_interval)
+        except OSError as error:
+            arguments.error(f"cannot write --stats-file: {error}")
+    journal = None
+    if options.journal is not None:
+        journal = Journal(options.journal, sync_every=options.journal_sync)
+    elif options.sqlite is not None:
+        journal = SqlitePlaylistStore(options.sqlite)
+    try:
+        run(options, video_library, journal, metrics)
+    finally:
+        if journal is not None:
+            journal.close()
+        if metrics is not None:
+            metrics.dump()
+
+
+def run(options, video_library, journal, metrics):
+    """Runs the simulator as asked by the command-line options."""
+    if options.batch is None:
+        run_interactive(CommandParser(
+            VideoPlayer(video_library, journal=journal), metrics=metrics))
+        return
+
+    output = BufferedSink()
+    commands_file = sys.stdin
+    if options.batch != "-":
+        commands_file = open(options.batch)
+    parser = CommandParser(VideoPlayer(
+        video_library, output,
+        lambda: commands_file.readline().rstrip("\n"), journal=journal),
+        metrics=metrics)
+    start = time.perf_counter()
+    try:
+        commands, errors = run_batch(parser, commands_file, output)
+    finally:
+        output.flush()
+        if commands_file is not sys.stdin:
+            commands_file.close()
+    seconds = time.perf_counter() - start
+    rate = commands / seconds if seconds else 0.0
+    print(f"Executed {commands} commands with {errors} errors in "
+          f"{seconds:.3f}s ({rate:.0f} commands/s)", file=sys.stderr)
+    cache = video_library.search_cache
+    if cache is not None:
+        print(f"Search cache: {cache.hits} hits, {cache.misses} misses",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
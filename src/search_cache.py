@@ -0,0 +1,91 @@
+"""A bounded cache of search results, shared by the players of a library."""
+
+from collections import OrderedDict
+import threading
+
+
+class SearchCache:
+    """A class used to keep the most recently used search results.
+
+    Results are keyed by the kind of search, "title" or "tag", and the
+    search term in lower case. Flagging or allowing a video only drops the
+    results it is, or would now be, part of. As a short term or a common
+    tag can match most of the catalog, the cache is bounded by the number
+    of videos in all its results as well as by the number of results.
+    """
+
+    def __init__(self, capacity: int = 256, max_videos: int = 65536):
+        """
+        Args:
+            capacity: Number of results kept, the least recently used are
+                dropped first.
+            max_videos: Number of videos kept over all results. Results
+                with more videos than this are never kept.
+        """
+        self._capacity = capacity
+        self._max_videos = max_videos
+        self._videos = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @property
+    def version(self) -> int:
+        """Changes whenever results are dropped. Take it before searching
+        and pass it to put."""
+        return self._version
+
+    def get(self, kind: str, term: str) -> list:
+        """Returns the cached results of a search, or None."""
+        with self._lock:
+            results = self._results.get((kind, term))
+            if results is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end((kind, term))
+            self.hits += 1
+            return results
+
+    def put(self, kind: str, term: str, results: list, version: int):
+        """Keeps the results of a search, unless results were dropped since
+        version was taken, as they may be stale."""
+        with self._lock:
+            if version != self._version or len(results) > self._max_videos:
+                return
+            self._drop((kind, term))
+            self._results[(kind, term)] = results
+            self._videos += len(results)
+            while (len(self._results) > self._capacity
+                   or self._videos > self._max_videos):
+                _, dropped = self._results.popitem(last=False)
+                self._videos -= len(dropped)
+
+    def _drop(self, key):
+        """Drops the results of a search if they are kept, holding _lock."""
+        results = self._results.pop(key, None)
+        if results is not None:
+            self._videos -= len(results)
+
+    def invalidate(self, video):
+        """Drops the results of every search the video matches."""
+        title = video.title.lower()
+        tags = set(video.tags)
+        with self._lock:
+            self._version += 1
+            stale = [
+                key for key in self._results
+                if (key[1] in title if key[0] == "title" else key[1] in tags)]
+            for key in stale:
+                self._drop(key)
+
+    def clear(self):
+        """Drops every result."""
+        with self._lock:
+            self._version += 1
+            self._results.clear()
+            self._videos = 0
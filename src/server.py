@@ -0,0 +1,241 @@
+"""A TCP server sharing one video library between many users.
+
+Each connection speaks the same line protocol as the terminal simulator:
+a welcome message, then a prompt before every command, until EXIT.
+"""
+from .command_metrics import CommandMetrics
+from .command_parser import CommandException
+from .command_parser import CommandParser
+from .run import GOODBYE_MESSAGE
+from .run import PROMPT
+from .run import WELCOME_MESSAGE
+from .sqlite_library import SqliteVideoLibrary
+from .video_library import VideoLibrary
+from .video_player import VideoPlayer
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import argparse
+import asyncio
+import threading
+
+
+# Longest line a connection may send, in bytes.
+_LINE_LIMIT = 1 << 16
+
+
+class _ConnectionSink:
+    """An output sink sending what is written to a connection on flush.
+
+    Written from the thread executing a command, sent from the event loop.
+    """
+
+    def __init__(self, writer, loop):
+        self._writer = writer
+        self._loop = loop
+        self._pieces = []
+
+    def write(self, text: str) -> None:
+        self._pieces.append(text)
+
+    def flush(self) -> None:
+        if self._pieces:
+            data = "".join(self._pieces).encode()
+            self._pieces = []
+            self._loop.call_soon_threadsafe(self._writer.write, data)
+
+
+class _Session:
+    """The player and parser of one connection."""
+
+    def __init__(self, server, reader, writer):
+        self._server = server
+        self._reader = reader
+        self._writer = writer
+        self._loop = asyncio.get_running_loop()
+        self._output = _ConnectionSink(writer, self._loop)
+        self._player = VideoPlayer(
+            server.video_library, self._output, defer_answers=True)
+        self._parser = CommandParser(self._player, metrics=server.metrics)
+
+    async def run(self):
+        """Executes the commands of the connection until EXIT or EOF."""
+        self._writer.write(f"{WELCOME_MESSAGE}\n".encode())
+        while True:
+            self._writer.write(PROMPT.encode())
+            await self._writer.drain()
+            line = await self._read_line()
+            if line is None:
+                continue
+            if not line:
+                return
+            command = line.decode(errors="replace")
+            if command.strip().upper() == "EXIT":
+                break
+            await self._loop.run_in_executor(
+                self._server.executor, self._execute, command.split())
+            if self._player.pending_question is not None:
+                # The answer is awaited here, not in a worker thread.
+                line = await self._read_line()
+                if line is None:
+                    # Answered as if nothing was entered.
+                    line = b"\n"
+                if not line:
+                    return
+                await self._loop.run_in_executor(
+                    self._server.executor, self._answer,
+                    line.decode(errors="replace").rstrip("\r\n"))
+        self._writer.write(f"{GOODBYE_MESSAGE}\n".encode())
+        await self._writer.drain()
+
+    async def _read_line(self):
+        """Returns the next line, or b"" at the end of the connection.
+
+        A line longer than _LINE_LIMIT is skipped after telling the user,
+        and None returned instead.
+        """
+        try:
+            return await self._reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            return error.partial
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+        while True:
+            # Drop what was buffered of the line, then look for its end.
+            await self._reader.readexactly(consumed)
+            try:
+                await self._reader.readuntil(b"\n")
+                break
+            except asyncio.IncompleteReadError:
+                return b""
+            except asyncio.LimitOverrunError as error:
+                consumed = error.consumed
+        self._writer.write(
+            f"Please enter lines of at most {_LINE_LIMIT} bytes.\n".encode())
+        return None
+
+    def _execute(self, command):
+        """Executes a command in a worker thread, holding the library lock
+        unless the library is thread safe."""
+        with self._server.library_lock or nullcontext():
+            try:
+                self._parser.execute_command(command)
+            except CommandException as e:
+                self._output.write(f"{e}\n")
+            finally:
+                self._output.flush()
+
+    def _answer(self, answer):
+        """Answers the question of the last search in a worker thread."""
+        with self._server.library_lock or nullcontext():
+            try:
+                self._player.answer_question(answer)
+            finally:
+                self._output.flush()
+
+
+class CommandServer:
+    """A class used to serve the terminal simulator to many connections.
+
+    Connections only cost a coroutine while idle. Commands run in a pool
+    of worker threads, one at a time per connection. A thread safe
+    VideoLibrary is used by them all at once, any other library is guarded
+    by library_lock. A user answering a question holds neither a lock nor
+    a worker thread, the answer is awaited like the next command.
+    """
+
+    def __init__(self, video_library=None, max_workers=32, metrics=None):
+        """
+        Args:
+            video_library: The VideoLibrary shared by every connection, the
+                default catalog is loaded thread safe if none is given.
+            max_workers: Number of commands executed at the same time.
+            metrics: The CommandMetrics shared by every connection, if
+                any.
+        """
+        if video_library is None:
+            video_library = VideoLibrary(thread_safe=True)
+        self.video_library = video_library
+        self.metrics = metrics
+        self.library_lock = None
+        if not video_library.thread_safe:
+            self.library_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="CommandServer")
+
+    async def handle_connection(self, reader, writer):
+        """Serves one connection, the asyncio.start_server callback."""
+        try:
+            await _Session(self, reader, writer).run()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Starts listening and returns the asyncio server."""
+        return await asyncio.start_server(
+            self.handle_connection, host, port, limit=_LINE_LIMIT,
+            backlog=4096)
+
+    def close(self):
+        """Stops the worker threads once their commands are done."""
+        self.executor.shutdown()
+
+
+async def serve(host, port, video_library=None, metrics=None):
+    """Serves connections on host and port until cancelled."""
+    server = CommandServer(video_library, metrics=metrics)
+    listener = await server.start(host, port)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument("--host", default="127.0.0.1")
+    arguments.add_argument("--port", type=int, default=8765)
+    arguments.add_argument("--sqlite", metavar="DATABASE",
+                           help="keep the catalog in a SQLite DATABASE")
+    arguments.add_argument("--search-cache", type=int, default=0,
+                           metavar="N",
+                           help="keep the results of the N most recent "
+                                "searches (default 0)")
+    arguments.add_argument("--snapshot", action="store_true",
+                           help="load the catalog from a snapshot kept next "
+                                "to it while it is unchanged")
+    arguments.add_argument("--stats", action="store_true",
+                           help="measure the latency of every command")
+    arguments.add_argument("--stats-file", metavar="FILE",
+                           help="write the statistics to FILE periodically")
+    arguments.add_argument("--stats-interval", type=float, default=60.0,
+                           metavar="SECONDS")
+    options = arguments.parse_args(argv)
+    metrics = None
+    if options.stats or options.stats_file is not None:
+        try:
+            metrics = CommandMetrics(
+                options.stats_file, options.stats_interval)
+        except OSError as error:
+            arguments.error(f"cannot write --stats-file: {error}")
+    if options.sqlite is None:
+        video_library = VideoLibrary(
+            background=True, thread_safe=True, snapshot=options.snapshot,
+            search_cache_size=options.search_cache)
+    else:
+        video_library = SqliteVideoLibrary(
+            options.sqlite, search_cache_size=options.search_cache)
+    try:
+        asyncio.run(serve(
+            options.host, options.port, video_library, metrics))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if metrics is not None:
+            metrics.dump()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""A video library stored in a SQLite database."""
+
+from .catalog_reader import read_catalog
+from .catalog_snapshot import source_key
+from .catalog_snapshot import source_unchanged
+from .fuzzy_index import BKTree
+from .fuzzy_index import title_words
+from .search_cache import SearchCache
+from .video import Video
+from contextlib import nullcontext
+from itertools import groupby
+from pathlib import Path
+import json
+import random
+import sqlite3
+import threading
+
+
+# Terms at least this long are looked up in the trigram index.
+_TRIGRAM_SIZE = 3
+# Random numbers looked up before a random pick settles for the next
+# playable video.
+_RANDOM_TRIES = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (key TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS videos (
+    number INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    title_key TEXT NOT NULL,
+    tags TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS videos_by_title ON videos (title, number);
+CREATE INDEX IF NOT EXISTS videos_by_title_key ON videos (title_key, number);
+CREATE TABLE IF NOT EXISTS video_tags (
+    tag TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    PRIMARY KEY (tag, number)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS title_words (
+    word TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    PRIMARY KEY (word, number)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS flags (
+    video_id TEXT PRIMARY KEY,
+    reason TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+_TITLE_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS title_search USING fts5(
+    title_key, content='videos', content_rowid='number',
+    tokenize='trigram');
+"""
+
+_SELECT_VIDEOS = """
+SELECT videos.title, videos.video_id, videos.tags, flags.reason
+FROM videos LEFT JOIN flags USING (video_id)
+"""
+
+
+class StoredVideo(Video):
+    """A Video read from the database, equal to any other copy of it."""
+
+    __slots__ = ()
+
+    def __eq__(self, other) -> bool:
+        """Videos with the same id are equal"""
+        if not isinstance(other, StoredVideo):
+            return NotImplemented
+        return self.video_id == other.video_id
+
+    def __hash__(self) -> int:
+        return hash(self.video_id)
+
+
+def _video(row) -> StoredVideo:
+    """Returns the video of a row selected with _SELECT_VIDEOS."""
+    title, video_id, tags, flagged_reason = row
+    video = StoredVideo(title, video_id, json.loads(tags))
+    if flagged_reason is not None:
+        video.set_flagged(True)
+        video.set_flagged_reason(flagged_reason)
+    return video
+
+
+def _phrase(term) -> str:
+    """Quotes a term as an FTS5 string, matched as a substring."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+class SqliteVideoLibrary:
+    """A class used to represent a Video Library kept in a SQLite file.
+
+    Behaves like VideoLibrary, but only keeps the videos a command asks
+    for in memory, so catalogs larger than memory can be used. The flags
+    are stored in the database and survive restarts. Every thread gets its
+    own connection, so the library is always thread safe.
+    """
+
+    thread_safe = True
+
+    def __init__(self, database, video_file=None, search_cache_size=0):
+        """Opens the database, importing the catalog into it if it is not
+        there yet or has changed since it was imported.
+
+        Args:
+            database: Path of the SQLite file, created if needed.
+            video_file: Path of the catalog to load, videos.txt next to
+                this module by default.
+            search_cache_size: Number of search results the players keep
+                in search_cache. No results are cached if 0.
+        """
+        if video_file is None:
+            video_file = Path(__file__).parent / "videos.txt"
+        self._database = database
+        self.search_cache = None
+        if search_cache_size:
+            self.search_cache = SearchCache(search_cache_size)
+        self._word_tree = None
+        self._word_tree_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        try:
+            connection.executescript(_TITLE_SEARCH_SCHEMA)
+            self._title_search = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 or its trigram tokenizer.
+            self._title_search = False
+        self._import(video_file)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._database, isolation_level=None, check_same_thread=False)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _import(self, video_file):
+        """Replaces the videos by the catalog if it changed."""
+        connection = self._connection()
+        row = connection.execute("SELECT key FROM catalog").fetchone()
+        if row is not None and source_unchanged(json.loads(row[0]), video_file):
+            return
+        key = source_key(video_file)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM video_tags")
+            connection.execute("DELETE FROM title_words")
+            connection.execute("DELETE FROM videos")
+            # A later video with the same id replaces an earlier one in
+            # place, as in VideoLibrary.
+            connection.executemany(
+                "INSERT INTO videos (video_id, title, title_key, tags) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (video_id) DO UPDATE SET "
+                "title = excluded.title, title_key = excluded.title_key, "
+                "tags = excluded.tags",
+                ((url, title, title.lower(), json.dumps(tags))
+                 for title, url, tags in read_catalog(video_file)))
+            connection.execute(
+                "INSERT OR IGNORE INTO video_tags "
+                "SELECT tag.value, videos.number "
+                "FROM videos, json_each(videos.tags) AS tag")
+            titles = connection.execute(
+                "SELECT number, title_key FROM videos")
+            connection.executemany(
+                "INSERT INTO title_words VALUES (?, ?)",
+                ((word, number) for number, title_key in titles
+                 for word in title_words(title_key)))
+            if self._title_search:
+                connection.execute(
+                    "INSERT INTO title_search (title_search) "
+                    "VALUES ('rebuild')")
+            connection.execute("DELETE FROM catalog")
+            connection.execute(
+                "INSERT INTO catalog VALUES (?)", (json.dumps(key),))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _iter_select(self, where, parameters=()):
+        """Returns an iterator over the videos selected by a WHERE and
+        ORDER BY clause."""
+        rows = self._connection().execute(
+            _SELECT_VIDEOS + where, parameters)
+        return map(_video, rows)
+
+    def _select(self, where, parameters=()) -> list:
+        """Returns the videos selected by a WHERE and ORDER BY clause."""
+        return list(self._iter_select(where, parameters))
+
+    def __len__(self) -> int:
+        """Returns the number of videos in the library."""
+        return self._connection().execute(
+            "SELECT count(*) FROM videos").fetchone()[0]
+
+    def reading(self):
+        """Returns a context manager doing nothing, as every video read is
+        a consistent copy of the database."""
+        return nullcontext()
+
+    def search_titles(self, search_term) -> list:
+        """Returns the videos whose titles contain the search term.
+
+        Terms of three characters or more are looked up in the trigram
+        index, shorter ones scan the titles.
+
+        Args:
+            search_term: The substring to look for.
+
+        Returns:
+            A list of matching Video objects sorted by lower case title.
+        """
+        return list(self.iter_search_titles(search_term))
+
+    def iter_search_titles(self, search_term):
+        """Returns an iterator over the videos search_titles returns,
+        reading them from the database as it goes."""
+        term = search_term.lower()
+        if self._title_search and len(term) >= _TRIGRAM_SIZE:
+            return self._iter_select(
+                "WHERE videos.number IN (SELECT rowid FROM title_search "
+                "WHERE title_search MATCH ?) AND instr(videos.title_key, ?) "
+                "ORDER BY videos.title_key, videos.number",
+                (_phrase(term), term))
+        return self._iter_select(
+            "WHERE instr(videos.title_key, ?) "
+            "ORDER BY videos.title_key, videos.number", (term,))
+
+    def iter_title_prefix(self, prefix):
+        """Returns an iterator over the videos whose titles start with
+        prefix, ignoring case, in the order of search_titles."""
+        prefix = prefix.lower()
+        return self._iter_select(
+            "WHERE videos.title_key >= ? AND videos.title_key < ? "
+            "ORDER BY videos.title_key, videos.number",
+            (prefix, prefix + "\U0010ffff"))
+
+    def _words(self) -> BKTree:
+        """Returns the BK-tree of the title words, built from the database
+        by the first fuzzy search."""
+        with self._word_tree_lock:
+            if self._word_tree is None:
+                rows = self._connection().execute(
+                    "SELECT DISTINCT word FROM title_words ORDER BY word")
+                self._word_tree = BKTree(word for word, in rows)
+            return self._word_tree
+
+    def search_titles_fuzzy(self, search_term, max_distance) -> list:
+        """Returns the videos with a title word close to the search term.
+
+        Args:
+            search_term: The word to look for, matched in lower case.
+            max_distance: The largest number of insertions, deletions and
+                substitutions between the search term and a title word.
+
+        Returns:
+            A list of Video objects sorted by the distance of their closest
+            word, then by lower case title.
+        """
+        found = self._words().search(search_term.lower(), max_distance)
+        videos = []
+        seen = set()
+        for distance, group in groupby(found, key=lambda pair: pair[0]):
+            words = json.dumps([word for distance, word in group])
+            for video in self._iter_select(
+                    "WHERE videos.number IN (SELECT number FROM title_words "
+                    "WHERE word IN (SELECT value FROM json_each(?))) "
+                    "ORDER BY videos.title_key, videos.number", (words,)):
+                if video.video_id not in seen:
+                    seen.add(video.video_id)
+                    videos.append(video)
+        return videos
+
+    def search_query(self, query) -> list:
+        """Returns the videos matching a boolean query.
+
+        The query becomes one compound SELECT of the video numbers of its
+        terms, read from the tag and title indexes.
+
+        Args:
+            query: A query parsed by video_query.parse_query.
+
+        Returns:
+            A list of matching Video objects sorted by lower case title.
+        """
+        parameters = []
+        numbers = self._query_numbers(query, parameters)
+        return self._select(
+            f"WHERE videos.number IN ({numbers}) "
+            "ORDER BY videos.title_key, videos.number", parameters)
+
+    def _query_numbers(self, node, parameters) -> str:
+        """Returns a SELECT of the numbers of the videos matching a parsed
+        query, appending its parameters."""
+        kind = node[0]
+        if kind == "tag":
+            # Tags only match unflagged videos, as in search_tag.
+            parameters.append(node[1])
+            return (
+                "SELECT number FROM video_tags JOIN videos USING (number) "
+                "WHERE tag = ? AND video_id NOT IN "
+                "(SELECT video_id FROM flags)")
+        if kind == "title":
+            term = node[1]
+            if self._title_search and len(term) >= _TRIGRAM_SIZE:
+                parameters.extend((_phrase(term), term))
+                return (
+                    "SELECT number FROM videos WHERE number IN (SELECT rowid "
+                    "FROM title_search WHERE title_search MATCH ?) "
+                    "AND instr(title_key, ?)")
+            parameters.append(term)
+            return "SELECT number FROM videos WHERE instr(title_key, ?)"
+        if kind == "not":
+            return ("SELECT number FROM videos EXCEPT "
+                    + self._query_operand(node[1], parameters))
+        if kind == "or":
+            return " UNION ".join(
+                self._query_operand(child, parameters) for child in node[1])
+        # EXCEPT and INTERSECT apply from left to right, so the terms
+        # excluded by an AND come after the others.
+        included = [child for child in node[1] if child[0] != "not"]
+        excluded = [child[1] for child in node[1] if child[0] == "not"]
+        if included:
+            numbers = " INTERSECT ".join(
+                self._query_operand(child, parameters) for child in included)
+        else:
+            numbers = "SELECT number FROM videos"
+        for child in excluded:
+            numbers += " EXCEPT " + self._query_operand(child, parameters)
+        return numbers
+
+    def _query_operand(self, node, parameters) -> str:
+        """Returns _query_numbers as a single SELECT, usable on either side
+        of a compound operator."""
+        numbers = self._query_numbers(node, parameters)
+        if node[0] in ("tag", "title"):
+            return numbers
+        return f"SELECT number FROM ({numbers})"
+
+    def search_tag(self, video_tag) -> list:
+        """Returns the unflagged videos carrying the tag.
+
+        Args:
+            video_tag: The tag to look for, matched in lower case.
+
+        Returns:
+            A list of Video objects sorted by lower case title.
+        """
+        return list(self.iter_search_tag(video_tag))
+
+    def iter_search_tag(self, video_tag, start=0):
+        """Returns an iterator over the videos search_tag returns, from the
+        start-th one on, reading them from the database as it goes."""
+        return self._iter_select(
+            "JOIN video_tags USING (number) "
+            "WHERE video_tags.tag = ? AND flags.reason IS NULL "
+            "ORDER BY videos.title_key, videos.number LIMIT -1 OFFSET ?",
+            (video_tag.lower(), start))
+
+    def flag_video(self, video_id, flag_reason) -> bool:
+        """Flags a video.
+
+        Args:
+            video_id: The video url.
+            flag_reason: Reason for flagging the video.
+
+        Returns:
+            False if the video was already flagged or does not exist.
+        """
+        cursor = self._connection().execute(
+            "INSERT INTO flags SELECT video_id, ? FROM videos "
+            "WHERE video_id = ? ON CONFLICT DO NOTHING",
+            (flag_reason, video_id))
+        return self._changed(video_id, cursor.rowcount)
+
+    def allow_video(self, video_id) -> bool:
+        """Removes the flag from a video.
+
+        Args:
+            video_id: The video url.
+
+        Returns:
+            False if the video was not flagged or does not exist.
+        """
+        cursor = self._connection().execute(
+            "DELETE FROM flags WHERE video_id = ?", (video_id,))
+        return self._changed(video_id, cursor.rowcount)
+
+    def restore_flags(self, flags):
+        """Flags videos again, as recorded by a journal.
+
+        Args:
+            flags: A dictionary of video ids to flag reasons. Unknown and
+                already flagged videos are skipped.
+        """
+        for video_id, flag_reason in flags.items():
+            self.flag_video(video_id, flag_reason)
+
+    def _changed(self, video_id, rows) -> bool:
+        """Drops the cached searches of a video if its flag changed."""
+        if rows != 1:
+            return False
+        if self.search_cache is not None:
+            self.search_cache.invalidate(self.get_video(video_id))
+        return True
+
+    def get_random_playable_video(self) -> Video:
+        """Returns a random unflagged video, or None if all are flagged.
+
+        A random number is looked up through the primary key, and another
+        one if it is flagged or missing, so a pick costs a few lookups
+        instead of a count of every playable video. Should every number
+        miss, the first unflagged video from the last one on is taken,
+        wrapping around to the first video.
+        """
+        connection = self._connection()
+        lowest, highest = connection.execute(
+            "SELECT (SELECT min(number) FROM videos), "
+            "(SELECT max(number) FROM videos)").fetchone()
+        if highest is None:
+            return None
+        for _ in range(_RANDOM_TRIES):
+            number = random.randint(lowest, highest)
+            videos = self._select(
+                "WHERE videos.number = ? AND flags.reason IS NULL",
+                (number,))
+            if videos:
+                return videos[0]
+        videos = self._select(
+            "WHERE videos.number >= ? AND flags.reason IS NULL "
+            "ORDER BY videos.number LIMIT 1", (number,))
+        if not videos:
+            videos = self._select(
+                "WHERE flags.reason IS NULL ORDER BY videos.number LIMIT 1")
+        return videos[0] if videos else None
+
+    def iter_videos_by_title(self, start=0):
+        """Returns an iterator over all videos in title order, from the
+        start-th one on, reading them from the database as it goes."""
+        if not start:
+            return self._iter_select("ORDER BY videos.title, videos.number")
+        # The skipped videos are only counted in the covering index.
+        return self._iter_select(
+            "WHERE (videos.title, videos.number) >= (SELECT title, number "
+            "FROM videos ORDER BY title, number LIMIT 1 OFFSET ?) "
+            "ORDER BY videos.title, videos.number", (start,))
+
+    def get_all_videos(self) -> list:
+        """Returns all available video information from the video library."""
+        return self._select("ORDER BY videos.number")
+
+    def get_video(self, video_id) -> Video:
+        """Returns the video object (title, url, tags) from the video library.
+
+        Args:
+            video_id: The video url.
+
+        Returns:
+            The Video object for the requested video_id. None if the video
+            does not exist.
+        """
+        videos = self._select("WHERE videos.video_id = ?", (video_id,))
+        return videos[0] if videos else None
+
+    def close(self):
+        """Closes the connections of every thread."""
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
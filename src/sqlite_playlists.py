@@ -0,0 +1,114 @@
+"""Playlists and flags kept in a SQLite database across restarts."""
+
+import sqlite3
+
+from .video_playlist import Playlist
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    name_key TEXT PRIMARY KEY,
+    name TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS playlist_videos (
+    position INTEGER PRIMARY KEY,
+    name_key TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    UNIQUE (name_key, video_id));
+CREATE TABLE IF NOT EXISTS flags (
+    video_id TEXT PRIMARY KEY,
+    reason TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+
+class SqlitePlaylistStore:
+    """A class used to record the playlists and flags of a video player in
+    a SQLite file, in place of a Journal.
+
+    Every change is committed at once. The database can be the one of a
+    SqliteVideoLibrary, which then shares the flags.
+    """
+
+    def __init__(self, database):
+        """Opens the database and reads the playlists and flags from it.
+
+        Args:
+            database: Path of the SQLite file, created if needed.
+        """
+        self._connection = sqlite3.connect(database, isolation_level=None)
+        self._connection.executescript(_SCHEMA)
+        # playlists keyed by their name in lower case
+        self.playlists = {}
+        for name_key, name in self._connection.execute(
+                "SELECT name_key, name FROM playlists"):
+            self.playlists[name_key] = Playlist(name)
+        for name_key, video_id in self._connection.execute(
+                "SELECT name_key, video_id FROM playlist_videos "
+                "ORDER BY position"):
+            self.playlists[name_key].add_video(video_id)
+        # reasons of the flagged videos keyed by video id
+        self.flags = dict(self._connection.execute(
+            "SELECT video_id, reason FROM flags"))
+        self._changes = {
+            "create_playlist": self._create_playlist,
+            "add_to_playlist": self._add_to_playlist,
+            "remove_from_playlist": self._remove_from_playlist,
+            "clear_playlist": self._clear_playlist,
+            "delete_playlist": self._delete_playlist,
+            "flag_video": self._flag_video,
+            "allow_video": self._allow_video,
+        }
+
+    def append(self, operation: str, *args) -> None:
+        """Stores a change, taking the same arguments as Journal.append."""
+        change = self._changes.get(operation)
+        if change is None:
+            raise ValueError(f"Unknown playlist store operation: {operation}")
+        change(*args)
+
+    def close(self) -> None:
+        """Closes the database."""
+        self._connection.close()
+
+    def _create_playlist(self, name):
+        self.playlists.setdefault(name.lower(), Playlist(name))
+        self._connection.execute(
+            "INSERT OR IGNORE INTO playlists VALUES (?, ?)",
+            (name.lower(), name))
+
+    def _add_to_playlist(self, name, video_id):
+        self.playlists[name.lower()].add_video(video_id)
+        self._connection.execute(
+            "INSERT OR IGNORE INTO playlist_videos (name_key, video_id) "
+            "VALUES (?, ?)", (name.lower(), video_id))
+
+    def _remove_from_playlist(self, name, video_id):
+        self.playlists[name.lower()].remove_video(video_id)
+        self._connection.execute(
+            "DELETE FROM playlist_videos WHERE name_key = ? AND video_id = ?",
+            (name.lower(), video_id))
+
+    def _clear_playlist(self, name):
+        self.playlists[name.lower()].clear_playlist()
+        self._connection.execute(
+            "DELETE FROM playlist_videos WHERE name_key = ?", (name.lower(),))
+
+    def _delete_playlist(self, name):
+        self.playlists.pop(name.lower(), None)
+        with self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.execute(
+                "DELETE FROM playlist_videos WHERE name_key = ?",
+                (name.lower(),))
+            self._connection.execute(
+                "DELETE FROM playlists WHERE name_key = ?", (name.lower(),))
+
+    def _flag_video(self, video_id, flag_reason):
+        self.flags[video_id] = flag_reason
+        self._connection.execute(
+            "INSERT OR REPLACE INTO flags VALUES (?, ?)",
+            (video_id, flag_reason))
+
+    def _allow_video(self, video_id):
+        self.flags.pop(video_id, None)
+        self._connection.execute(
+            "DELETE FROM flags WHERE video_id = ?", (video_id,))
@@ -3,9 +3,28 @@
 from typing import Sequence
 
 
-class Video:
+class BaseVideo:
+    """The methods shared by every kind of video.
+
+    A subclass provides the title, video_id, tags, is_flagged and
+    flagged_reason properties and the set_flagged and set_flagged_reason
+    methods, keeping its fields in slots of its own.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        """Default print format of video"""
+        tags = " ".join([tag for tag in self.tags])
+        return f" {self.title} ({self.video_id}) [{tags}]"
+
+
+class Video(BaseVideo):
     """A class used to represent a Video."""
 
+    __slots__ = ("_title", "_video_id", "_is_flagged", "_flagged_reason",
+                 "_tags")
+
     def __init__(self, video_title: str, video_id: str, video_tags: Sequence[str]):
         """Video constructor."""
         self._title = video_title
@@ -17,10 +36,14 @@ class Video:
         # in case the caller changes the 'video_tags' they passed to us
         self._tags = tuple(video_tags)
 
-    def __repr__(self) -> str:
-        """Default print format of video"""
-        tags = " ".join([tag for tag in self._tags])
-        return f" {self._title} ({self._video_id}) [{tags}]"
+    def __reduce__(self):
+        """Pickles a video through its constructor, which unpickles much
+        faster than restoring each slot"""
+        state = None
+        if self._is_flagged:
+            state = (None, {"_is_flagged": True,
+                            "_flagged_reason": self._flagged_reason})
+        return (Video, (self._title, self._video_id, self._tags), state)
 
     @property
     def title(self) -> str:
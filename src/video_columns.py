@@ -0,0 +1,269 @@
+"""Compact, array-backed storage for the video catalog."""
+
+from .video import BaseVideo
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from collections.abc import Sequence
+
+
+class VideoView(BaseVideo):
+    """A lightweight Video reading its fields from a VideoColumns row."""
+
+    __slots__ = ("_columns", "_row")
+
+    def __init__(self, columns, row: int):
+        """
+        Args:
+            columns: The VideoColumns holding the video.
+            row: The row of the video in the columns.
+        """
+        self._columns = columns
+        self._row = row
+
+    def __eq__(self, other) -> bool:
+        """Views of the same row are equal"""
+        if not isinstance(other, VideoView):
+            return NotImplemented
+        return self._columns is other._columns and self._row == other._row
+
+    def __hash__(self) -> int:
+        return hash((id(self._columns), self._row))
+
+    @property
+    def title(self) -> str:
+        """Returns the title of a video."""
+        return self._columns.title(self._row)
+
+    @property
+    def video_id(self) -> str:
+        """Returns the video id of a video."""
+        return self._columns.video_id(self._row)
+
+    @property
+    def is_flagged(self) -> bool:
+        """Returns the flagged state of a video"""
+        return bool(self._columns.flags[self._row])
+
+    @property
+    def flagged_reason(self) -> str:
+        """Returns reason video is flagged or None"""
+        return self._columns.flagged_reasons.get(self._row)
+
+    @property
+    def tags(self) -> Sequence:
+        """Returns the list of tags of a video."""
+        return self._columns.tags(self._row)
+
+    def set_flagged(self, value) -> None:
+        """Set flagged status of video"""
+        self._columns.flags[self._row] = 1 if value else 0
+
+    def set_flagged_reason(self, value) -> None:
+        """Set reason for flagging video"""
+        if value is None:
+            self._columns.flagged_reasons.pop(self._row, None)
+        else:
+            self._columns.flagged_reasons[self._row] = value
+
+
+class _SortedVideoIds(Sequence):
+    """The video ids of a VideoColumns in ascending order, for bisect."""
+
+    def __init__(self, columns, rows):
+        self._columns = columns
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, i) -> str:
+        return self._columns.video_id(self._rows[i])
+
+
+class VideoSequence(Sequence):
+    """The videos of a VideoColumns listed in a given row order."""
+
+    def __init__(self, columns, rows):
+        """
+        Args:
+            columns: The VideoColumns holding the videos.
+            rows: An array of rows, in the order the videos are listed.
+        """
+        self._columns = columns
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, i) -> BaseVideo:
+        return VideoView(self._columns, self._rows[i])
+
+    def __iter__(self):
+        columns = self._columns
+        return (VideoView(columns, row) for row in self._rows)
+
+
+class VideoRanks(Mapping):
+    """Maps video ids to their position in a row order of VideoColumns."""
+
+    def __init__(self, columns, rows):
+        """
+        Args:
+            columns: The VideoColumns holding the videos.
+            rows: An array of rows, in the order the videos are ranked.
+        """
+        self._columns = columns
+        self._ranks = array("i", bytes(4 * len(rows)))
+        for rank, row in enumerate(rows):
+            self._ranks[row] = rank
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __getitem__(self, video_id) -> int:
+        return self._ranks[self._columns.row_of(video_id)]
+
+
+class VideoColumns(Mapping):
+    """A mapping of video ids to videos, stored column by column.
+
+    Titles and ids are kept utf-8 encoded in one buffer each, tags are
+    interned and referenced by number, and flags take a byte per video.
+    A VideoView is created whenever a video is accessed.
+    """
+
+    def __init__(self):
+        self._titles = bytearray()
+        self._title_ends = array("q")
+        self._ids = bytearray()
+        self._id_ends = array("q")
+        self._tag_names = []
+        self._tag_numbers = {}
+        self._tags = array("i")
+        self._tag_ends = array("q")
+        self._id_order = array("i")
+        self.flags = bytearray()
+        self.flagged_reasons = {}
+
+    def append(self, video_title: str, video_id: str, video_tags) -> None:
+        """Adds a video as the next row.
+
+        Args:
+            video_title: The video title.
+            video_id: The video id.
+            video_tags: The video tags.
+        """
+        self._titles += video_title.encode()
+        self._title_ends.append(len(self._titles))
+        self._ids += video_id.encode()
+        self._id_ends.append(len(self._ids))
+        for tag in video_tags:
+            number = self._tag_numbers.get(tag)
+            if number is None:
+                number = self._tag_numbers[tag] = len(self._tag_names)
+                self._tag_names.append(tag)
+            self._tags.append(number)
+        self._tag_ends.append(len(self._tags))
+        self.flags.append(0)
+
+    def freeze(self) -> None:
+        """Builds the id lookup once all the videos are appended.
+
+        A video id appended more than once keeps the row of its first
+        video with the fields of its last one, as a dict would.
+        """
+        order = sorted(range(len(self._id_ends)), key=self.video_id)
+        # Rows with the same id are next to each other, in row order.
+        replaced = {}
+        dropped = set()
+        start = 0
+        for i in range(1, len(order) + 1):
+            if (i < len(order)
+                    and self.video_id(order[i]) == self.video_id(order[start])):
+                continue
+            if i - start > 1:
+                replaced[order[start]] = order[i - 1]
+                dropped.update(order[start + 1:i])
+            start = i
+        if replaced:
+            self._rebuild(replaced, dropped)
+            order = sorted(range(len(self._id_ends)), key=self.video_id)
+        self._id_order = array("i", order)
+
+    def _rebuild(self, replaced, dropped) -> None:
+        """Copies the rows into new columns, filling the rows in replaced
+        from the row they map to and leaving the dropped rows out."""
+        titles = bytearray()
+        title_ends = array("q")
+        ids = bytearray()
+        id_ends = array("q")
+        tags = array("i")
+        tag_ends = array("q")
+        for row in range(len(self._id_ends)):
+            if row in dropped:
+                continue
+            source = replaced.get(row, row)
+            start, end = self._slice(self._title_ends, source)
+            titles += self._titles[start:end]
+            title_ends.append(len(titles))
+            start, end = self._slice(self._id_ends, source)
+            ids += self._ids[start:end]
+            id_ends.append(len(ids))
+            start, end = self._slice(self._tag_ends, source)
+            tags.extend(self._tags[start:end])
+            tag_ends.append(len(tags))
+        self._titles = titles
+        self._title_ends = title_ends
+        self._ids = ids
+        self._id_ends = id_ends
+        self._tags = tags
+        self._tag_ends = tag_ends
+        self.flags = bytearray(len(id_ends))
+
+    @staticmethod
+    def _slice(ends, row):
+        return (ends[row - 1] if row else 0), ends[row]
+
+    def title(self, row: int) -> str:
+        """Returns the title of a row."""
+        start, end = self._slice(self._title_ends, row)
+        return self._titles[start:end].decode()
+
+    def video_id(self, row: int) -> str:
+        """Returns the video id of a row."""
+        start, end = self._slice(self._id_ends, row)
+        return self._ids[start:end].decode()
+
+    def tags(self, row: int) -> tuple:
+        """Returns the tags of a row."""
+        start, end = self._slice(self._tag_ends, row)
+        return tuple(self._tag_names[n] for n in self._tags[start:end])
+
+    def row_of(self, video_id: str) -> int:
+        """Returns the row of a video id. Raises KeyError if it is unknown."""
+        ids = _SortedVideoIds(self, self._id_order)
+        i = bisect_left(ids, video_id)
+        if i == len(ids) or ids[i] != video_id:
+            raise KeyError(video_id)
+        return self._id_order[i]
+
+    def sequence(self, rows) -> VideoSequence:
+        """Returns the videos listed in the given row order."""
+        return VideoSequence(self, rows)
+
+    def __len__(self) -> int:
+        return len(self._id_ends)
+
+    def __iter__(self):
+        return (self.video_id(row) for row in range(len(self)))
+
+    def __getitem__(self, video_id) -> BaseVideo:
+        return VideoView(self, self.row_of(video_id))
+
+    def values(self):
+        """Returns the videos in row order."""
+        return self.sequence(range(len(self)))
@@ -1,35 +1,632 @@
 """A video library class."""
 
+from .catalog_index import CatalogIndex
+from .catalog_reader import parse_catalog
+from .catalog_reader import read_catalog
+from .catalog_snapshot import load_snapshot
+from .catalog_snapshot import save_snapshot
+from .catalog_snapshot import source_key
+from .fuzzy_index import BKTree
+from .fuzzy_index import title_words
+from .read_write_lock import NoLock
+from .read_write_lock import ReadWriteLock
+from .search_cache import SearchCache
 from .video import Video
+from .video_columns import VideoColumns
+from .video_columns import VideoRanks
+from .video_query import contains
+from .video_query import evaluate_query
+from .video_query import intersect
+from .video_query import iter_union
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from bisect import insort
+from itertools import islice
 from pathlib import Path
-import csv
+import random
+import threading
 
 
-# Helper Wrapper around CSV reader to strip whitespace from around
-# each item.
-def _csv_reader_with_strip(reader):
-    yield from ((item.strip() for item in line) for line in reader)
+# Length of the title n-grams kept in the substring index.
+_GRAM_SIZE = 3
+
+# Number of videos loaded in the background between wake ups of the
+# threads waiting for a video.
+_LOAD_CHUNK_SIZE = 10000
+
+# The parsed catalog and indexes kept in a snapshot.
+_SNAPSHOT_FIELDS = (
+    "_videos", "_title_order", "_search_order", "_search_rank",
+    "_title_index", "_grams", "_tag_index", "_playable", "_playable_slot")
+
+
+def _title_grams(title):
+    """Returns the distinct n-grams starting at each position of a title.
+
+    Grams at the end of the title are shorter than _GRAM_SIZE, so every
+    substring of up to _GRAM_SIZE characters is a prefix of some gram.
+    """
+    return {title[i:i + _GRAM_SIZE] for i in range(len(title))}
+
+
+class _LowerTitles:
+    """The lower case titles of a list of videos, to bisect it."""
+
+    __slots__ = ("_videos",)
+
+    def __init__(self, videos):
+        self._videos = videos
+
+    def __len__(self) -> int:
+        return len(self._videos)
+
+    def __getitem__(self, i) -> str:
+        return self._videos[i].title.lower()
+
+
+class _RankIndex:
+    """The title and tag indexes of a loaded VideoLibrary, seen by
+    evaluate_query as posting lists of ranks."""
+
+    __slots__ = ("_library",)
+
+    def __init__(self, library):
+        self._library = library
+
+    def __len__(self) -> int:
+        return len(self._library._search_order)
+
+    def posting(self, kind, term):
+        library = self._library
+        if kind == "tag":
+            return library._tag_index.get(term, ())
+        candidates = library._title_candidates(term, whole=True)
+        if len(term) <= _GRAM_SIZE:
+            return list(candidates)
+        return [rank for rank in candidates
+                if term in library._search_order[rank].title.lower()]
+
+    def posting_size(self, kind, term) -> int:
+        library = self._library
+        if kind == "tag":
+            return len(library._tag_index.get(term, ()))
+        if len(term) < _GRAM_SIZE:
+            return len(self)
+        return min(
+            len(library._title_index.get(term[i:i + _GRAM_SIZE], ()))
+            for i in range(len(term) - _GRAM_SIZE + 1))
+
+    def matches(self, kind, term, rank) -> bool:
+        library = self._library
+        if kind == "tag":
+            return contains(library._tag_index.get(term, ()), rank)
+        return term in library._search_order[rank].title.lower()
+
+
+def _posting(index, key):
+    """Returns the posting list of key, creating it if needed."""
+    posting = index.get(key)
+    if posting is None:
+        posting = index[key] = array("i")
+    return posting
 
 
 class VideoLibrary:
     """A class used to represent a Video Library."""
 
-    def __init__(self):
-        """The VideoLibrary class is initialized."""
+    def __init__(self, video_file=None, compact=False, lazy=False,
+                 snapshot=False, background=False, thread_safe=False,
+                 search_cache_size=0):
+        """The VideoLibrary class is initialized.
+
+        Args:
+            video_file: Path of the catalog to load, videos.txt next to
+                this module by default.
+            compact: Store the catalog in array-backed columns instead of
+                one Video object per video. Videos are then created on
+                access, which saves memory on large catalogs.
+            lazy: Only index where each video is in the memory-mapped
+                catalog file and parse a video when it is first asked for.
+                The whole catalog is loaded the first time a search or
+                listing needs it. Cannot be combined with compact.
+            snapshot: Keep a binary snapshot of the parsed catalog and its
+                indexes next to the catalog file, and load it instead of
+                parsing the catalog while the file is unchanged.
+            background: Load the catalog in a background thread and return
+                at once. get_video only waits until its own video is
+                loaded (until the whole catalog is, when compact), while
+                searches and listings wait for the load to finish. Cannot
+                be combined with lazy.
+            thread_safe: Let several threads use the library at once.
+                Searches and listings share a lock that flagging and
+                allowing videos take exclusively.
+            search_cache_size: Number of search results the players keep
+                in search_cache. No results are cached if 0.
+        """
+        if video_file is None:
+            video_file = Path(__file__).parent / "videos.txt"
+        if compact and lazy:
+            raise ValueError("A video library cannot be compact and lazy.")
+        if lazy and background:
+            raise ValueError(
+                "A video library cannot be lazy and load in the background.")
+        self._video_file = video_file
+        self._compact = compact
+        self._snapshot = snapshot
         self._videos = {}
-        with open(Path(__file__).parent / "videos.txt") as video_file:
-            reader = _csv_reader_with_strip(
-                csv.reader(video_file, delimiter="|"))
-            for video_info in reader:
-                title, url, tags = video_info
-                self._videos[url] = Video(
-                    title,
-                    url,
-                    [tag.strip() for tag in tags.split(",")] if tags else [],
-                )
+        self._catalog_index = None
+        self._loading = False
+        self._load_progress = None
+        self._load_error = None
+        # Flags the loader applies once the catalog is loaded.
+        self._restored_flags = {}
+        # The title words and their BK-tree, built by the first fuzzy
+        # search.
+        self._word_index = None
+        self._word_tree = None
+        self._word_tree_lock = threading.Lock()
+        # Serializes loading the whole catalog with lazily parsing videos.
+        self._load_lock = threading.RLock()
+        self.thread_safe = thread_safe
+        self._lock = ReadWriteLock() if thread_safe else NoLock()
+        self.search_cache = None
+        if search_cache_size:
+            self.search_cache = SearchCache(search_cache_size)
+        if lazy:
+            self._catalog_index = CatalogIndex(video_file)
+        elif background:
+            self._loading = True
+            self._load_progress = threading.Condition()
+            threading.Thread(
+                target=self._load_in_background, name="VideoLibraryLoader",
+                daemon=True).start()
+        else:
+            self._load()
+
+    def _load(self):
+        """Parses the whole catalog and builds the indexes.
+
+        Videos already parsed by get_video are kept as they are, so their
+        flags survive. The snapshot is only used when no video was parsed
+        yet, as it holds the catalog as it was loaded.
+        """
+        self._word_index = self._word_tree = None
+        use_snapshot = self._snapshot and not self._videos
+        if use_snapshot:
+            mode = "compact" if self._compact else "objects"
+            state = load_snapshot(self._video_file, mode, _SNAPSHOT_FIELDS)
+            if state is not None:
+                for name, value in state.items():
+                    setattr(self, name, value)
+                return
+            key = source_key(self._video_file)
+        if self._compact:
+            self._videos = VideoColumns()
+            for title, url, tags in read_catalog(self._video_file):
+                self._videos.append(title, url, tags)
+            self._videos.freeze()
+        else:
+            parsed, self._videos = self._videos, {}
+            for title, url, tags in read_catalog(self._video_file):
+                video = parsed.get(url)
+                if video is None:
+                    video = Video(title, url, tags)
+                self._videos[url] = video
+                loaded = len(self._videos)
+                if self._loading and loaded % _LOAD_CHUNK_SIZE == 0:
+                    with self._load_progress:
+                        self._load_progress.notify_all()
+        self._build_orders()
+        self._build_title_index()
+        self._build_tag_index()
+        self._build_playable()
+        if use_snapshot:
+            state = {name: getattr(self, name) for name in _SNAPSHOT_FIELDS}
+            save_snapshot(self._video_file, mode, key, state)
+
+    def _load_in_background(self):
+        """Loads the catalog and applies the restored flags, then wakes up
+        every thread waiting for it."""
+        try:
+            self._load()
+        except Exception as error:
+            self._load_error = error
+        finally:
+            with self._load_progress:
+                if self._load_error is None:
+                    # Nothing reads the indexes or the videos of these
+                    # flags until the load ends, so no lock is needed.
+                    for video_id, flag_reason in self._restored_flags.items():
+                        video = self._videos.get(video_id, None)
+                        if video is not None and not video.is_flagged:
+                            self._flag(video, flag_reason)
+                self._restored_flags = {}
+                self._loading = False
+                self._load_progress.notify_all()
+
+    def _wait_until_loaded(self):
+        """Waits for the background load, re-raising its error if any."""
+        if self._loading:
+            with self._load_progress:
+                while self._loading:
+                    self._load_progress.wait()
+        if self._load_error is not None:
+            raise self._load_error
+
+    def _wait_for_video(self, video_id) -> Video:
+        """Waits until a video or the whole catalog is loaded."""
+        with self._load_progress:
+            while self._loading:
+                video = self._videos.get(video_id, None)
+                if video is not None and video_id not in self._restored_flags:
+                    return video
+                self._load_progress.wait()
+        self._wait_until_loaded()
+        return self._videos.get(video_id, None)
+
+    def _ensure_loaded(self):
+        """Loads the whole catalog if the library is still lazy or loading
+        in the background."""
+        self._wait_until_loaded()
+        if self._catalog_index is not None:
+            with self._load_lock:
+                if self._catalog_index is not None:
+                    self._load()
+                    self._catalog_index.close()
+                    self._catalog_index = None
+
+    def _build_orders(self):
+        """Sorts the videos once by title and by lower case title.
+
+        Both orders are stable, so videos with equal titles keep library
+        order. A video's rank is its position in the lower case order,
+        which is the order search results are listed in.
+        """
+        if self._compact:
+            columns = self._videos
+            rows = range(len(columns))
+            title_rows = array("i", sorted(rows, key=columns.title))
+            search_rows = array("i", sorted(
+                rows, key=lambda row: columns.title(row).lower()))
+            self._title_order = columns.sequence(title_rows)
+            self._search_order = columns.sequence(search_rows)
+            self._search_rank = VideoRanks(columns, search_rows)
+            return
+        self._title_order = sorted(
+            self._videos.values(), key=lambda video: video.title)
+        self._search_order = sorted(
+            self._videos.values(), key=lambda video: video.title.lower())
+        self._search_rank = {
+            video.video_id: rank
+            for rank, video in enumerate(self._search_order)}
+
+    def _build_title_index(self):
+        """Builds the n-gram posting lists over the lower case titles.
+
+        Each posting list holds the ranks of the videos containing the
+        gram, in ascending order.
+        """
+        self._title_index = {}
+        for rank, video in enumerate(self._search_order):
+            for gram in _title_grams(video.title.lower()):
+                _posting(self._title_index, gram).append(rank)
+        self._grams = sorted(self._title_index)
+
+    def _words(self) -> tuple:
+        """Returns the posting lists of the lower case title words, and the
+        BK-tree of those words, built by the first fuzzy search.
+
+        The words are added to the tree in sorted order, which keeps it
+        faster to build and search than frequency or random order.
+        """
+        with self._word_tree_lock:
+            if self._word_tree is None:
+                word_index = {}
+                for rank, video in enumerate(self._search_order):
+                    for word in title_words(video.title):
+                        _posting(word_index, word).append(rank)
+                self._word_index = word_index
+                self._word_tree = BKTree(sorted(word_index))
+            return self._word_index, self._word_tree
+
+    def _build_tag_index(self):
+        """Builds the tag posting lists of the unflagged videos.
+
+        Each posting list holds the ranks of the unflagged videos carrying
+        the tag, in ascending order.
+        """
+        self._tag_index = {}
+        for rank, video in enumerate(self._search_order):
+            if video.is_flagged:
+                continue
+            for tag in set(video.tags):
+                _posting(self._tag_index, tag).append(rank)
+
+    def _build_playable(self):
+        """Builds the list of unflagged video ranks used by random play.
+
+        _playable_slot holds the position of each rank in _playable, or -1
+        for flagged videos, so both can be updated in constant time.
+        """
+        self._playable = array("i")
+        self._playable_slot = array("i", [-1]) * len(self._search_order)
+        for rank, video in enumerate(self._search_order):
+            if not video.is_flagged:
+                self._playable_slot[rank] = len(self._playable)
+                self._playable.append(rank)
+
+    def _title_candidates(self, term, whole=False):
+        """Returns the sorted ranks whose lower case title may contain term.
+
+        The rows are exact matches unless term is longer than _GRAM_SIZE.
+        A term shorter than _GRAM_SIZE merges the postings of many grams,
+        lazily so the first ranks come at once, or by sorting them all
+        when whole is true, which is quicker for every rank.
+        """
+        if not term:
+            return range(len(self._search_order))
+        if len(term) >= _GRAM_SIZE:
+            postings = []
+            for i in range(len(term) - _GRAM_SIZE + 1):
+                posting = self._title_index.get(term[i:i + _GRAM_SIZE])
+                if posting is None:
+                    return []
+                postings.append(posting)
+            return intersect(postings)
+        # A short term is a prefix of the grams starting where it occurs.
+        start = bisect_left(self._grams, term)
+        end = bisect_right(self._grams, term + "\U0010ffff", start)
+        postings = [self._title_index[gram] for gram in self._grams[start:end]]
+        if not whole:
+            return iter_union(postings)
+        ranks = set()
+        for posting in postings:
+            ranks.update(posting)
+        return sorted(ranks)
+
+    def __len__(self) -> int:
+        """Returns the number of videos in the library."""
+        self._ensure_loaded()
+        return len(self._videos)
+
+    def reading(self):
+        """Returns a context manager keeping videos from being flagged or
+        allowed while it is held.
+
+        Lets a thread look at several videos and their flags consistently
+        when the library is thread safe. Do not flag or allow videos, or
+        wait for a user, while holding it.
+        """
+        return self._lock.read()
+
+    def search_titles(self, search_term) -> list:
+        """Returns the videos whose titles contain the search term.
+
+        The match ignores case and only looks at the candidate videos
+        found through the title index.
+
+        Args:
+            search_term: The substring to look for.
+
+        Returns:
+            A list of matching Video objects sorted by lower case title.
+        """
+        with self._lock.read():
+            return list(self._iter_titles(search_term, whole=True))
+
+    def iter_search_titles(self, search_term):
+        """Yields the videos search_titles returns, one at a time.
+
+        Hold reading() while iterating if the library is thread safe.
+
+        Args:
+            search_term: The substring to look for.
+        """
+        return self._iter_titles(search_term)
+
+    def _iter_titles(self, search_term, whole=False):
+        """Yields the videos whose titles contain the search term, with the
+        candidates of _title_candidates(term, whole)."""
+        self._ensure_loaded()
+        term = search_term.lower()
+        videos = (self._search_order[rank]
+                  for rank in self._title_candidates(term, whole))
+        if len(term) <= _GRAM_SIZE:
+            return videos
+        return (video for video in videos if term in video.title.lower())
+
+    def iter_title_prefix(self, prefix):
+        """Yields the videos whose titles start with prefix, ignoring case,
+        in the order of search_titles.
+
+        The first video is found by bisecting the lower case titles.
+        Hold reading() while iterating if the library is thread safe.
+
+        Args:
+            prefix: The start of the titles to look for.
+        """
+        self._ensure_loaded()
+        prefix = prefix.lower()
+        order = self._search_order
+        titles = _LowerTitles(order)
+        start = bisect_left(titles, prefix)
+        end = bisect_right(titles, prefix + "\U0010ffff", start)
+        return (order[i] for i in range(start, end))
+
+    def search_titles_fuzzy(self, search_term, max_distance) -> list:
+        """Returns the videos with a title word close to the search term.
+
+        Args:
+            search_term: The word to look for, matched in lower case.
+            max_distance: The largest number of insertions, deletions and
+                substitutions between the search term and a title word.
+
+        Returns:
+            A list of Video objects sorted by the distance of their closest
+            word, then by lower case title.
+        """
+        self._ensure_loaded()
+        word_index, word_tree = self._words()
+        distances = {}
+        for distance, word in word_tree.search(
+                search_term.lower(), max_distance):
+            for rank in word_index[word]:
+                distances.setdefault(rank, distance)
+        ranks = sorted(distances, key=lambda rank: (distances[rank], rank))
+        return [self._search_order[rank] for rank in ranks]
+
+    def search_query(self, query) -> list:
+        """Returns the videos matching a boolean query.
+
+        The query is run on the posting lists of the title and tag
+        indexes, so only the videos of its terms are looked at. Tags only
+        match unflagged videos, as in search_tag.
+
+        Args:
+            query: A query parsed by video_query.parse_query.
+
+        Returns:
+            A list of matching Video objects sorted by lower case title.
+        """
+        self._ensure_loaded()
+        with self._lock.read():
+            ranks = evaluate_query(query, _RankIndex(self))
+            return [self._search_order[rank] for rank in ranks]
+
+    def search_tag(self, video_tag) -> list:
+        """Returns the unflagged videos carrying the tag.
+
+        Args:
+            video_tag: The tag to look for, matched in lower case.
+
+        Returns:
+            A list of Video objects sorted by lower case title.
+        """
+        with self._lock.read():
+            return list(self.iter_search_tag(video_tag))
+
+    def iter_search_tag(self, video_tag, start=0):
+        """Yields the videos search_tag returns, one at a time.
+
+        Hold reading() while iterating if the library is thread safe.
+
+        Args:
+            video_tag: The tag to look for, matched in lower case.
+            start: The number of videos to skip.
+        """
+        self._ensure_loaded()
+        posting = self._tag_index.get(video_tag.lower(), ())
+        return (self._search_order[rank]
+                for rank in islice(posting, start, None))
+
+    def flag_video(self, video_id, flag_reason) -> bool:
+        """Flags a video and removes it from the tag index.
+
+        Args:
+            video_id: The video url.
+            flag_reason: Reason for flagging the video.
+
+        Returns:
+            False if the video was already flagged or does not exist.
+        """
+        self._wait_until_loaded()
+        with self._lock.write(), self._load_lock:
+            video = self.get_video(video_id)
+            if video is None or video.is_flagged:
+                return False
+            self._flag(video, flag_reason)
+            return True
+
+    def _flag(self, video, flag_reason):
+        """Flags an unflagged video and updates the indexes and cache."""
+        if self._catalog_index is None:
+            self._remove_playable(video)
+        # Readers seeing the flag also see its reason.
+        video.set_flagged_reason(flag_reason)
+        video.set_flagged(True)
+        if self.search_cache is not None:
+            self.search_cache.invalidate(video)
+
+    def restore_flags(self, flags):
+        """Flags videos again, as recorded by a journal.
+
+        While the catalog loads in the background, the loader flags them
+        once it is loaded and get_video waits for that on these videos
+        only, so the other videos are still served early.
+
+        Args:
+            flags: A dictionary of video ids to flag reasons. Unknown and
+                already flagged videos are skipped.
+        """
+        if self._loading:
+            with self._load_progress:
+                if self._loading:
+                    self._restored_flags.update(flags)
+                    return
+        for video_id, flag_reason in flags.items():
+            self.flag_video(video_id, flag_reason)
+
+    def allow_video(self, video_id) -> bool:
+        """Removes the flag from a video and adds it back to the tag index.
+
+        Args:
+            video_id: The video url.
+
+        Returns:
+            False if the video was not flagged or does not exist.
+        """
+        self._wait_until_loaded()
+        with self._lock.write(), self._load_lock:
+            video = self.get_video(video_id)
+            if video is None or not video.is_flagged:
+                return False
+            if self._catalog_index is None:
+                rank = self._search_rank[video_id]
+                for tag in set(video.tags):
+                    insort(_posting(self._tag_index, tag), rank)
+                self._playable_slot[rank] = len(self._playable)
+                self._playable.append(rank)
+            video.set_flagged(False)
+            video.set_flagged_reason(None)
+            if self.search_cache is not None:
+                self.search_cache.invalidate(video)
+            return True
+
+    def _remove_playable(self, video):
+        """Takes a video being flagged out of the tag and playable indexes."""
+        rank = self._search_rank[video.video_id]
+        for tag in set(video.tags):
+            posting = self._tag_index[tag]
+            del posting[bisect_left(posting, rank)]
+        # Swap the last playable video into the freed slot.
+        slot = self._playable_slot[rank]
+        last = self._playable.pop()
+        if last != rank:
+            self._playable[slot] = last
+            self._playable_slot[last] = slot
+        self._playable_slot[rank] = -1
+
+    def get_random_playable_video(self) -> Video:
+        """Returns a random unflagged video, or None if all are flagged."""
+        self._ensure_loaded()
+        with self._lock.read():
+            if not self._playable:
+                return None
+            return self._search_order[random.choice(self._playable)]
+
+    def iter_videos_by_title(self, start=0):
+        """Returns an iterator over all videos in title order, skipping the
+        first start videos without reading them."""
+        self._ensure_loaded()
+        order = self._title_order
+        if not start:
+            return iter(order)
+        return (order[i] for i in range(start, len(order)))
 
     def get_all_videos(self) -> list:
         """Returns all available video information from the video library."""
+        self._ensure_loaded()
         return list(self._videos.values())
 
     def get_video(self, video_id) -> Video:
@@ -42,4 +639,22 @@ class VideoLibrary:
             The Video object for the requested video_id. None if the video
             does not exist.
         """
-        return self._videos.get(video_id, None)
+        video = self._videos.get(video_id, None)
+        if self._loading and (
+                video is None or video_id in self._restored_flags):
+            video = self._wait_for_video(video_id)
+        if video is None and self._catalog_index is not None:
+            with self._load_lock:
+                video = self._parse_video(video_id)
+        return video
+
+    def _parse_video(self, video_id) -> Video:
+        """Parses a video of the lazily read catalog, holding _load_lock."""
+        if self._catalog_index is None:
+            # Loaded by another thread in the meantime.
+            return self._videos.get(video_id, None)
+        line = self._catalog_index.line(video_id)
+        if line is None:
+            return None
+        title, url, tags = next(parse_catalog([line]))
+        return self._videos.setdefault(url, Video(title, url, tags))
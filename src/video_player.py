@@ -1,48 +1,196 @@
 """A video player class."""
 
-import random
-from collections import defaultdict
+from itertools import islice
+import time
+
+from .fuzzy_index import default_max_distance
+from .output_sink import StdoutSink
 from .video_library import VideoLibrary
 from .video_playlist import Playlist
+from .video_query import parse_query
+
+
+# Lines written to the output at once by long listings.
+_LINES_PER_WRITE = 1024
 
 
 class VideoPlayer:
-    """A class used to represent a Video Player."""
+    """A class used to represent a Video Player.
+
+    The video library, which holds the catalog and the flags, can be shared
+    by many players. Everything else, the video playing and the playlists,
+    belongs to one player, so a player is a cheap per-user session.
+    """
+
+    __slots__ = ("_video_library", "output", "_read_answer", "_journal",
+                 "_defer_answers", "pending_question", "answer_nanoseconds",
+                 "currently_playing", "is_paused", "playlists")
 
-    def __init__(self):
-        self._video_library = VideoLibrary()
+    playing_video = "Playing video: {}"
+    stopping_video = "Stopping video: {}"
+    cannot_play = "Cannot play video: Video does not exist"
+    cannot_stop = "Cannot stop video: No video is currently playing"
+
+    def __init__(self, video_library=None, output=None, read_answer=None,
+                 journal=None, defer_answers=False):
+        """
+        Args:
+            video_library: The VideoLibrary to play videos from, the
+                default catalog is loaded if none is given.
+            output: The sink all messages are written to, stdout if none
+                is given.
+            read_answer: Called without arguments to read the answer to a
+                question, input() if none is given. The output is only
+                flushed before input(), so a batch sink stays buffered.
+            journal: The Journal, or SqlitePlaylistStore, the playlists
+                and flags are restored from and every change to them is
+                recorded in, if any.
+            defer_answers: If true, a search does not wait for the answer
+                to its question but leaves the question in
+                pending_question until answer_question is called, so a
+                server does not hold a thread while its user thinks.
+        """
+        if(video_library == None):
+            video_library = VideoLibrary()
+        if(output == None):
+            output = StdoutSink()
+        self._video_library = video_library
+        self.output = output
+        self._read_answer = read_answer
+        self._defer_answers = defer_answers
+        # the results and offset of the question waiting for an answer
+        self.pending_question = None
+        # time spent waiting for answers, left out of command latencies
+        self.answer_nanoseconds = 0
         self.currently_playing = None
         self.is_paused = False
-        self.playing_video = "Playing video: {}"
-        self.stopping_video = "Stopping video: {}"
-        self.cannot_play = "Cannot play video: Video does not exist"
-        self.cannot_stop = "Cannot stop video: No video is currently playing"
-        self.playlists = []
-        # store names of playlists in lower case
-        self.playlist_names = defaultdict(lambda: None)
+        # playlists keyed by their name in lower case
+        self.playlists = {}
+        self._journal = journal
+        if(journal != None):
+            self._restore(journal)
+
+    def new_session(self, output=None, read_answer=None,
+                    defer_answers=False):
+        """Returns a player for another user sharing this player's library.
+
+        Args:
+            output: The sink the new player writes to, stdout if none is
+                given.
+            read_answer: Called to read the answers of the new player's
+                user, input() if none is given.
+            defer_answers: Whether the new player leaves its questions in
+                pending_question instead of waiting for the answers.
+        """
+        return VideoPlayer(self._video_library, output, read_answer,
+                           defer_answers=defer_answers)
     
-    def _filter_flagged_videos(self) -> list:
-        all_videos = self._video_library.get_all_videos()
-        return list(filter(lambda video: not video.is_flagged,all_videos))
+    def _restore(self, journal):
+        """Recreates the playlists and flags recorded in the journal.
+
+        Nothing is looked up in the library, which may still be loading in
+        the background. Videos no longer in it are removed from the
+        playlists when they are shown."""
+        for recorded in journal.playlists.values():
+            playlist = Playlist(recorded.name)
+            for video_id in recorded:
+                playlist.add_video(video_id)
+            self.playlists[playlist.name.lower()] = playlist
+        self._video_library.restore_flags(journal.flags)
+
+    def _record(self, *change):
+        """Appends a change of the playlists or flags to the journal, if any"""
+        if(self._journal != None):
+            self._journal.append(*change)
+
+    def _get_playlist(self, playlist_name):
+        """Returns the playlist with the given name, ignoring case, or None"""
+        return self.playlists.get(playlist_name.lower())
+
+    def _print(self, message):
+        """Writes a message as one line to the output sink"""
+        self.output.write(f"{message}\n")
+
+    def _print_lines(self, lines):
+        """Writes each message as a line, _LINES_PER_WRITE lines per write,
+        so a long listing is never joined into one string"""
+        lines = iter(lines)
+        while True:
+            chunk = "".join(
+                f"{line}\n" for line in islice(lines, _LINES_PER_WRITE))
+            if(chunk == ""):
+                return
+            self.output.write(chunk)
+
+    def _parse_page(self, page_size, offset):
+        """Returns the page size and offset as numbers, or None after
+        telling the user if they are not valid
+
+        Args:
+            page_size: The number of results to show, None for all.
+            offset: The number of results to skip.
+        """
+        try:
+            offset = int(offset)
+            if(page_size != None):
+                page_size = int(page_size)
+        except ValueError:
+            offset = -1
+        if(offset < 0 or (page_size != None and page_size < 1)):
+            self._print("Please enter a page size of at least 1 and an offset of at least 0.")
+            return None
+        return page_size, offset
+
+    def _page(self, videos, page_size, offset):
+        """Returns the videos of a page and whether more videos follow it,
+        only reading the videos up to the end of the page
 
-    def _print_flagged_video(self,video):
-        print(f" {video} - FLAGGED (reason: {video.flagged_reason})")
+        Args:
+            videos: An iterable over all the videos.
+            page_size: The number of videos in a page.
+            offset: The number of videos before the page.
+        """
+        page = list(islice(videos, offset, offset + page_size + 1))
+        return page[:page_size], len(page) > page_size
+
+    def _format_flagged_video(self,video):
+        return f" {video} - FLAGGED (reason: {video.flagged_reason})"
 
     def number_of_videos(self):
-        num_videos = len(self._video_library.get_all_videos())
-        print(f"{num_videos} videos in the library")
-
-    def show_all_videos(self):
-        """Returns all videos."""
-
-        list_of_videos = self._video_library.get_all_videos()
-        list_of_videos.sort(key=lambda a: a.title)
-        print("Here's a list of all available videos:")
-        for i in range(len(list_of_videos)):
-            if(list_of_videos[i].is_flagged):
-                self._print_flagged_video(list_of_videos[i])
+        num_videos = len(self._video_library)
+        self._print(f"{num_videos} videos in the library")
+
+    def show_all_videos(self, page_size=None, offset="0"):
+        """Returns all videos, or one page of them.
+
+        Args:
+            page_size: The number of videos to show, all if None.
+            offset: The number of videos to skip.
+        """
+        page = self._parse_page(page_size, offset)
+        if(page == None):
+            return
+        page_size, offset = page
+        more = False
+        with self._video_library.reading():
+            videos = self._video_library.iter_videos_by_title(offset)
+            if(page_size != None):
+                videos, more = self._page(videos, page_size, 0)
+                if(len(videos) == 0 and offset > 0):
+                    self._print("No more videos to show")
+                    return
+            self._print_lines(self._video_lines(videos))
+        if(more):
+            self._print(f"More videos: SHOW_ALL_VIDEOS {page_size} {offset + page_size}")
+
+    def _video_lines(self, videos):
+        """Yields the lines listing the videos"""
+        yield "Here's a list of all available videos:"
+        for video in videos:
+            if(video.is_flagged):
+                yield self._format_flagged_video(video)
                 continue
-            print(list_of_videos[i])
+            yield video
 
     def play_video(self, video_id):
         """Plays the respective video.
@@ -53,35 +201,36 @@ class VideoPlayer:
 
         video = self._video_library.get_video(video_id)
         if(video == None):
-            print(self.cannot_play)
+            self._print(self.cannot_play)
             return
-        if(video.is_flagged):
-            print(f"Cannot play video: Video is currently flagged (reason: {video.flagged_reason})")
+        with self._video_library.reading():
+            flagged_reason = video.flagged_reason if video.is_flagged else None
+        if(flagged_reason != None):
+            self._print(f"Cannot play video: Video is currently flagged (reason: {flagged_reason})")
             return
         if(self.currently_playing != None):
-            print(self.stopping_video.format(self.currently_playing.title))
+            self._print(self.stopping_video.format(self.currently_playing.title))
         self.currently_playing = video
         self.is_paused = False
-        print(self.playing_video.format(self.currently_playing.title))
+        self._print(self.playing_video.format(self.currently_playing.title))
 
     def stop_video(self):
         """Stops the current video."""
 
         if(self.currently_playing == None):
-            print(self.cannot_stop)
+            self._print(self.cannot_stop)
             return
-        print(self.stopping_video.format(self.currently_playing.title))
+        self._print(self.stopping_video.format(self.currently_playing.title))
         self.currently_playing = None
         self.is_paused = False
 
     def play_random_video(self):
         """Plays a random video from the video library."""
 
-        available_videos = self._filter_flagged_videos()
-        if(len(available_videos) == 0):
-            print("No videos available")
+        video = self._video_library.get_random_playable_video()
+        if(video == None):
+            self._print("No videos available")
             return
-        video = random.choice(available_videos)
         self.play_video(video.video_id)
 
     def pause_video(self):
@@ -89,36 +238,36 @@ class VideoPlayer:
 
         if(self.currently_playing != None and not self.is_paused):
             self.is_paused = True
-            print(f"Pausing video: {self.currently_playing.title}")
+            self._print(f"Pausing video: {self.currently_playing.title}")
             return
         if(self.currently_playing == None):
-            print("Cannot pause video: No video is currently playing")
+            self._print("Cannot pause video: No video is currently playing")
             return
         if(self.is_paused):
-            print(f"Video already paused: {self.currently_playing.title}")
+            self._print(f"Video already paused: {self.currently_playing.title}")
 
     def continue_video(self):
         """Resumes playing the current video."""
 
         if(not self.is_paused and self.currently_playing != None):
-            print("Cannot continue video: Video is not paused")
+            self._print("Cannot continue video: Video is not paused")
             return
         if(self.currently_playing == None):
-            print("Cannot continue video: No video is currently playing")
+            self._print("Cannot continue video: No video is currently playing")
             return
         self.is_paused = False
-        print(f"Continuing video: {self.currently_playing.title}")
+        self._print(f"Continuing video: {self.currently_playing.title}")
 
     def show_playing(self):
         """Displays video currently playing."""
 
         if(self.currently_playing == None):
-            print("No video is currently playing")
+            self._print("No video is currently playing")
             return
         if(self.is_paused):
-            print(f"Currently playing:{self.currently_playing} - PAUSED")
+            self._print(f"Currently playing:{self.currently_playing} - PAUSED")
         else:
-            print(f"Currently playing:{self.currently_playing}")
+            self._print(f"Currently playing:{self.currently_playing}")
 
     def create_playlist(self, playlist_name):
         """Creates a playlist with a given name.
@@ -126,13 +275,13 @@ class VideoPlayer:
         Args:
             playlist_name: The playlist name.
         """
-        if(self.playlist_names[playlist_name.lower()] != None):
-            print("Cannot create playlist: A playlist with the same name already exists")
+        if(self._get_playlist(playlist_name) != None):
+            self._print("Cannot create playlist: A playlist with the same name already exists")
         else:
-            self.playlist_names[playlist_name.lower()] = len(self.playlists)
             playlist = Playlist(playlist_name)
-            self.playlists.append(playlist)
-            print(f"Successfully created new playlist: {playlist.name}")
+            self.playlists[playlist_name.lower()] = playlist
+            self._record("create_playlist", playlist.name)
+            self._print(f"Successfully created new playlist: {playlist.name}")
 
     def add_to_playlist(self, playlist_name, video_id):
         """Adds a video to a playlist with a given name.
@@ -141,34 +290,37 @@ class VideoPlayer:
             playlist_name: The playlist name.
             video_id: The video_id to be added.
         """
-        if(self.playlist_names[playlist_name.lower()] == None):
-            print(f"Cannot add video to {playlist_name}: Playlist does not exist")
+        playlist = self._get_playlist(playlist_name)
+        if(playlist == None):
+            self._print(f"Cannot add video to {playlist_name}: Playlist does not exist")
             return
         video = self._video_library.get_video(video_id)
         if(video == None):
-            print(f"Cannot add video to {playlist_name}: Video does not exist")
+            self._print(f"Cannot add video to {playlist_name}: Video does not exist")
             return
-        if(video.is_flagged):
-            print(f"Cannot add video to {playlist_name}: " \
-                f"Video is currently flagged (reason: {video.flagged_reason})")
+        with self._video_library.reading():
+            flagged_reason = video.flagged_reason if video.is_flagged else None
+        if(flagged_reason != None):
+            self._print(f"Cannot add video to {playlist_name}: " \
+                f"Video is currently flagged (reason: {flagged_reason})")
             return
-        playlist = self.playlists[self.playlist_names[playlist_name.lower()]]
         result = playlist.add_video(video_id)
         if(result == 0):
-            print(f"Cannot add video to {playlist_name}: Video already added")
+            self._print(f"Cannot add video to {playlist_name}: Video already added")
         else:
-            print(f"Added video to {playlist_name}: {video.title}")
+            self._record("add_to_playlist", playlist_name, video_id)
+            self._print(f"Added video to {playlist_name}: {video.title}")
 
     def show_all_playlists(self):
         """Display all playlists."""
 
         if(len(self.playlists) == 0):
-            print("No playlists exist yet")
+            self._print("No playlists exist yet")
         else:
-            playlists = sorted(self.playlists,key=lambda a: a.name.lower())
-            print("Showing all playlists:")
-            for i in range(len(playlists)):
-                print(f" {playlists[i].name}")
+            playlists = sorted(self.playlists.values(),key=lambda a: a.name.lower())
+            lines = ["Showing all playlists:"]
+            lines.extend(f" {playlist.name}" for playlist in playlists)
+            self._print_lines(lines)
 
     def show_playlist(self, playlist_name):
         """Display all videos in a playlist with a given name.
@@ -176,22 +328,26 @@ class VideoPlayer:
         Args:
             playlist_name: The playlist name.
         """
-        if(self.playlist_names[playlist_name.lower()] == None):
-            print(f"Cannot show playlist {playlist_name}: Playlist does not exist")
+        playlist = self._get_playlist(playlist_name)
+        if(playlist == None):
+            self._print(f"Cannot show playlist {playlist_name}: Playlist does not exist")
             return
-        playlist = self.playlists[
-            self.playlist_names[playlist_name.lower()]]
-        print(f"Showing playlist: {playlist_name}")
-        if(len(playlist.videos) == 0):
-            print(" No videos here yet")
-        else:
-            videos = playlist.videos[::-1]
-            for i in range(len(videos)):
-                video = self._video_library.get_video(playlist.videos[i])
+        lines = [f"Showing playlist: {playlist_name}"]
+        with self._video_library.reading():
+            for video_id in playlist.videos:
+                video = self._video_library.get_video(video_id)
+                if(video == None):
+                    # restored from a journal but gone from the library
+                    playlist.remove_video(video_id)
+                    self._record("remove_from_playlist", playlist.name, video_id)
+                    continue
                 if(video.is_flagged):
-                    self._print_flagged_video(video)
+                    lines.append(self._format_flagged_video(video))
                     continue
-                print(f" {video}")
+                lines.append(f" {video}")
+        if(len(lines) == 1):
+            lines.append(" No videos here yet")
+        self._print_lines(lines)
 
     def remove_from_playlist(self, playlist_name, video_id):
         """Removes a video to a playlist with a given name.
@@ -201,20 +357,20 @@ class VideoPlayer:
             video_id: The video_id to be removed.
         """
 
-        if(self.playlist_names[playlist_name.lower()] == None):
-            print(f"Cannot remove video from {playlist_name}: Playlist does not exist")
+        playlist = self._get_playlist(playlist_name)
+        if(playlist == None):
+            self._print(f"Cannot remove video from {playlist_name}: Playlist does not exist")
             return
         video = self._video_library.get_video(video_id)
         if(video == None):
-            print(f"Cannot remove video from {playlist_name}: Video does not exist")
+            self._print(f"Cannot remove video from {playlist_name}: Video does not exist")
             return
-        playlist = self.playlists[
-            self.playlist_names[playlist_name.lower()]]
         result = playlist.remove_video(video_id)
         if(result == 0):
-            print(f"Cannot remove video from {playlist_name}: Video is not in playlist")
+            self._print(f"Cannot remove video from {playlist_name}: Video is not in playlist")
         else:
-            print(f"Removed video from {playlist_name}: {video.title}")
+            self._record("remove_from_playlist", playlist_name, video_id)
+            self._print(f"Removed video from {playlist_name}: {video.title}")
 
     def clear_playlist(self, playlist_name):
         """Removes all videos from a playlist with a given name.
@@ -223,13 +379,13 @@ class VideoPlayer:
             playlist_name: The playlist name.
         """
 
-        if(self.playlist_names[playlist_name.lower()] == None):
-            print(f"Cannot clear playlist {playlist_name}: Playlist does not exist")
+        playlist = self._get_playlist(playlist_name)
+        if(playlist == None):
+            self._print(f"Cannot clear playlist {playlist_name}: Playlist does not exist")
             return
-        playlist = self.playlists[
-            self.playlist_names[playlist_name.lower()]]
         playlist.clear_playlist()
-        print(f"Successfully removed all videos from {playlist_name}")
+        self._record("clear_playlist", playlist_name)
+        self._print(f"Successfully removed all videos from {playlist_name}")
 
     def delete_playlist(self, playlist_name):
         """Deletes a playlist with a given name.
@@ -238,73 +394,259 @@ class VideoPlayer:
             playlist_name: The playlist name.
         """
         
-        if(self.playlist_names[playlist_name.lower()] == None):
-            print(f"Cannot delete playlist {playlist_name}: Playlist does not exist")
+        if(self.playlists.pop(playlist_name.lower(), None) == None):
+            self._print(f"Cannot delete playlist {playlist_name}: Playlist does not exist")
             return
-        playlist = self.playlists[
-            self.playlist_names[playlist_name.lower()]]
-        self.playlists.remove(playlist)
-        del self.playlist_names[playlist_name.lower()]
-        print(f"Deleted playlist: {playlist_name}")
+        self._record("delete_playlist", playlist_name)
+        self._print(f"Deleted playlist: {playlist_name}")
     
-    def _filter_videos(self,filter_function,search_term):
-        """Filter out videos that match the search term
+    def _filter_videos(self,filter_function,videos):
+        """Filter out videos that match the search term, keeping the
+        order of the candidates
 
         Args:
             filter_function: The function used to select applicable videos
-            search_term: String used to filter videos
+            videos: The candidate videos to filter
         """
-        all_videos = self._video_library.get_all_videos()
-        search_results = list(filter(filter_function,all_videos))
-        search_results.sort(key=lambda video: video.title.lower())
-        return search_results
+        return list(filter(filter_function,videos))
     
-    def _display_results_and_options(self, search_results, search_term):
+    def _cached_search(self, kind, search_term, search):
+        """Returns the results of a search, from the library's search cache
+        when it has them
+
+        Args:
+            kind: The kind of search, "title" or "tag"
+            search_term: The term searched for
+            search: Called without arguments to search on a cache miss
+        """
+        cache = self._video_library.search_cache
+        if(cache == None):
+            return search()
+        term = search_term.lower()
+        search_results = cache.get(kind, term)
+        if(search_results == None):
+            version = cache.version
+            search_results = search()
+            cache.put(kind, term, search_results, version)
+        return search_results
+
+    def _display_results_and_options(self, search_results, search_term,
+                                     offset=0, more_command=None):
         """Display search results and option for user to play a selected
         video
 
         Args:
             search_results: A list containing filtered videos
             search_term: String used to filter videos
+            offset: The number of results before search_results, so
+                results are numbered the same on every page
+            more_command: The command showing the next page, if any
         """
         if(len(search_results) == 0):
-            print(f"No search results for {search_term}")
+            if(offset > 0):
+                self._print(f"No more search results for {search_term}")
+            else:
+                self._print(f"No search results for {search_term}")
         else:
-            print(f"Here are the results for {search_term}:")
+            lines = [f"Here are the results for {search_term}:"]
             for i in range(len(search_results)):
-                print(f" {i+1}){search_results[i]}")
-            print("Would you like to play any of the above? If yes, specify the number of the video.")
-            print("If your answer is not a valid number, we will assume it's a no.")
+                lines.append(f" {offset+i+1}){search_results[i]}")
+            if(more_command != None):
+                lines.append(f"More results: {more_command}")
+            lines.append("Would you like to play any of the above? If yes, specify the number of the video.")
+            lines.append("If your answer is not a valid number, we will assume it's a no.")
+            self._print_lines(lines)
+            if(self._defer_answers):
+                self.pending_question = (search_results, offset)
+                return
+            start = time.perf_counter_ns()
             try:
-                video_number = int(input()) - 1
+                if(self._read_answer == None):
+                    # the user has to see the question before answering
+                    self.output.flush()
+                    answer = input()
+                else:
+                    answer = self._read_answer()
             except Exception:
                 return
-            if(video_number > len(search_results) or video_number < 0):
-                return
-            self.play_video(search_results[video_number].video_id)
+            finally:
+                self.answer_nanoseconds += time.perf_counter_ns() - start
+            self._play_answer(answer, search_results, offset)
+
+    def _play_answer(self, answer, search_results, offset):
+        """Plays the search result whose number the user answered, if any"""
+        try:
+            video_number = int(answer) - 1 - offset
+        except ValueError:
+            return
+        if(video_number >= len(search_results) or video_number < 0):
+            return
+        self.play_video(search_results[video_number].video_id)
+
+    def answer_question(self, answer):
+        """Answers the question a search left in pending_question.
+
+        Args:
+            answer: The number of the video to play, anything else is a no.
+        """
+        if(self.pending_question == None):
+            return
+        search_results, offset = self.pending_question
+        self.pending_question = None
+        self._play_answer(answer, search_results, offset)
 
-    def search_videos(self, search_term):
-        """Display all the videos whose titles contain the search_term.
+    def search_videos(self, search_term, page_size=None, offset="0"):
+        """Display all the videos whose titles contain the search_term,
+        or one page of them.
 
         Args:
             search_term: The query to be used in search.
+            page_size: The number of results to show, all if None.
+            offset: The number of results to skip.
+        """
+        page = self._parse_page(page_size, offset)
+        if(page == None):
+            return
+        page_size, offset = page
+        search_filter = lambda video: not video.is_flagged
+        if(page_size != None):
+            # pages are read from the search as it goes, not cached
+            with self._video_library.reading():
+                search_results, more = self._page(filter(
+                    search_filter, self._video_library.iter_search_titles(search_term)),
+                    page_size, offset)
+            self._display_page(search_results, search_term, "SEARCH_VIDEOS",
+                               page_size, offset, more)
+            return
+        search = lambda: self._filter_videos(
+            search_filter, self._video_library.search_titles(search_term))
+        with self._video_library.reading():
+            search_results = self._cached_search("title", search_term, search)
+        self._display_results_and_options(search_results,search_term)
+
+    def search_videos_top(self, search_term, limit="10"):
+        """Display the best limit videos whose titles contain the
+        search_term: exact title matches first, then titles starting with
+        it, then the others, each in title order.
+
+        Args:
+            search_term: The query to be used in search.
+            limit: The number of results to show.
+        """
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if(limit < 1):
+            self._print("Please enter a limit of at least 1.")
+            return
+        with self._video_library.reading():
+            search_results = self._top_results(search_term, limit)
+        self._display_results_and_options(search_results,search_term)
+
+    def _top_results(self, search_term, limit):
+        """Returns the best limit unflagged videos whose titles contain the
+        search term.
+
+        The titles starting with the term come first in title order, with
+        the exact matches leading, so they are ranked as listed by the
+        library's prefix lookup. The other matches are only searched if
+        fewer than limit titles start with the term.
         """
-        search_filter = lambda video: search_term.lower() in \
-            video.title.lower() and not video.is_flagged
-        search_results = self._filter_videos(search_filter,search_term)
+        term = search_term.lower()
+        search_filter = lambda video: not video.is_flagged
+        top = list(islice(filter(
+            search_filter, self._video_library.iter_title_prefix(term)), limit))
+        if(len(top) < limit):
+            others = filter(
+                lambda video: search_filter(video) and not video.title.lower().startswith(term),
+                self._video_library.iter_search_titles(term))
+            top.extend(islice(others, limit - len(top)))
+        return top
+
+    def search_videos_fuzzy(self, search_term, max_distance=None):
+        """Display the videos with a title word within max_distance typos
+        of the search_term, the closest first.
+
+        Args:
+            search_term: The word to be used in search.
+            max_distance: The number of insertions, deletions and
+                substitutions tolerated. By default 0 for terms of up to 2
+                letters, 1 for up to 5 and 2 for longer ones.
+        """
+        if(max_distance == None):
+            max_distance = default_max_distance(search_term)
+        else:
+            try:
+                max_distance = int(max_distance)
+            except ValueError:
+                max_distance = -1
+            if(max_distance < 0):
+                self._print("Please enter a maximum distance of at least 0.")
+                return
+        search_filter = lambda video: not video.is_flagged
+        with self._video_library.reading():
+            search_results = self._filter_videos(
+                search_filter,
+                self._video_library.search_titles_fuzzy(search_term, max_distance))
         self._display_results_and_options(search_results,search_term)
 
-    def search_videos_tag(self, video_tag):
-        """Display all videos whose tags contains the provided tag.
+    def search_videos_tag(self, video_tag, page_size=None, offset="0"):
+        """Display all videos whose tags contains the provided tag, or one
+        page of them.
 
         Args:
             video_tag: The video tag to be used in search.
+            page_size: The number of results to show, all if None.
+            offset: The number of results to skip.
         """
-        search_function = lambda video: video_tag.lower() in \
-            video.tags and not video.is_flagged
-        search_results = self._filter_videos(search_function,video_tag)
+        page = self._parse_page(page_size, offset)
+        if(page == None):
+            return
+        page_size, offset = page
+        if(page_size != None):
+            with self._video_library.reading():
+                search_results, more = self._page(
+                    self._video_library.iter_search_tag(video_tag, offset),
+                    page_size, 0)
+            self._display_page(search_results, video_tag, "SEARCH_VIDEOS_WITH_TAG",
+                               page_size, offset, more)
+            return
+        search = lambda: self._video_library.search_tag(video_tag)
+        search_results = self._cached_search("tag", video_tag, search)
         self._display_results_and_options(search_results,video_tag)
 
+    def _display_page(self, search_results, search_term, verb, page_size,
+                      offset, more):
+        """Display a page of search results, telling how to get the next
+        page if more results follow"""
+        more_command = None
+        if(more):
+            more_command = f"{verb} {search_term} {page_size} {offset + page_size}"
+        self._display_results_and_options(search_results, search_term,
+                                          offset, more_command)
+
+    def query_videos(self, *query):
+        """Display the videos matching a boolean query of title terms and
+        tags, such as #cat AND title:funny AND NOT #dog.
+
+        Args:
+            query: The words of the query. A word starting with # is a tag,
+                title:term or any other word is a title term, and terms
+                are combined with AND, OR, NOT and parentheses.
+        """
+        query = " ".join(query)
+        try:
+            parsed = parse_query(query)
+        except ValueError as error:
+            self._print(f"Cannot run query: {error}")
+            return
+        search_filter = lambda video: not video.is_flagged
+        with self._video_library.reading():
+            search_results = self._filter_videos(
+                search_filter, self._video_library.search_query(parsed))
+        self._display_results_and_options(search_results,query)
+
     def flag_video(self, video_id, flag_reason="Not supplied"):
         """Mark a video as flagged.
 
@@ -314,16 +656,15 @@ class VideoPlayer:
         """
         video = self._video_library.get_video(video_id)
         if(video == None):
-            print(f"Cannot flag video: Video does not exist")
+            self._print(f"Cannot flag video: Video does not exist")
             return
-        if(video.is_flagged):
-            print("Cannot flag video: Video is already flagged")
+        if(not self._video_library.flag_video(video_id, flag_reason)):
+            self._print("Cannot flag video: Video is already flagged")
             return
-        video.set_flagged(True)
-        video.set_flagged_reason(flag_reason)
+        self._record("flag_video", video_id, flag_reason)
         if(self.currently_playing == video):
             self.stop_video()
-        print(f"Successfully flagged video: {video.title} (reason: {video.flagged_reason})")
+        self._print(f"Successfully flagged video: {video.title} (reason: {flag_reason})")
 
     def allow_video(self, video_id):
         """Removes a flag from a video.
@@ -333,11 +674,10 @@ class VideoPlayer:
         """
         video = self._video_library.get_video(video_id)
         if(video == None):
-            print("Cannot remove flag from video: Video does not exist")
+            self._print("Cannot remove flag from video: Video does not exist")
             return
-        if(not video.is_flagged):
-            print("Cannot remove flag from video: Video is not flagged")
+        if(not self._video_library.allow_video(video_id)):
+            self._print("Cannot remove flag from video: Video is not flagged")
             return
-        video.set_flagged(False)
-        video.set_flagged_reason(None)
-        print(f"Successfully removed flag from video: {video.title}")
\ No newline at end of file
+        self._record("allow_video", video_id)
+        self._print(f"Successfully removed flag from video: {video.title}")
\ No newline at end of file
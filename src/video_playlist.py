@@ -9,7 +9,9 @@ class Playlist:
             name: The playlist name
         """
         self._name = name
-        self._videos = []
+        # video ids mapped to None, a dict keeps insertion order and
+        # gives constant time membership and removal
+        self._videos = {}
     
     @property
     def name(self) -> str:
@@ -18,18 +20,30 @@ class Playlist:
 
     @property
     def videos(self) -> list:
-        """Returns videos array"""
-        return self._videos
+        """Returns video ids in the order they were added"""
+        return list(self._videos)
+
+    def __len__(self) -> int:
+        """Returns the number of videos in the playlist"""
+        return len(self._videos)
+
+    def __iter__(self):
+        """Iterates over video ids in the order they were added"""
+        return iter(self._videos)
+
+    def __contains__(self, video_id) -> bool:
+        """Returns whether the video id is in the playlist"""
+        return video_id in self._videos
     
     def add_video(self,video_id) -> int:
-        """Adds video id to videos array
+        """Adds video id to the end of the playlist
 
         Args:
             video_id: The video id
         """
         if(video_id in self._videos):
             return 0;
-        self._videos.append(video_id)
+        self._videos[video_id] = None
         return 1;
     
     def remove_video(self,video_id) -> int:
@@ -40,9 +54,9 @@ class Playlist:
         """
         if(video_id not in self._videos):
             return 0;
-        self._videos.remove(video_id)
+        del self._videos[video_id]
         return 1;
 
     def clear_playlist(self) -> None:
         """Remove all videos from playlist"""
-        self._videos = []
\ No newline at end of file
+        self._videos = {}
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""Boolean queries over video titles and tags, such as
+#cat AND title:funny AND NOT #dog."""
+
+from bisect import bisect_left
+from heapq import merge
+import re
+
+
+_TOKEN = re.compile(r"[()]|[^\s()]+")
+_OPERATORS = ("AND", "OR", "NOT")
+_TITLE_PREFIX = "title:"
+
+
+class _QueryParser:
+    """Parses the tokens of a query by recursive descent.
+
+    NOT binds tighter than AND, which binds tighter than OR. Terms next to
+    each other without an operator are joined by AND.
+    """
+
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self._position = 0
+
+    def _peek(self) -> str:
+        """Returns the next token in upper case, or None at the end."""
+        if self._position == len(self._tokens):
+            return None
+        return self._tokens[self._position].upper()
+
+    def parse(self) -> tuple:
+        node = self._parse_or()
+        if self._position < len(self._tokens):
+            raise ValueError(
+                f"Unexpected {self._tokens[self._position]} in the query")
+        return node
+
+    def _parse_or(self) -> tuple:
+        nodes = [self._parse_and()]
+        while self._peek() == "OR":
+            self._position += 1
+            nodes.append(self._parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", tuple(nodes))
+
+    def _parse_and(self) -> tuple:
+        nodes = [self._parse_not()]
+        while self._peek() not in (None, ")", "OR"):
+            if self._peek() == "AND":
+                self._position += 1
+            nodes.append(self._parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", tuple(nodes))
+
+    def _parse_not(self) -> tuple:
+        if self._peek() == "NOT":
+            self._position += 1
+            return ("not", self._parse_not())
+        return self._parse_term()
+
+    def _parse_term(self) -> tuple:
+        if self._position == len(self._tokens):
+            raise ValueError("Expected a term at the end of the query")
+        token = self._tokens[self._position]
+        self._position += 1
+        if token == "(":
+            node = self._parse_or()
+            if self._peek() != ")":
+                raise ValueError("Expected ) in the query")
+            self._position += 1
+            return node
+        if token == ")" or token.upper() in _OPERATORS:
+            raise ValueError(f"Expected a term before {token}")
+        if token.startswith("#"):
+            return ("tag", token.lower())
+        if token.lower().startswith(_TITLE_PREFIX):
+            token = token[len(_TITLE_PREFIX):]
+            if not token:
+                raise ValueError(f"Expected a term after {_TITLE_PREFIX}")
+        return ("title", token.lower())
+
+
+def parse_query(query: str) -> tuple:
+    """Parses a query into a tree of tuples.
+
+    The leaves are ("tag", tag) for #tag and ("title", term) for title:term
+    or a bare term, both in lower case. The inner nodes are ("not", node),
+    ("and", nodes) and ("or", nodes).
+
+    Raises:
+        ValueError: If the query is empty or malformed.
+    """
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        raise ValueError("The query is empty")
+    return _QueryParser(tokens).parse()
+
+
+def contains(posting, row) -> bool:
+    """Returns whether a sorted posting list contains row."""
+    i = bisect_left(posting, row)
+    return i < len(posting) and posting[i] == row
+
+
+def intersect(postings):
+    """Yields the rows in every sorted posting list, as the rows of the
+    smallest list found in all the others, so the first rows come
+    without reading the whole lists."""
+    postings = sorted(postings, key=len)
+    others = postings[1:]
+    return (row for row in postings[0]
+            if all(contains(posting, row) for posting in others))
+
+
+def iter_union(postings):
+    """Yields the rows in any of the sorted posting lists once each, in
+    order, merging the lists as it goes."""
+    previous = None
+    for row in merge(*postings):
+        if row != previous:
+            yield row
+            previous = row
+
+
+def union(postings) -> list:
+    """Returns the rows in any of the sorted posting lists, merged."""
+    return list(iter_union(postings))
+
+
+def difference(rows, excluded) -> list:
+    """Returns the sorted rows in none of the excluded posting lists."""
+    return [row for row in rows
+            if not any(contains(posting, row) for posting in excluded)]
+
+
+def _is_term(node) -> bool:
+    return node[0] in ("tag", "title")
+
+
+def evaluate_query(node, index) -> list:
+    """Returns the sorted rows matching a parsed query.
+
+    An AND starts from its smallest posting lists and only fetches the
+    lists of its other terms while they are smaller than the rows left,
+    checking the rest on each row. Only a NOT outside any AND with a term
+    of its own, which is true of most rows, looks at every row.
+
+    Args:
+        node: A query parsed by parse_query.
+        index: The index of the rows, with the methods
+            posting(kind, term), returning the sorted posting list of the
+            rows with the tag, or whose titles contain the term,
+            posting_size(kind, term), returning at least the length of
+            that list without building it,
+            matches(kind, term, row), returning whether a row is in it,
+            and __len__, returning the number of rows.
+    """
+    kind = node[0]
+    if kind in ("tag", "title"):
+        return index.posting(kind, node[1])
+    if kind == "or":
+        return union([evaluate_query(child, index) for child in node[1]])
+    if kind == "not":
+        return _evaluate_and((node,), index)
+    return _evaluate_and(node[1], index)
+
+
+def _evaluate_and(nodes, index) -> list:
+    """Returns the sorted rows matching all the nodes."""
+    included = [node for node in nodes if node[0] != "not"]
+    excluded = [node[1] for node in nodes if node[0] == "not"]
+    terms = sorted((node for node in included if _is_term(node)),
+                   key=lambda node: index.posting_size(*node))
+    postings = []
+    for node in included:
+        if not _is_term(node):
+            rows = evaluate_query(node, index)
+            if not rows:
+                return []
+            postings.append(rows)
+    if terms and (not postings or index.posting_size(*terms[0])
+                  < min(len(posting) for posting in postings)):
+        postings.append(index.posting(*terms.pop(0)))
+    rows = list(intersect(postings)) if postings else range(len(index))
+    for kind, term in terms:
+        if not rows:
+            return []
+        if index.posting_size(kind, term) < len(rows):
+            rows = list(intersect([rows, index.posting(kind, term)]))
+        else:
+            rows = [row for row in rows if index.matches(kind, term, row)]
+    for node in excluded:
+        if not rows:
+            return []
+        if _is_term(node):
+            rows = [row for row in rows if not index.matches(*node, row)]
+        else:
+            rows = difference(rows, [evaluate_query(node, index)])
+    return list(rows)
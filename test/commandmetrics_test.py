@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from src.command_metrics import CommandMetrics
+from src.command_parser import CommandException
+from src.command_parser import CommandParser
+from src.output_sink import MemorySink
+from src.video_player import VideoPlayer
+
+
+def test_percentiles_are_within_the_bucket_precision():
+    metrics = CommandMetrics()
+    for microseconds in range(1, 1001):
+        metrics.record("PLAY", microseconds * 1000)
+    summary = metrics.summary()["PLAY"]
+    assert summary["count"] == 1000
+    assert summary["errors"] == 0
+    assert summary["seconds"] == pytest.approx(0.5005)
+    for name, expected in (("p50", 500e-6), ("p95", 950e-6),
+                           ("p99", 990e-6)):
+        assert summary[name] == pytest.approx(expected, rel=1 / 16)
+
+
+def test_parser_records_commands_and_errors():
+    output = MemorySink()
+    metrics = CommandMetrics()
+    parser = CommandParser(VideoPlayer(output=output), metrics=metrics)
+    parser.execute_command(["play", "amazing_cats_video_id"])
+    with pytest.raises(CommandException):
+        parser.execute_command(["PLAY"])
+    parser.execute_command(["REWIND"])
+    output.clear()
+    parser.execute_command(["STATS"])
+
+    lines = output.getvalue().splitlines()
+    assert lines[0] == "Command statistics:"
+    assert lines[1].split() == [
+        "COMMAND", "COUNT", "ERRORS", "P50", "MS", "P95", "MS", "P99", "MS"]
+    assert lines[2].split()[:3] == ["(unknown)", "1", "1"]
+    assert lines[3].split()[:3] == ["PLAY", "2", "1"]
+    assert len(lines) == 4
+    assert set(metrics.summary()) == {"(unknown)", "PLAY", "STATS"}
+
+
+def test_stats_without_metrics():
+    output = MemorySink()
+    parser = CommandParser(VideoPlayer(output=output))
+    parser.execute_command(["STATS"])
+    assert output.getvalue() == "Command statistics are disabled.\n"
+
+
+def test_metrics_are_dumped_periodically(tmp_path):
+    path = tmp_path / "stats.json"
+    metrics = CommandMetrics(path, dump_interval=0)
+    metrics.record("STOP", 2000)
+    assert json.loads(path.read_text())["commands"]["STOP"]["count"] == 1
+    metrics.record("STOP", 2000, error=True)
+    assert json.loads(path.read_text())["commands"]["STOP"]["errors"] == 1
+
+
+def test_a_failed_dump_does_not_fail_the_command(tmp_path, capsys):
+    directory = tmp_path / "stats"
+    directory.mkdir()
+    metrics = CommandMetrics(directory / "stats.json", dump_interval=0)
+    (directory / "stats.json").unlink()
+    directory.rmdir()
+    metrics.record("STOP", 2000)
+    assert "Cannot write the command statistics" in capsys.readouterr().err
+    with pytest.raises(OSError):
+        CommandMetrics(directory / "stats.json")
+
+
+def test_latency_leaves_out_the_answer(monkeypatch):
+    clock = iter(range(0, 10 ** 12, 10 ** 9))
+    monkeypatch.setattr("time.perf_counter_ns", lambda: next(clock))
+    metrics = CommandMetrics()
+    parser = CommandParser(
+        VideoPlayer(output=MemorySink(), read_answer=lambda: "no"),
+        metrics=metrics)
+    parser.execute_command(["SEARCH_VIDEOS", "cat"])
+    # One second before the question, one answering and one after it.
+    assert metrics.summary()["SEARCH_VIDEOS"]["seconds"] == 2
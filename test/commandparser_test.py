@@ -0,0 +1,52 @@
+import pytest
+
+from benchmarks import command_dispatch
+from src.command_parser import Command
+from src.command_parser import CommandException
+from src.command_parser import CommandParser
+from src.video_player import VideoPlayer
+
+
+def test_dispatches_verbs_ignoring_case(capfd):
+    parser = CommandParser(VideoPlayer())
+    parser.execute_command(["play", "amazing_cats_video_id"])
+    parser.execute_command(["FLAG_VIDEO", "amazing_cats_video_id"])
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 3
+    assert "Playing video: Amazing Cats" in lines[0]
+    assert "Stopping video: Amazing Cats" in lines[1]
+    assert "Successfully flagged video: Amazing Cats " \
+           "(reason: Not supplied)" in lines[2]
+
+
+def test_wrong_number_of_arguments():
+    parser = CommandParser(VideoPlayer())
+    with pytest.raises(CommandException, match="followed by a video_id"):
+        parser.execute_command(["FLAG_VIDEO"])
+
+
+def test_unknown_command(capfd):
+    parser = CommandParser(VideoPlayer())
+    assert parser.execute_command(["REWIND"]) is False
+    assert parser.execute_command(["STOP"]) is True
+    out, err = capfd.readouterr()
+    assert "Please enter a valid command" in out
+
+
+def test_registered_command():
+    parser = CommandParser(VideoPlayer())
+    calls = []
+    parser.register("rewind", Command(calls.append, (1,), "usage"))
+    parser.execute_command(["REWIND", "10"])
+    assert calls == ["10"]
+
+
+def test_dispatch_benchmark_runs_every_verb(capsys):
+    command_dispatch.main(number=1)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[0] for line in lines[1:]] == [
+        command[0] for command in command_dispatch.COMMANDS]
+    parser = CommandParser(command_dispatch.NullPlayer())
+    assert {command[0] for command in command_dispatch.COMMANDS} == set(
+        parser._commands)
@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+from src.command_parser import CommandParser
+from src.output_sink import MemorySink
+from src.run import run_batch
+from src.sqlite_library import SqliteVideoLibrary
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+@pytest.fixture
+def catalog_text():
+    """The catalog loaded by video_library, the default one if None.
+    Override it in a test module to load another catalog."""
+    return None
+
+
+@pytest.fixture(params=["memory", "compact", "sqlite"])
+def video_library(request, tmp_path, catalog_text):
+    """The catalog_text loaded by each kind of library in turn."""
+    catalog = None
+    if catalog_text is not None:
+        catalog = tmp_path / "videos.txt"
+        catalog.write_text(catalog_text)
+    if request.param == "sqlite":
+        library = SqliteVideoLibrary(tmp_path / "videos.db", catalog)
+        yield library
+        library.close()
+    else:
+        yield VideoLibrary(catalog, compact=request.param == "compact")
+
+
+@pytest.fixture
+def batch_output():
+    """Returns a function running batch commands on a library and
+    returning what they wrote."""
+    def output_of(video_library, commands):
+        output = MemorySink()
+        commands_file = io.StringIO(commands)
+        parser = CommandParser(VideoPlayer(
+            video_library, output,
+            lambda: commands_file.readline().rstrip("\n")))
+        run_batch(parser, commands_file, output)
+        return output.getvalue()
+    return output_of
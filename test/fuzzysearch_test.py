@@ -0,0 +1,90 @@
+import random
+
+from src.command_parser import CommandParser
+from src.fuzzy_index import BKTree
+from src.fuzzy_index import levenshtein
+from src.fuzzy_index import title_words
+from src.output_sink import MemorySink
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def _distance(a, b) -> int:
+    """The textbook dynamic program over the whole table."""
+    table = [[i + j if i == 0 or j == 0 else 0 for j in range(len(b) + 1)]
+             for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            table[i][j] = min(table[i - 1][j] + 1, table[i][j - 1] + 1,
+                              table[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+    return table[-1][-1]
+
+
+def _random_words(count, seed=0):
+    generator = random.Random(seed)
+    return ["".join(generator.choice("abcd")
+                    for _ in range(generator.randint(0, 7)))
+            for _ in range(count)]
+
+
+def test_levenshtein_matches_the_full_table():
+    words = _random_words(400)
+    for a, b in zip(words, reversed(words)):
+        assert levenshtein(a, b) == _distance(a, b)
+        for limit in range(4):
+            assert levenshtein(a, b, limit) == min(_distance(a, b), limit + 1)
+
+
+def test_bk_tree_finds_every_close_word():
+    words = _random_words(300, seed=1)
+    tree = BKTree(words)
+    assert len(tree) == len(set(words))
+    for word in _random_words(50, seed=2):
+        for max_distance in range(3):
+            assert tree.search(word, max_distance) == sorted(
+                (_distance(word, other), other) for other in set(words)
+                if _distance(word, other) <= max_distance)
+
+
+def test_title_words_ignore_case_and_punctuation():
+    assert title_words("Amazing Cats, amazing!") == {"amazing", "cats"}
+
+
+def test_fuzzy_search_orders_by_distance(video_library):
+    videos = video_library.search_titles_fuzzy("CAT", 1)
+    # "cats" and "at" are one edit away from "cat".
+    assert [video.video_id for video in videos] == [
+        "another_cat_video_id", "amazing_cats_video_id",
+        "life_at_google_video_id"]
+    assert video_library.search_titles_fuzzy("kat", 0) == []
+
+
+def test_search_videos_fuzzy_command(video_library):
+    output = MemorySink()
+    player = VideoPlayer(video_library, output, lambda: "1")
+    parser = CommandParser(player)
+    parser.execute_command(["FLAG_VIDEO", "another_cat_video_id"])
+    output.clear()
+    parser.execute_command(["SEARCH_VIDEOS_FUZZY", "amazng"])
+    parser.execute_command(["SEARCH_VIDEOS_FUZZY", "dgs", "0"])
+    parser.execute_command(["SEARCH_VIDEOS_FUZZY", "cat", "-1"])
+    lines = output.getvalue().splitlines()
+    assert lines[:2] == [
+        "Here are the results for amazng:",
+        " 1) Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+    ]
+    assert lines[-3:] == [
+        "Playing video: Amazing Cats",
+        "No search results for dgs",
+        "Please enter a maximum distance of at least 0.",
+    ]
+
+
+def test_word_tree_is_built_by_the_first_fuzzy_search():
+    library = VideoLibrary()
+    assert library._word_tree is None
+    library.search_titles_fuzzy("cats", 1)
+    word_tree = library._word_tree
+    assert "cats" in word_tree.search("cats", 0)[0]
+    library.search_titles_fuzzy("dogs", 1)
+    assert library._word_tree is word_tree
@@ -0,0 +1,167 @@
+from itertools import islice
+import threading
+from unittest import mock
+
+import src
+from src.journal import Journal
+from src.output_sink import MemorySink
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def _changes(player):
+    player.create_playlist("My_Playlist")
+    player.add_to_playlist("my_playlist", "amazing_cats_video_id")
+    player.add_to_playlist("MY_PLAYLIST", "life_at_google_video_id")
+    player.remove_from_playlist("my_playlist", "amazing_cats_video_id")
+    player.create_playlist("deleted")
+    player.delete_playlist("deleted")
+    player.flag_video("funny_dogs_video_id", "dont_like_dogs")
+    player.flag_video("amazing_cats_video_id")
+    player.allow_video("amazing_cats_video_id")
+
+
+def _restarted(path, **options):
+    journal = Journal(path, **options)
+    output = MemorySink()
+    player = VideoPlayer(VideoLibrary(), output, journal=journal)
+    player.show_all_playlists()
+    player.show_playlist("my_playlist")
+    player.play_video("funny_dogs_video_id")
+    player.play_video("amazing_cats_video_id")
+    journal.close()
+    return output.getvalue().splitlines()
+
+
+def _check_restored(lines):
+    assert lines == [
+        "Showing all playlists:",
+        " My_Playlist",
+        "Showing playlist: my_playlist",
+        "  Life at Google (life_at_google_video_id) [#google #career]",
+        "Cannot play video: Video is currently flagged "
+        "(reason: dont_like_dogs)",
+        "Playing video: Amazing Cats",
+    ]
+
+
+def test_journal_restores_playlists_and_flags(tmp_path):
+    path = tmp_path / "state.journal"
+    journal = Journal(path)
+    _changes(VideoPlayer(VideoLibrary(), MemorySink(), journal=journal))
+    journal.close()
+
+    _check_restored(_restarted(path))
+    assert not (tmp_path / "state.journal.snapshot").exists()
+
+
+def test_journal_is_compacted_into_a_snapshot(tmp_path):
+    path = tmp_path / "state.journal"
+    journal = Journal(path, compact_every=4)
+    _changes(VideoPlayer(VideoLibrary(), MemorySink(), journal=journal))
+    journal.close()
+
+    assert (tmp_path / "state.journal.snapshot").exists()
+    assert len(path.read_text().splitlines()) == 2
+    _check_restored(_restarted(path, compact_every=4))
+
+
+def test_journal_ignores_records_already_in_the_snapshot(tmp_path):
+    path = tmp_path / "state.journal"
+    journal = Journal(path)
+    _changes(VideoPlayer(VideoLibrary(), MemorySink(), journal=journal))
+    journal.close()
+    records = path.read_bytes()
+    journal = Journal(path)
+    journal.compact()
+    journal.close()
+    # A crash between writing the snapshot and emptying the journal.
+    path.write_bytes(records)
+
+    _check_restored(_restarted(path))
+
+
+def test_journal_drops_a_record_cut_short(tmp_path):
+    path = tmp_path / "state.journal"
+    journal = Journal(path)
+    _changes(VideoPlayer(VideoLibrary(), MemorySink(), journal=journal))
+    journal.close()
+    with open(path, "a") as journal_file:
+        journal_file.write('["create_playlist", "tor')
+
+    _check_restored(_restarted(path))
+    assert path.read_text().endswith("\n")
+
+
+def test_journal_batches_fsync(tmp_path):
+    with mock.patch("os.fsync") as fsync:
+        journal = Journal(tmp_path / "state.journal", sync_every=4)
+        fsync.reset_mock()
+        for number in range(10):
+            journal.append("create_playlist", f"playlist{number}")
+        assert fsync.call_count == 2
+        journal.close()
+        assert fsync.call_count == 3
+
+
+def test_journal_drops_videos_no_longer_in_the_library(tmp_path):
+    catalog = tmp_path / "videos.txt"
+    catalog.write_text(
+        "Amazing Cats | amazing_cats_video_id | #cat , #animal\n"
+        "Removed Video | removed_video_id |\n")
+    path = tmp_path / "state.journal"
+    journal = Journal(path)
+    player = VideoPlayer(VideoLibrary(catalog), MemorySink(), journal=journal)
+    player.create_playlist("mine")
+    player.add_to_playlist("mine", "removed_video_id")
+    player.add_to_playlist("mine", "amazing_cats_video_id")
+    journal.close()
+
+    for _ in range(2):
+        journal = Journal(path)
+        output = MemorySink()
+        player = VideoPlayer(VideoLibrary(), output, journal=journal)
+        player.show_playlist("mine")
+        journal.close()
+        assert output.getvalue().splitlines() == [
+            "Showing playlist: mine",
+            "  Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        ]
+    journal = Journal(path)
+    assert list(journal.playlists["mine"]) == ["amazing_cats_video_id"]
+    journal.close()
+
+
+def test_journal_does_not_hold_up_a_background_library(tmp_path):
+    path = tmp_path / "state.journal"
+    journal = Journal(path)
+    _changes(VideoPlayer(VideoLibrary(), MemorySink(), journal=journal))
+    journal.close()
+    released = threading.Event()
+    read_videos = src.video_library.read_catalog
+
+    def read_released_videos(path):
+        videos = read_videos(path)
+        yield from islice(videos, 2)
+        released.wait()
+        yield from videos
+
+    journal = Journal(path)
+    output = MemorySink()
+    with mock.patch("src.video_library._LOAD_CHUNK_SIZE", 1), \
+            mock.patch("src.video_library.read_catalog", read_released_videos):
+        player = VideoPlayer(VideoLibrary(background=True), output,
+                             journal=journal)
+        # Served while the rest of the catalog is still being read.
+        player.play_video("amazing_cats_video_id")
+        released.set()
+        player.play_video("funny_dogs_video_id")
+        player.show_playlist("my_playlist")
+    journal.close()
+    assert output.getvalue().splitlines() == [
+        "Playing video: Amazing Cats",
+        "Cannot play video: Video is currently flagged "
+        "(reason: dont_like_dogs)",
+        "Showing playlist: my_playlist",
+        "  Life at Google (life_at_google_video_id) [#google #career]",
+    ]
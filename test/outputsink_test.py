@@ -0,0 +1,47 @@
+import io
+
+from src.command_parser import CommandParser
+from src.output_sink import BufferedSink
+from src.output_sink import MemorySink
+from src.run import run_batch
+from src.video_player import VideoPlayer
+
+
+def test_player_writes_to_memory_sink(capfd):
+    output = MemorySink()
+    player = VideoPlayer(output=output)
+    player.show_all_videos()
+    player.play_video("amazing_cats_video_id")
+    out, err = capfd.readouterr()
+    assert out == ""
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 7
+    assert "Here's a list of all available videos:" in lines[0]
+    assert "Playing video: Amazing Cats" in lines[6]
+
+    output.clear()
+    assert output.getvalue() == ""
+
+
+def test_buffered_sink_writes_when_full():
+    stream = io.StringIO()
+    output = BufferedSink(stream, buffer_size=10)
+    output.write("12345\n")
+    assert stream.getvalue() == ""
+    output.write("67890\n")
+    assert stream.getvalue() == "12345\n67890\n"
+    output.write("end\n")
+    output.flush()
+    assert stream.getvalue() == "12345\n67890\nend\n"
+
+
+def test_batch_answers_do_not_flush_the_sink():
+    stream = io.StringIO()
+    output = BufferedSink(stream)
+    commands = io.StringIO("SEARCH_VIDEOS cat\n1\nSEARCH_VIDEOS dog\nno\n")
+    parser = CommandParser(VideoPlayer(
+        output=output, read_answer=lambda: commands.readline().rstrip("\n")))
+    assert run_batch(parser, commands, output) == (2, 0)
+    assert stream.getvalue() == ""
+    output.flush()
+    assert "Playing video: Amazing Cats" in stream.getvalue()
@@ -0,0 +1,142 @@
+import pytest
+
+from src.command_parser import CommandException
+from src.command_parser import CommandParser
+from src.output_sink import MemorySink
+from src.sqlite_library import SqliteVideoLibrary
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def _player(answer="no", video_library=None):
+    output = MemorySink()
+    player = VideoPlayer(video_library, output, lambda: answer)
+    return player, output
+
+
+def test_show_all_videos_pages():
+    player, output = _player()
+    player.show_all_videos("2", "2")
+    assert output.getvalue().splitlines() == [
+        "Here's a list of all available videos:",
+        " Funny Dogs (funny_dogs_video_id) [#dog #animal]",
+        " Life at Google (life_at_google_video_id) [#google #career]",
+        "More videos: SHOW_ALL_VIDEOS 2 4",
+    ]
+
+
+def test_show_all_videos_last_page():
+    player, output = _player()
+    player.show_all_videos("2", "4")
+    player.show_all_videos("2", "5")
+    assert output.getvalue().splitlines() == [
+        "Here's a list of all available videos:",
+        " Video about nothing (nothing_video_id) []",
+        "No more videos to show",
+    ]
+
+
+@pytest.mark.parametrize("page", [("0",), ("2", "-1"), ("two",)])
+def test_invalid_pages_are_refused(page):
+    player, output = _player()
+    player.show_all_videos(*page)
+    player.search_videos("cat", *page)
+    player.search_videos_tag("#cat", *page)
+    assert output.getvalue().splitlines() == [
+        "Please enter a page size of at least 1 and an offset of at "
+        "least 0."] * 3
+
+
+def test_search_pages_keep_the_result_numbers():
+    player, output = _player(answer="2")
+    player.search_videos("a", "1", "1")
+    lines = output.getvalue().splitlines()
+    assert lines[:3] == [
+        "Here are the results for a:",
+        " 2) Another Cat Video (another_cat_video_id) [#cat #animal]",
+        "More results: SEARCH_VIDEOS a 1 2",
+    ]
+    assert lines[-1] == "Playing video: Another Cat Video"
+
+
+def test_search_page_only_plays_its_own_results():
+    player, output = _player(answer="1")
+    player.search_videos_tag("#animal", "2", "1")
+    lines = output.getvalue().splitlines()
+    assert lines[:4] == [
+        "Here are the results for #animal:",
+        " 2) Another Cat Video (another_cat_video_id) [#cat #animal]",
+        " 3) Funny Dogs (funny_dogs_video_id) [#dog #animal]",
+        "Would you like to play any of the above? If yes, specify the "
+        "number of the video.",
+    ]
+    assert "Playing video" not in output.getvalue()
+
+
+def test_search_pages_skip_flagged_videos():
+    player, output = _player()
+    player.flag_video("amazing_cats_video_id")
+    output.clear()
+    player.search_videos("cat", "1")
+    player.search_videos("cat", "1", "1")
+    lines = output.getvalue().splitlines()
+    assert lines[:2] == [
+        "Here are the results for cat:",
+        " 1) Another Cat Video (another_cat_video_id) [#cat #animal]",
+    ]
+    assert lines[-1] == "No more search results for cat"
+
+
+def test_answer_past_the_last_result_plays_nothing():
+    player, output = _player(answer="3")
+    player.search_videos("cat")
+    assert "Playing video" not in output.getvalue()
+
+
+def test_long_listings_are_written_in_chunks(tmp_path):
+    catalog = tmp_path / "videos.txt"
+    catalog.write_text("".join(
+        f"Video {number:05} | video_{number:05} | #tag\n"
+        for number in range(3000)))
+    output = MemorySink()
+    writes = []
+    output.write = lambda text: writes.append(text)
+    VideoPlayer(VideoLibrary(catalog), output).show_all_videos()
+    assert len(writes) == 3
+    assert "".join(writes).count("\n") == 3001
+
+
+def _pages(video_library):
+    player, output = _player(video_library=video_library)
+    for offset in ("0", "2", "4", "9"):
+        player.show_all_videos("2", offset)
+        player.search_videos("o", "2", offset)
+        player.search_videos_tag("#animal", "2", offset)
+    return output.getvalue()
+
+
+def test_pages_match_across_backends(tmp_path):
+    library = SqliteVideoLibrary(tmp_path / "videos.db")
+    try:
+        assert _pages(library) == _pages(VideoLibrary())
+    finally:
+        library.close()
+    assert _pages(VideoLibrary(compact=True)) == _pages(VideoLibrary())
+
+
+@pytest.mark.parametrize("term", ["", "a", "Ca", "cat", "amazing"])
+def test_title_iteration_matches_the_full_search(video_library, term):
+    assert list(video_library.iter_search_titles(term)) == (
+        video_library.search_titles(term))
+
+
+def test_parser_accepts_page_arguments():
+    player, output = _player()
+    parser = CommandParser(player)
+    parser.execute_command(["SHOW_ALL_VIDEOS", "1"])
+    parser.execute_command(["SEARCH_VIDEOS", "cat", "1", "1"])
+    parser.execute_command(["SEARCH_VIDEOS_WITH_TAG", "#cat", "1"])
+    assert "More videos: SHOW_ALL_VIDEOS 1 1" in output.getvalue()
+    assert " 2) Another Cat Video" in output.getvalue()
+    with pytest.raises(CommandException):
+        parser.execute_command(["SEARCH_VIDEOS", "cat", "1", "1", "1"])
@@ -132,6 +132,24 @@ def test_remove_from_playlist_then_re_add(capfd):
     assert "Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[7]
 
 
+def test_show_playlist_keeps_insertion_order(capfd):
+    player = VideoPlayer()
+    player.create_playlist("my_cool_playlist")
+    player.add_to_playlist("my_cool_playlist", "life_at_google_video_id")
+    player.add_to_playlist("my_cool_playlist", "amazing_cats_video_id")
+    player.add_to_playlist("my_cool_playlist", "funny_dogs_video_id")
+    player.remove_from_playlist("my_cool_playlist", "life_at_google_video_id")
+    player.add_to_playlist("my_cool_playlist", "life_at_google_video_id")
+    capfd.readouterr()
+    player.show_playlist("my_cool_playlist")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 4
+    assert "Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[1]
+    assert "Funny Dogs (funny_dogs_video_id) [#dog #animal]" in lines[2]
+    assert "Life at Google (life_at_google_video_id) [#google #career]" in lines[3]
+
+
 def test_show_playlist_nonexistent_playlist(capfd):
     player = VideoPlayer()
     player.show_playlist("another_playlist")
@@ -235,3 +253,19 @@ def test_delete_playlist_nonexistent(capfd):
     lines = out.splitlines()
     assert len(lines) == 1
     assert "Cannot delete playlist my_cool_playlist: Playlist does not exist" in lines[0]
+
+
+def test_delete_playlist_keeps_other_playlists(capfd):
+    player = VideoPlayer()
+    player.create_playlist("first_playlist")
+    player.create_playlist("second_playlist")
+    player.delete_playlist("FIRST_playlist")
+    player.add_to_playlist("second_playlist", "amazing_cats_video_id")
+    player.show_playlist("first_playlist")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 5
+    assert "Deleted playlist: FIRST_playlist" in lines[2]
+    assert "Added video to second_playlist: Amazing Cats" in lines[3]
+    assert "Cannot show playlist first_playlist: Playlist does not exist" in lines[4]
+    assert list(player.playlists) == ["second_playlist"]
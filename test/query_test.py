@@ -0,0 +1,111 @@
+import random
+import re
+
+import pytest
+
+from src.command_parser import CommandException
+from src.command_parser import CommandParser
+from src.output_sink import MemorySink
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+from src.video_query import parse_query
+
+WORDS = ["cat", "dog", "funny", "fun", "ca", "go", "amazing", "video"]
+TAGS = ["#cat", "#dog", "#animal", "#fun"]
+
+
+def test_parse_query_precedence():
+    assert parse_query("#Cat AND title:Funny AND NOT #dog") == (
+        "and", (("tag", "#cat"), ("title", "funny"), ("not", ("tag", "#dog"))))
+    assert parse_query("a OR b c") == (
+        "or", (("title", "a"), ("and", (("title", "b"), ("title", "c")))))
+    assert parse_query("NOT (a or #b)") == (
+        "not", ("or", (("title", "a"), ("tag", "#b"))))
+
+
+@pytest.mark.parametrize("query, error", [
+    ("", "The query is empty"),
+    ("(#cat", "Expected ) in the query"),
+    ("#cat AND", "Expected a term at the end of the query"),
+    ("#cat OR OR #dog", "Expected a term before OR"),
+    ("title:", "Expected a term after title:"),
+    ("#cat )", "Unexpected ) in the query"),
+])
+def test_parse_query_errors(query, error):
+    with pytest.raises(ValueError, match=re.escape(error)):
+        parse_query(query)
+
+
+def _random_query(generator, depth=0) -> str:
+    choice = generator.random()
+    if depth > 2 or choice < 0.4:
+        if generator.random() < 0.5:
+            return generator.choice(TAGS)
+        return "title:" + generator.choice(WORDS)
+    if choice < 0.55:
+        return "NOT " + _random_query(generator, depth + 1)
+    operator = generator.choice([" AND ", " OR ", " "])
+    return "(" + operator.join(
+        _random_query(generator, depth + 1)
+        for _ in range(generator.randint(2, 3))) + ")"
+
+
+def _matches(node, video) -> bool:
+    """Evaluates a parsed query on one video."""
+    kind = node[0]
+    if kind == "tag":
+        return not video.is_flagged and node[1] in video.tags
+    if kind == "title":
+        return node[1] in video.title.lower()
+    if kind == "not":
+        return not _matches(node[1], video)
+    children = (_matches(child, video) for child in node[1])
+    return all(children) if kind == "and" else any(children)
+
+
+@pytest.fixture
+def catalog_text():
+    generator = random.Random(0)
+    return "".join(
+        f"{' '.join(generator.sample(WORDS, 2)).title()} | video_{number} | "
+        f"{','.join(generator.sample(TAGS, generator.randint(0, 2)))}\n"
+        for number in range(60))
+
+
+def test_queries_match_every_video_they_should(video_library):
+    for number in range(0, 60, 7):
+        video_library.flag_video(f"video_{number}", "reason")
+    videos = sorted(video_library.get_all_videos(),
+                    key=lambda video: video.title.lower())
+    generator = random.Random(1)
+    for _ in range(200):
+        query = parse_query(_random_query(generator))
+        expected = [video.video_id for video in videos
+                    if _matches(query, video)]
+        found = [video.video_id
+                 for video in video_library.search_query(query)]
+        assert sorted(found) == sorted(expected), query
+        assert [video.title.lower()
+                for video in video_library.search_query(query)] == sorted(
+            video.title.lower() for video in videos if _matches(query, video))
+
+
+def test_query_command():
+    output = MemorySink()
+    parser = CommandParser(VideoPlayer(VideoLibrary(), output, lambda: "1"))
+    parser.execute_command(["FLAG_VIDEO", "amazing_cats_video_id"])
+    output.clear()
+    parser.execute_command(["QUERY", "#animal", "AND", "NOT", "#dog"])
+    parser.execute_command(["QUERY", "(#cat", "OR"])
+    lines = output.getvalue().splitlines()
+    assert lines == [
+        "Here are the results for #animal AND NOT #dog:",
+        " 1) Another Cat Video (another_cat_video_id) [#cat #animal]",
+        "Would you like to play any of the above? If yes, specify the "
+        "number of the video.",
+        "If your answer is not a valid number, we will assume it's a no.",
+        "Playing video: Another Cat Video",
+        "Cannot run query: Expected a term at the end of the query",
+    ]
+    with pytest.raises(CommandException):
+        parser.execute_command(["QUERY"])
@@ -0,0 +1,43 @@
+import io
+from unittest import mock
+
+from src.command_parser import CommandParser
+from src.output_sink import MemorySink
+from src.run import main
+from src.run import run_batch
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def test_run_batch():
+    commands = io.StringIO(
+        "PLAY amazing_cats_video_id\n"
+        "\n"
+        "SEARCH_VIDEOS dogs\n"
+        "1\n"
+        "CREATE_PLAYLIST\n"
+        "BOGUS\n"
+        "EXIT\n"
+        "STOP\n")
+    output = MemorySink()
+    parser = CommandParser(VideoPlayer(
+        output=output, read_answer=lambda: commands.readline().rstrip("\n")))
+    assert run_batch(parser, commands, output) == (4, 2)
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 9
+    assert "Playing video: Amazing Cats" in lines[0]
+    assert "1) Funny Dogs (funny_dogs_video_id) [#dog #animal]" in lines[2]
+    assert "Stopping video: Amazing Cats" in lines[5]
+    assert "Playing video: Funny Dogs" in lines[6]
+    assert "Please enter CREATE_PLAYLIST command" in lines[7]
+    assert "Please enter a valid command" in lines[8]
+
+
+def test_main_loads_snapshot_in_background(tmp_path):
+    commands = tmp_path / "commands.txt"
+    commands.write_text("NUMBER_OF_VIDEOS\n")
+    with mock.patch("src.run.VideoLibrary",
+                    return_value=VideoLibrary()) as video_library:
+        main(["--batch", str(commands), "--snapshot"])
+    video_library.assert_called_once_with(
+        background=True, snapshot=True, search_cache_size=0)
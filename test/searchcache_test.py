@@ -0,0 +1,90 @@
+import pytest
+
+from src.search_cache import SearchCache
+from src.sqlite_library import SqliteVideoLibrary
+from src.video import Video
+from src.video_library import VideoLibrary
+
+COMMANDS = """\
+SEARCH_VIDEOS cat
+no
+SEARCH_VIDEOS_WITH_TAG #ANIMAL
+no
+FLAG_VIDEO funny_dogs_video_id
+SEARCH_VIDEOS Cat
+no
+SEARCH_VIDEOS_WITH_TAG #animal
+no
+FLAG_VIDEO amazing_cats_video_id
+SEARCH_VIDEOS cat
+no
+SEARCH_VIDEOS_WITH_TAG #animal
+no
+ALLOW_VIDEO amazing_cats_video_id
+ALLOW_VIDEO funny_dogs_video_id
+SEARCH_VIDEOS cat
+no
+SEARCH_VIDEOS_WITH_TAG #animal
+no
+"""
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_cached_searches_follow_flags(tmp_path, backend, batch_output):
+    if backend == "memory":
+        library = VideoLibrary(search_cache_size=8)
+    else:
+        library = SqliteVideoLibrary(tmp_path / "videos.db",
+                                     search_cache_size=8)
+    assert batch_output(library, COMMANDS) == batch_output(
+        VideoLibrary(), COMMANDS)
+    cache = library.search_cache
+    # Flagging the dog only drops #animal, so only "cat" is hit once.
+    assert (cache.hits, cache.misses) == (1, 7)
+
+
+def test_flags_only_drop_the_results_of_the_video():
+    cache = SearchCache()
+    video = Video("Amazing Cats", "amazing_cats_video_id", ["#cat"])
+    for kind, term in (("title", "cats"), ("title", "dogs"),
+                       ("tag", "#cat"), ("tag", "#dog")):
+        cache.put(kind, term, [], cache.version)
+    cache.invalidate(video)
+    assert cache.get("title", "cats") is None
+    assert cache.get("tag", "#cat") is None
+    assert cache.get("title", "dogs") == []
+    assert cache.get("tag", "#dog") == []
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_results_searched_before_a_flag_are_not_kept():
+    cache = SearchCache()
+    version = cache.version
+    cache.invalidate(Video("Amazing Cats", "amazing_cats_video_id", []))
+    cache.put("title", "cats", [], version)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_results_are_dropped():
+    cache = SearchCache(capacity=2)
+    cache.put("title", "a", ["a"], cache.version)
+    cache.put("title", "b", ["b"], cache.version)
+    assert cache.get("title", "a") == ["a"]
+    cache.put("title", "c", ["c"], cache.version)
+    assert cache.get("title", "b") is None
+    assert cache.get("title", "a") == ["a"]
+    assert cache.get("title", "c") == ["c"]
+
+
+def test_results_are_bounded_by_their_videos():
+    cache = SearchCache(capacity=8, max_videos=4)
+    cache.put("title", "a", ["a"] * 5, cache.version)
+    assert cache.get("title", "a") is None
+    cache.put("title", "b", ["b"] * 2, cache.version)
+    cache.put("title", "c", ["c"] * 2, cache.version)
+    cache.put("title", "c", ["c"] * 2, cache.version)
+    assert cache.get("title", "b") == ["b"] * 2
+    cache.put("title", "d", ["d"], cache.version)
+    assert cache.get("title", "c") is None
+    assert cache.get("title", "b") == ["b"] * 2
+    assert cache.get("title", "d") == ["d"]
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from src.server import CommandServer
+from src.video_library import VideoLibrary
+
+
+async def _talk(port, commands):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(commands.encode())
+    output = await reader.read()
+    writer.close()
+    return output.decode()
+
+
+@pytest.mark.parametrize("thread_safe", [False, True])
+def test_connections_share_the_library(thread_safe):
+    async def scenario():
+        server = CommandServer(VideoLibrary(thread_safe=thread_safe))
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            first = await _talk(
+                port, "PLAY amazing_cats_video_id\n"
+                      "FLAG_VIDEO funny_dogs_video_id\n"
+                      "EXIT\n")
+            second = await _talk(
+                port, "SHOW_PLAYING\n"
+                      "SEARCH_VIDEOS_WITH_TAG #animal\n"
+                      "2\n"
+                      "PLAY\n"
+                      "EXIT\n")
+        server.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    lines = first.splitlines()
+    assert "Hello and welcome to YouTube" in lines[0]
+    assert "YT> Playing video: Amazing Cats" in lines[2]
+    assert "YT> Successfully flagged video: Funny Dogs" in lines[3]
+    assert "YT> YouTube has now terminated its execution." in lines[4]
+
+    lines = second.splitlines()
+    assert "YT> No video is currently playing" in lines[2]
+    assert "YT> Here are the results for #animal:" in lines[3]
+    assert "1) Amazing Cats" in lines[4]
+    assert "2) Another Cat Video" in lines[5]
+    assert "Playing video: Another Cat Video" in lines[8]
+    assert "YT> Please enter PLAY command followed by video_id." in lines[9]
+    assert "YT> YouTube has now terminated its execution." in lines[10]
+
+
+def test_pending_answers_do_not_hold_workers():
+    async def scenario():
+        server = CommandServer(VideoLibrary(thread_safe=True), max_workers=2)
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            searchers = []
+            for _ in range(3):
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", port)
+                writer.write(b"SEARCH_VIDEOS cat\n")
+                await reader.readuntil(b"we will assume it's a no.\n")
+                searchers.append((reader, writer))
+            # Every worker would be waiting for an answer by now.
+            other = await asyncio.wait_for(
+                _talk(port, "NUMBER_OF_VIDEOS\nEXIT\n"), 5)
+            answered = []
+            for reader, writer in searchers:
+                writer.write(b"1\nEXIT\n")
+                answered.append((await reader.read()).decode())
+                writer.close()
+        server.close()
+        return other, answered
+
+    other, answered = asyncio.run(scenario())
+    assert "YT> 5 videos in the library" in other
+    for output in answered:
+        lines = output.splitlines()
+        assert lines[0] == "Playing video: Amazing Cats"
+        assert "YT> YouTube has now terminated its execution." in lines[1]
+
+
+def test_oversized_lines_are_skipped():
+    async def scenario():
+        server = CommandServer(VideoLibrary(thread_safe=True))
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            output = await _talk(
+                port, "PLAY " + "x" * 200000 + "\n"
+                      "SEARCH_VIDEOS cat\n"
+                      + "1" * 100000 + "\n"
+                      "NUMBER_OF_VIDEOS\n"
+                      "EXIT\n")
+        server.close()
+        return output
+
+    lines = asyncio.run(scenario()).splitlines()
+    assert "YT> Please enter lines of at most 65536 bytes." in lines[2]
+    assert "YT> Here are the results for cat:" in lines[3]
+    assert lines[8] == "Please enter lines of at most 65536 bytes."
+    assert "YT> 5 videos in the library" in lines[9]
+    assert "YT> YouTube has now terminated its execution." in lines[10]
@@ -0,0 +1,31 @@
+from src.output_sink import MemorySink
+from src.video_player import VideoPlayer
+
+
+def test_sessions_share_flags_but_not_playback(capfd):
+    player = VideoPlayer()
+    other = player.new_session()
+    player.play_video("amazing_cats_video_id")
+    player.create_playlist("my_playlist")
+    other.flag_video("funny_dogs_video_id")
+    other.show_playing()
+    other.show_all_playlists()
+    player.play_video("funny_dogs_video_id")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 6
+    assert "Successfully flagged video: Funny Dogs" in lines[2]
+    assert "No video is currently playing" in lines[3]
+    assert "No playlists exist yet" in lines[4]
+    assert "Cannot play video: Video is currently flagged" in lines[5]
+
+
+def test_sessions_can_defer_answers():
+    output = MemorySink()
+    other = VideoPlayer().new_session(output, defer_answers=True)
+    other.search_videos("cat")
+    assert other.pending_question is not None
+    other.answer_question("2")
+    assert other.pending_question is None
+    assert output.getvalue().splitlines()[-1] == (
+        "Playing video: Another Cat Video")
@@ -0,0 +1,152 @@
+import threading
+
+import pytest
+
+from src.output_sink import MemorySink
+from src.sqlite_library import SqliteVideoLibrary
+from src.sqlite_playlists import SqlitePlaylistStore
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+CATALOG = """\
+Amazing Cats | amazing_cats_video_id | #cat , #animal
+zebra crossing | zebra_video_id | #Road , #animal
+Zebra Crossing | other_zebra_video_id | #road
+Cats and Éclairs | eclairs_video_id | #cat , #food , #cat
+Funny Dogs | funny_dogs_video_id | #dog , #animal
+ab | short_video_id |
+Amazing Cats | amazing_cats_video_id | #cat , #funny
+"""
+
+COMMANDS = """\
+NUMBER_OF_VIDEOS
+SHOW_ALL_VIDEOS
+SEARCH_VIDEOS cat
+1
+SEARCH_VIDEOS ZEBRA
+2
+SEARCH_VIDEOS a
+no
+SEARCH_VIDEOS écl
+no
+SEARCH_VIDEOS_WITH_TAG #animal
+no
+SEARCH_VIDEOS_WITH_TAG #road
+no
+FLAG_VIDEO amazing_cats_video_id too_cute
+FLAG_VIDEO amazing_cats_video_id again
+FLAG_VIDEO missing_video_id
+SEARCH_VIDEOS cat
+no
+SEARCH_VIDEOS_WITH_TAG #cat
+no
+SHOW_PLAYING
+CREATE_PLAYLIST Mine
+ADD_TO_PLAYLIST mine amazing_cats_video_id
+ADD_TO_PLAYLIST mine zebra_video_id
+SHOW_PLAYLIST MINE
+ALLOW_VIDEO amazing_cats_video_id
+ALLOW_VIDEO amazing_cats_video_id
+SEARCH_VIDEOS_WITH_TAG #funny
+no
+PLAY amazing_cats_video_id
+FLAG_VIDEO amazing_cats_video_id
+SHOW_ALL_VIDEOS
+"""
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "videos.txt"
+    path.write_text(CATALOG)
+    return path
+
+
+def test_sqlite_library_gives_the_same_output(
+        tmp_path, catalog, batch_output):
+    expected = batch_output(VideoLibrary(catalog), COMMANDS)
+    library = SqliteVideoLibrary(tmp_path / "videos.db", catalog)
+    assert batch_output(library, COMMANDS) == expected
+    library.close()
+
+
+def test_sqlite_library_gives_the_same_output_on_default_catalog(
+        tmp_path, batch_output):
+    library = SqliteVideoLibrary(tmp_path / "videos.db")
+    assert batch_output(library, COMMANDS) == batch_output(
+        VideoLibrary(), COMMANDS)
+    library.close()
+
+
+def test_sqlite_library_keeps_flags_and_reimports_changed_catalog(
+        tmp_path, catalog):
+    library = SqliteVideoLibrary(tmp_path / "videos.db", catalog)
+    assert library.flag_video("funny_dogs_video_id", "dogs")
+    library.close()
+
+    catalog.write_text(CATALOG + "New Video | new_video_id | #new\n")
+    library = SqliteVideoLibrary(tmp_path / "videos.db", catalog)
+    assert len(library) == 7
+    assert library.get_video("funny_dogs_video_id").flagged_reason == "dogs"
+    assert [video.video_id for video in library.search_tag("#new")] == [
+        "new_video_id"]
+    library.close()
+
+
+def test_sqlite_playlist_store_restores_playlists(tmp_path, catalog):
+    database = tmp_path / "videos.db"
+    library = SqliteVideoLibrary(database, catalog)
+    store = SqlitePlaylistStore(database)
+    player = VideoPlayer(library, MemorySink(), journal=store)
+    player.create_playlist("Mine")
+    player.add_to_playlist("mine", "zebra_video_id")
+    player.add_to_playlist("mine", "funny_dogs_video_id")
+    player.remove_from_playlist("mine", "zebra_video_id")
+    player.add_to_playlist("mine", "zebra_video_id")
+    player.create_playlist("gone")
+    player.delete_playlist("gone")
+    player.flag_video("funny_dogs_video_id", "dogs")
+    store.close()
+    library.close()
+
+    output = MemorySink()
+    store = SqlitePlaylistStore(database)
+    player = VideoPlayer(VideoLibrary(catalog), output, journal=store)
+    player.show_all_playlists()
+    player.show_playlist("mine")
+    store.close()
+    assert output.getvalue().splitlines() == [
+        "Showing all playlists:",
+        " Mine",
+        "Showing playlist: mine",
+        "  Funny Dogs (funny_dogs_video_id) [#dog #animal] - FLAGGED "
+        "(reason: dogs)",
+        "  zebra crossing (zebra_video_id) [#Road #animal]",
+    ]
+
+
+def test_sqlite_library_picks_random_playable_videos(tmp_path, catalog):
+    library = SqliteVideoLibrary(tmp_path / "videos.db", catalog)
+    playable = {"zebra_video_id", "eclairs_video_id", "short_video_id"}
+    for video in library.get_all_videos():
+        if video.video_id not in playable:
+            library.flag_video(video.video_id, "reason")
+    picked = {library.get_random_playable_video().video_id
+              for _ in range(200)}
+    assert picked == playable
+    for video_id in playable:
+        library.flag_video(video_id, "reason")
+    assert library.get_random_playable_video() is None
+    library.close()
+
+
+def test_sqlite_library_serves_other_threads(tmp_path, catalog):
+    library = SqliteVideoLibrary(tmp_path / "videos.db", catalog)
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(library.search_titles("zebra")))
+    thread.start()
+    thread.join()
+    assert [video.video_id for video in results[0]] == [
+        "zebra_video_id", "other_zebra_video_id"]
+    library.close()
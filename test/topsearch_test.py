@@ -0,0 +1,59 @@
+import pytest
+
+from src.command_parser import CommandParser
+from src.output_sink import MemorySink
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+TITLES = ["Bobcat", "Cat", "Catalog", "Amazing Cat", "cat videos", "CAT",
+          "Concatenate", "Dog", "Cats", "Scatter"]
+
+
+@pytest.fixture
+def catalog_text():
+    return "".join(f"{title} | video_{number} | #tag\n"
+                   for number, title in enumerate(TITLES))
+
+
+def _expected(video_library, term, limit):
+    """Ranks every match with a full sort."""
+    def rank(video):
+        title = video.title.lower()
+        return title != term, not title.startswith(term)
+    matches = [video for video in video_library.search_titles(term)
+               if not video.is_flagged]
+    return [video.video_id for video in sorted(matches, key=rank)][:limit]
+
+
+def _top(video_library, term, limit):
+    player = VideoPlayer(video_library, MemorySink())
+    return [video.video_id for video in player._top_results(term, limit)]
+
+
+@pytest.mark.parametrize("term", ["cat", "CAT", "cats", "at", "", "x"])
+@pytest.mark.parametrize("limit", [1, 3, 20])
+def test_top_results_match_a_full_sort(video_library, term, limit):
+    video_library.flag_video("video_8", "reason")
+    assert _top(video_library, term, limit) == _expected(
+        video_library, term.lower(), limit)
+
+
+def test_exact_matches_come_first(video_library):
+    assert _top(video_library, "cat", 4) == [
+        "video_1", "video_5", "video_4", "video_2"]
+
+
+def test_search_videos_top_command():
+    output = MemorySink()
+    parser = CommandParser(VideoPlayer(VideoLibrary(), output, lambda: "1"))
+    parser.execute_command(["SEARCH_VIDEOS_TOP", "an", "1"])
+    parser.execute_command(["SEARCH_VIDEOS_TOP", "cat", "none"])
+    lines = output.getvalue().splitlines()
+    assert lines[:2] == [
+        "Here are the results for an:",
+        " 1) Another Cat Video (another_cat_video_id) [#cat #animal]",
+    ]
+    assert lines[-2:] == [
+        "Playing video: Another Cat Video",
+        "Please enter a limit of at least 1.",
+    ]
@@ -1,3 +1,12 @@
+from pathlib import Path
+import pickle
+import sys
+import threading
+from unittest import mock
+
+import pytest
+
+import src
 from src.video_library import VideoLibrary
 
 
@@ -24,3 +33,267 @@ def test_parses_video_correctly_without_tags():
     assert video.title == "Video about nothing"
     assert video.video_id == "nothing_video_id"
     assert video.tags == ()
+
+
+def test_search_titles_ignores_case():
+    library = VideoLibrary()
+    videos = library.search_titles("CAT")
+
+    assert [video.video_id for video in videos] == [
+        "amazing_cats_video_id", "another_cat_video_id"]
+
+
+def test_search_titles_short_and_long_terms():
+    library = VideoLibrary()
+
+    assert {video.video_id for video in library.search_titles("g")} == {
+        "funny_dogs_video_id", "amazing_cats_video_id",
+        "life_at_google_video_id", "nothing_video_id"}
+    assert [video.video_id for video in library.search_titles("at goo")] == [
+        "life_at_google_video_id"]
+    assert library.search_titles("cats video") == []
+
+
+def test_search_tag_follows_flags():
+    library = VideoLibrary()
+    library.flag_video("amazing_cats_video_id", "dont_like_cats")
+    assert [video.video_id for video in library.search_tag("#CAT")] == [
+        "another_cat_video_id"]
+
+    library.allow_video("amazing_cats_video_id")
+    assert [video.video_id for video in library.search_tag("#cat")] == [
+        "amazing_cats_video_id", "another_cat_video_id"]
+
+
+def test_flagging_unknown_video_fails(video_library):
+    assert not video_library.flag_video("does_not_exist", "reason")
+    assert not video_library.allow_video("does_not_exist")
+    assert video_library.flag_video("amazing_cats_video_id", "reason")
+    assert not video_library.flag_video("amazing_cats_video_id", "reason")
+    assert video_library.allow_video("amazing_cats_video_id")
+    assert not video_library.allow_video("amazing_cats_video_id")
+
+
+def test_iter_videos_by_title():
+    library = VideoLibrary()
+    titles = [video.title for video in library.iter_videos_by_title()]
+
+    assert titles == sorted(titles)
+    assert len(titles) == 5
+
+
+@pytest.mark.parametrize("catalog_text", [None, (
+    "Cat Video | x | #cat\n"
+    "Dog Video | y | #dog\n"
+    "Other Cat | x | #cat , #other\n")])
+def test_compact_library_matches_default(tmp_path, catalog_text):
+    catalog = None
+    if catalog_text is not None:
+        catalog = tmp_path / "videos.txt"
+        catalog.write_text(catalog_text)
+    library = VideoLibrary(catalog)
+    compact = VideoLibrary(catalog, compact=True)
+
+    assert len(compact) == len(library)
+    assert [repr(video) for video in compact.get_all_videos()] == [
+        repr(video) for video in library.get_all_videos()]
+    assert [repr(video) for video in compact.iter_videos_by_title()] == [
+        repr(video) for video in library.iter_videos_by_title()]
+    assert [repr(video) for video in compact.search_titles("cat")] == [
+        repr(video) for video in library.search_titles("cat")]
+    assert [repr(video) for video in compact.search_tag("#cat")] == [
+        repr(video) for video in library.search_tag("#cat")]
+    for video in library.get_all_videos():
+        assert repr(compact.get_video(video.video_id)) == repr(video)
+    assert compact.get_video("does_not_exist") is None
+
+
+def test_compact_library_flags_videos():
+    library = VideoLibrary(compact=True)
+    library.flag_video("amazing_cats_video_id", "dont_like_cats")
+    video = library.get_video("amazing_cats_video_id")
+
+    assert video.is_flagged
+    assert video.flagged_reason == "dont_like_cats"
+    assert video == library.get_video("amazing_cats_video_id")
+    assert [video.video_id for video in library.search_tag("#cat")] == [
+        "another_cat_video_id"]
+
+    library.allow_video("amazing_cats_video_id")
+    assert not video.is_flagged
+    assert video.flagged_reason is None
+
+
+def test_compact_views_are_smaller_than_videos():
+    library = VideoLibrary()
+    compact = VideoLibrary(compact=True)
+    view = compact.get_video("amazing_cats_video_id")
+    video = library.get_video("amazing_cats_video_id")
+
+    assert not hasattr(view, "__dict__")
+    assert sys.getsizeof(view) < sys.getsizeof(video)
+    assert repr(view) == repr(video)
+
+
+def test_lazy_library_parses_on_access():
+    library = VideoLibrary(lazy=True)
+    video = library.get_video("amazing_cats_video_id")
+
+    assert video.title == "Amazing Cats"
+    assert set(video.tags) == {"#cat", "#animal"}
+    assert library.get_video("nothing_video_id").tags == ()
+    assert library.get_video("does_not_exist") is None
+    assert not library.flag_video("does_not_exist", "reason")
+    assert not library.allow_video("does_not_exist")
+
+    library.flag_video("amazing_cats_video_id", "dont_like_cats")
+    assert len(library.get_all_videos()) == 5
+    assert library.get_video("amazing_cats_video_id") is video
+    assert video.is_flagged
+    assert [video.video_id for video in library.search_tag("#cat")] == [
+        "another_cat_video_id"]
+
+
+def test_lazy_library_matches_default_on_quoted_rows(tmp_path):
+    catalog = tmp_path / "videos.txt"
+    catalog.write_bytes(
+        b'"Quoted | Title" | q_id | #x\r\n'
+        b"Cat Video | cat_id | #cat , #a\r\n"
+        b"Old Dog | dup_id | #old\r\n"
+        b'"Dup | New" | dup_id | #new\n')
+    library = VideoLibrary(catalog)
+    lazy = VideoLibrary(catalog, lazy=True)
+
+    for video_id in ("q_id", "cat_id", "dup_id"):
+        assert repr(lazy.get_video(video_id)) == repr(
+            library.get_video(video_id))
+    assert lazy.get_video("does_not_exist") is None
+    assert len(lazy) == len(library) == 3
+
+
+def test_snapshot_is_reused_until_catalog_changes(tmp_path):
+    catalog = tmp_path / "videos.txt"
+    catalog.write_text((Path(src.__file__).parent / "videos.txt").read_text())
+
+    library = VideoLibrary(catalog, snapshot=True)
+    assert (tmp_path / "videos.txt.objects.snapshot").exists()
+
+    with mock.patch("src.video_library.read_catalog") as read_videos:
+        cached = VideoLibrary(catalog, snapshot=True)
+    read_videos.assert_not_called()
+    assert [repr(video) for video in cached.search_titles("cat")] == [
+        repr(video) for video in library.search_titles("cat")]
+
+    with catalog.open("a") as catalog_file:
+        catalog_file.write("\nNew Cat | new_cat_video_id | #cat")
+    changed = VideoLibrary(catalog, snapshot=True)
+    assert len(changed.get_all_videos()) == 6
+    assert len(changed.search_tag("#cat")) == 3
+
+
+def test_snapshot_writable_by_others_is_not_loaded(tmp_path):
+    catalog = tmp_path / "videos.txt"
+    catalog.write_text((Path(src.__file__).parent / "videos.txt").read_text())
+    VideoLibrary(catalog, snapshot=True)
+    (tmp_path / "videos.txt.objects.snapshot").chmod(0o666)
+
+    with mock.patch("src.video_library.read_catalog",
+                    wraps=src.video_library.read_catalog) as read_videos:
+        library = VideoLibrary(catalog, snapshot=True)
+    read_videos.assert_called_once()
+    assert len(library.get_all_videos()) == 5
+
+
+def test_corrupt_snapshot_is_parsed_again(tmp_path):
+    catalog = tmp_path / "videos.txt"
+    catalog.write_text((Path(src.__file__).parent / "videos.txt").read_text())
+    VideoLibrary(catalog, snapshot=True)
+    snapshot = tmp_path / "videos.txt.objects.snapshot"
+    key_size = len(pickle.dumps(pickle.load(snapshot.open("rb"))))
+    with snapshot.open("r+b") as snapshot_file:
+        snapshot_file.seek(key_size)
+        # A unicode string opcode followed by bytes that are not utf-8.
+        snapshot_file.write(b"X\x05\x00\x00\x00\xff\xfe\xfd\xfc\xfb.")
+        snapshot_file.truncate()
+
+    library = VideoLibrary(catalog, snapshot=True)
+    assert len(library.get_all_videos()) == 5
+    assert library.get_video("amazing_cats_video_id").title == "Amazing Cats"
+
+
+def test_background_library_serves_loaded_videos_early():
+    rest_released = threading.Event()
+    videos = [
+        ("Funny Dogs", "funny_dogs_video_id", ["#dog", "#animal"]),
+        ("Amazing Cats", "amazing_cats_video_id", ["#cat", "#animal"]),
+        ("Another Cat Video", "another_cat_video_id", ["#cat", "#animal"]),
+    ]
+
+    def read_videos(path):
+        yield videos[0]
+        rest_released.wait()
+        yield from videos[1:]
+
+    with mock.patch("src.video_library._LOAD_CHUNK_SIZE", 1), \
+            mock.patch("src.video_library.read_catalog", read_videos):
+        library = VideoLibrary(background=True)
+        assert library.get_video("funny_dogs_video_id").title == "Funny Dogs"
+
+        rest_released.set()
+        assert len(library.get_all_videos()) == 3
+        assert library.get_video("does_not_exist") is None
+        assert [video.video_id for video in library.search_tag("#cat")] == [
+            "amazing_cats_video_id", "another_cat_video_id"]
+
+
+def test_random_playable_video_skips_flagged_videos():
+    library = VideoLibrary()
+    for video in library.get_all_videos():
+        if video.video_id != "life_at_google_video_id":
+            library.flag_video(video.video_id, "reason")
+    for _ in range(10):
+        assert library.get_random_playable_video().video_id == \
+            "life_at_google_video_id"
+
+    library.flag_video("life_at_google_video_id", "reason")
+    assert library.get_random_playable_video() is None
+
+    library.allow_video("amazing_cats_video_id")
+    assert library.get_random_playable_video().video_id == \
+        "amazing_cats_video_id"
+
+
+def test_thread_safe_library_keeps_flags_consistent():
+    library = VideoLibrary(thread_safe=True)
+    video = library.get_video("funny_dogs_video_id")
+    done = threading.Event()
+    errors = []
+
+    def toggle_flag():
+        try:
+            for _ in range(2000):
+                assert library.flag_video("funny_dogs_video_id", "dog")
+                assert library.allow_video("funny_dogs_video_id")
+        finally:
+            done.set()
+
+    def read():
+        while not done.is_set():
+            with library.reading():
+                flagged = video.is_flagged
+                reason = video.flagged_reason
+                tagged = video in library.search_tag("#dog")
+                if flagged != (reason is not None) or flagged == tagged:
+                    errors.append((flagged, reason, tagged))
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    toggle_flag()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert not video.is_flagged
+    assert library.flag_video("funny_dogs_video_id", "dog")
+    assert not library.flag_video("funny_dogs_video_id", "dog")